@@ -8,7 +8,13 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
 
 import os
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'autoria_clone.settings')
 application = get_asgi_application()
+
+if getattr(settings, 'WARM_UP_ON_START', False):
+    from main.startup import warm_up
+
+    warm_up()
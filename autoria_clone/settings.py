@@ -1,8 +1,9 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-AUTH_USER_MODEL = 'main.models.CustomUser'
+AUTH_USER_MODEL = 'main.CustomUser'
 
 SECRET_KEY = 'django-insecure-oi=28a)=1!vlpjs)42r-h6e1kcug_$q$b8mfk8%827m#^5xup_'
 
@@ -26,11 +27,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # After the session, so it can pin session users as well as token ones.
+    'main.db_router.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -56,6 +60,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'autoria_clone.wsgi.application'
+ASGI_APPLICATION = 'autoria_clone.asgi.application'
 
 
 
@@ -67,22 +72,55 @@ DATABASES = {
         'PASSWORD': 'root',
         'HOST': 'localhost',
         'PORT': '3306',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Read replicas, e.g. DATABASE_REPLICA_HOSTS=db-replica-1,db-replica-2
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_HOSTS', '').split(','))):
+    alias = f'replica{index + 1}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['main.db_router.ReplicaRouter']
+REPLICA_PIN_SECONDS = 5
+REPLICA_RETRY_SECONDS = 30
+
+
+# Shared by every worker: main.versions stamps, the dashboard and SharedResponseCache.
+# Create the table with `python manage.py createcachetable`, or set REDIS_URL to use Redis.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+    }
+}
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+# How long a process trusts a version stamp before re-reading it from the cache.
+VERSION_CHECK_INTERVAL = 1.0
+
 
 REST_FRAMEWORK = {
+    # orjson when installed, the stdlib json otherwise.
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'main.renderers.FastJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'main.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'main.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
 }
 
 
@@ -120,4 +158,30 @@ CORS_ALLOWED_ORIGINS = [
     'http://localhost:3000',
     'http://example.com',
     # Добавьте другие разрешенные домены
-]
\ No newline at end of file
+]
+
+PRICE_BASE_CURRENCY = 'USD'
+AD_PRICE_BUCKETS = [5000, 10000, 20000, 50000]
+
+RESPONSE_CACHE = {
+    'BACKEND': 'main.response_cache.LocMemResponseCache',
+    'OPTIONS': {'max_entries': 1024, 'timeout': 300},
+}
+
+PRINCIPAL_CACHE_SIZE = 1024
+PRINCIPAL_CACHE_TTL = 60
+
+AD_VIEW_BUFFER_SIZE = 500
+AD_VIEW_FLUSH_INTERVAL = 5
+
+SERVER_TIMING = True
+DUPLICATE_QUERY_THRESHOLD = 3
+# Bearer token Prometheus sends to /metrics/; without one the endpoint is closed unless DEBUG is on.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+SELLER_DASHBOARD_TTL = 30
+
+# Run main.startup.warm_up when the WSGI/ASGI application is built, before the worker takes traffic.
+# Off by default so runserver reloads and management commands stay quick and query-free; production
+# workers (gunicorn/uvicorn) opt in with WARM_UP_ON_START=1 in their environment.
+WARM_UP_ON_START = os.environ.get('WARM_UP_ON_START', '0') == '1'
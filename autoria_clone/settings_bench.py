@@ -0,0 +1,31 @@
+"""
+Settings for seed_data and benchmark_routes on a throwaway SQLite database:
+
+    DJANGO_SETTINGS_MODULE=autoria_clone.settings_bench python manage.py migrate --run-syncdb
+    DJANGO_SETTINGS_MODULE=autoria_clone.settings_bench python manage.py seed_data --ads 100000
+    DJANGO_SETTINGS_MODULE=autoria_clone.settings_bench python manage.py benchmark_routes --output bench.json
+"""
+import os
+
+from autoria_clone.settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['testserver', 'localhost']
+
+DATABASE_REPLICAS = []
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('BENCHMARK_DATABASE', BASE_DIR / 'benchmark.sqlite3'),
+    }
+}
+
+# One process; no cache table to create.
+SILENCED_SYSTEM_CHECKS = ['main.W001']
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
@@ -0,0 +1,41 @@
+"""
+Settings for the test suite, on SQLite with process-local caches:
+
+    python manage.py test --settings=autoria_clone.settings_test
+"""
+from autoria_clone.settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test.sqlite3',
+        # A file rather than shared-cache memory, so concurrent test threads wait for the write lock.
+        'TEST': {'NAME': BASE_DIR / 'test-run.sqlite3'},
+    },
+    # Separate databases, not mirrors, so routing tests can tell where a read went;
+    # tests that route to them enable them with override_settings(DATABASE_REPLICAS=...).
+    'replica1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test-replica1.sqlite3',
+    },
+    'replica2': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test-replica2.sqlite3',
+    },
+}
+
+DATABASE_REPLICAS = []
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+VERSION_CHECK_INTERVAL = 0
+SILENCED_SYSTEM_CHECKS = ['main.W001']
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+WARM_UP_ON_START = False
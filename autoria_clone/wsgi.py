@@ -8,8 +8,14 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 """
 
 import os
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'autoria_clone.settings')
 application = get_wsgi_application()
 
+if getattr(settings, 'WARM_UP_ON_START', False):
+    from main.startup import warm_up
+
+    warm_up()
+
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'oktenProject.main'
+    name = 'main'
+
+    def ready(self):
+        from main import checks, instrumentation, signals  # noqa: F401
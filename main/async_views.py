@@ -0,0 +1,209 @@
+"""
+Async versions of the hot read endpoints, served under /async/ by the ASGI
+application. They return the same payloads as the DRF views but query
+through the async ORM and run independent statistics queries concurrently.
+Only JWT authentication is supported here.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from main.authentication import CachedJWTAuthentication
+from main.fieldsets import includes, ordering_columns, requested_fieldset
+from main.filters import AdFilter
+from main.messaging import await_messages, latest_message_id
+from main.models import Ad
+from main.pagination import KeysetPagination
+from main.response_cache import CachedResponse, LocMemResponseCache, get_response_cache
+from main.serializers import AdPremiumSerializer, AdSerializer, MessageSerializer
+from main.statistics import get_average_prices, get_average_prices_bulk
+from main.view_tracking import get_view_statistics, get_view_statistics_bulk, view_buffer
+from main.views import AdViewSet, CarBrandViewSet, CarMakeListView, CarModelsViewSet, CurrencyListView, \
+    ExchangeRateListView, int_param
+
+POLL_TIMEOUT = 25
+MAX_POLL_TIMEOUT = 60
+
+renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+authenticator = CachedJWTAuthentication()
+
+
+def render(data, status=200):
+    return HttpResponse(renderer.render(data), content_type=renderer.media_type, status=status)
+
+
+def error_response(error):
+    data = error.detail if isinstance(error.detail, (dict, list)) else {'detail': error.detail}
+    return render(data, status=error.status_code)
+
+
+def not_authenticated():
+    return render({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+
+def _close_connections(func):
+    # Runs in a pool thread, which must not keep its own connections open.
+    def wrapper(*args):
+        try:
+            return func(*args)
+        finally:
+            connections.close_all()
+    return wrapper
+
+
+def concurrently(*calls):
+    """Run blocking (func, *args) calls in parallel threads, each with its own connection."""
+    return asyncio.gather(*[
+        sync_to_async(_close_connections(func), thread_sensitive=False)(*args) for func, *args in calls
+    ])
+
+
+async def authenticate(request):
+    try:
+        result = await sync_to_async(authenticator.authenticate)(request)
+    except APIException as error:
+        return None, error_response(error)
+    return (result[0] if result else None), None
+
+
+def drf_request(request, user=None):
+    wrapped = Request(request)
+    if user is not None:
+        wrapped.user = user
+    return wrapped
+
+
+async def ad_detail(request, pk):
+    user, error = await authenticate(request)
+    if error:
+        return error
+    if user is None:
+        return not_authenticated()
+
+    serializer_class = AdPremiumSerializer if user.is_premium else AdSerializer
+    try:
+        ad = await serializer_class.setup_eager_loading(Ad.objects.all()).aget(pk=pk)
+    except Ad.DoesNotExist:
+        return render({'detail': 'Not found.'}, status=404)
+
+    if view_buffer.record(ad.pk, user.pk, flush=False):
+        await sync_to_async(view_buffer.flush)()
+
+    if not user.is_premium:
+        return render(AdSerializer(ad, context={'request': drf_request(request, user)}).data)
+
+    views, average_prices = await concurrently(
+        (get_view_statistics, ad.pk),
+        (get_average_prices, ad.car_model.brand_id, ad.region),
+    )
+    statistics = {
+        'total_views': views['total'],
+        'today_views': views['today'],
+        'week_views': views['week'],
+        'month_views': views['month'],
+        'average_price_brand': average_prices['brand'],
+        'average_price_region': average_prices['region'],
+        'average_price_ukraine': average_prices['ukraine'],
+    }
+    return render(AdPremiumSerializer(ad, context={'request': drf_request(request, user), 'statistics': statistics}).data)
+
+
+def filter_ads(request):
+    fields, expand = requested_fieldset(drf_request(request))
+    queryset = AdSerializer.setup_sparse_loading(Ad.objects.all(), fields, expand, keep=ordering_columns(AdViewSet))
+    return AdFilter(request.GET, queryset=queryset, request=request).qs
+
+
+async def ad_list(request):
+    user, error = await authenticate(request)
+    if error:
+        return error
+    if user is None:
+        return not_authenticated()
+
+    wrapped = drf_request(request, user)
+    queryset = await sync_to_async(filter_ads)(request)
+    paginator = KeysetPagination()
+    try:
+        page = paginator.build_page([ad async for ad in paginator.page_queryset(queryset, wrapped, AdViewSet)])
+    except APIException as error:
+        return error_response(error)
+
+    context = {'request': wrapped}
+    if user.is_premium and includes(requested_fieldset(wrapped)[0], 'statistics'):
+        context['ad_statistics'] = tuple(await concurrently(
+            (get_view_statistics_bulk, [ad.pk for ad in page]),
+            (get_average_prices_bulk, [(ad.car_model.brand_id, ad.region) for ad in page]),
+        ))
+    return render(paginator.get_paginated_data(AdSerializer(page, many=True, context=context).data))
+
+
+async def message_poll(request):
+    """MessagePollView without holding a thread while it waits, so it allows much longer timeouts."""
+    user, error = await authenticate(request)
+    if error:
+        return error
+    if user is None:
+        return not_authenticated()
+
+    wrapped = drf_request(request, user)
+    after = int_param(wrapped, 'after', None, maximum=2 ** 63 - 1)
+    if after is None:
+        after = await sync_to_async(latest_message_id)(user.pk)
+    timeout = int_param(wrapped, 'timeout', POLL_TIMEOUT, maximum=MAX_POLL_TIMEOUT)
+
+    messages = await await_messages(user.pk, after, timeout)
+    last_id = messages[-1].pk if messages else after
+    return render({'messages': MessageSerializer(messages, many=True).data, 'last_id': last_id})
+
+
+async def _cache_call(cache, method, *args):
+    # In-process entries never block; versions and shared backends may do network I/O.
+    if isinstance(cache, LocMemResponseCache) and method in ('get', 'set'):
+        return getattr(cache, method)(*args)
+    return await sync_to_async(getattr(cache, method))(*args)
+
+
+def catalog_list(view_class):
+    """An async list endpoint with the payload, pagination and response cache of a sync catalog view."""
+    serializer_class = view_class.serializer_class
+
+    async def view(request):
+        cache = get_response_cache()
+        group = view_class.response_cache_group
+        version = await _cache_call(cache, 'get_version', group)
+        key = f'{group}:{version}:{renderer.media_type}:{request.get_full_path()}'
+        entry = await _cache_call(cache, 'get', key)
+
+        if entry is None:
+            queryset = view_class.queryset.all()
+            if hasattr(serializer_class, 'setup_eager_loading'):
+                queryset = serializer_class.setup_eager_loading(queryset)
+            wrapped = drf_request(request)
+            paginator = KeysetPagination()
+            try:
+                page = paginator.build_page([item async for item in paginator.page_queryset(queryset, wrapped, view_class)])
+            except APIException as error:
+                return error_response(error)
+
+            data = paginator.get_paginated_data(serializer_class(page, many=True, context={'request': wrapped}).data)
+            content_type = renderer.media_type
+            if renderer.charset:
+                content_type = f'{content_type}; charset={renderer.charset}'
+            entry = CachedResponse(renderer.render(data), content_type, version)
+            await _cache_call(cache, 'set', key, entry)
+        return entry.to_response(request)
+
+    return view
+
+
+car_brand_list = catalog_list(CarBrandViewSet)
+car_model_list = catalog_list(CarModelsViewSet)
+car_make_list = catalog_list(CarMakeListView)
+currency_list = catalog_list(CurrencyListView)
+exchange_rate_list = catalog_list(ExchangeRateListView)
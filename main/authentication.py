@@ -0,0 +1,33 @@
+import copy
+
+from django.db.models import prefetch_related_objects
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from main.principals import get_principal_version, principal_cache
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that serves the user from the principal cache instead
+    of the database. A token whose 'ver' claim is older than the user's
+    principal version carries stale claims and is rejected; the client
+    gets a fresh one from the refresh endpoint.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        version = get_principal_version(user_id)
+        if validated_token.get('ver', version) < version:
+            raise InvalidToken('Token claims are out of date')
+        user = principal_cache.get(user_id, version)
+        if user is None:
+            user = super().get_user(validated_token)
+            prefetch_related_objects([user], 'roles')
+            principal_cache.set(user_id, version, user)
+            user = copy.copy(user)
+        return user
@@ -0,0 +1,243 @@
+import heapq
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+
+from main.models import CarBrand, CarMake, CarModels
+from main.search import normalize
+from main.versions import bump_version, get_version, read_version
+
+TOP_K = 20
+KINDS = ('brand', 'model', 'make')
+CATALOG_KINDS = {CarBrand: 'brand', CarModels: 'model', CarMake: 'make'}
+CATALOG_VERSION = 'catalog'
+CATALOG_CHANGE_TTL = getattr(settings, 'CATALOG_CHANGE_TTL', 24 * 60 * 60)
+# Longer walks of the change log give up and rebuild the index instead.
+MAX_CHANGE_STEPS = 1000
+
+_word = re.compile(r'\w+')
+
+
+def fold(text):
+    """Case- and diacritic-insensitive form with punctuation collapsed to single spaces."""
+    return ' '.join(_word.findall(normalize(text)))
+
+
+def _word_suffixes(folded):
+    return [folded[match.start():] for match in _word.finditer(folded)]
+
+
+class _Node:
+    __slots__ = ('children', 'terminals', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.terminals = []
+        self.top = []
+
+
+class PrefixTrie:
+    """
+    Trie over normalized words where every node keeps its best TOP_K
+    distinct entries, so a lookup is a walk down the prefix and a slice.
+
+    Each label is inserted once per word so "x5" also finds "BMW X5";
+    matches on the first word rank above matches on later words, then
+    shorter labels above longer ones. An entry reached through several of
+    its words keeps only its best key in a node's list. Node lists are
+    replaced, never mutated, so readers need no lock.
+    """
+
+    def __init__(self):
+        self.root = _Node()
+        self.labels = {}
+
+    def add(self, entry_id, label):
+        self.remove(entry_id)
+        self.labels[entry_id] = label
+        folded = fold(label)
+        for position, suffix in enumerate(_word_suffixes(folded)):
+            self._insert(suffix, (position > 0, len(folded), folded, entry_id))
+
+    def remove(self, entry_id):
+        label = self.labels.pop(entry_id, None)
+        if label is not None:
+            for suffix in _word_suffixes(fold(label)):
+                self._delete(suffix, entry_id)
+
+    def search(self, prefix, limit=TOP_K):
+        node = self.root
+        for char in fold(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.top[:limit]
+
+    def _insert(self, text, key):
+        node = self.root
+        path = [node]
+        for char in text:
+            node = node.children.setdefault(char, _Node())
+            path.append(node)
+        node.terminals = sorted(node.terminals + [key])
+        for step in path:
+            step.top = self._unique(sorted(step.top + [key]))
+
+    def _delete(self, text, entry_id):
+        path = [self.root]
+        for char in text:
+            node = path[-1].children.get(char)
+            if node is None:
+                return
+            path.append(node)
+
+        path[-1].terminals = [key for key in path[-1].terminals if key[3] != entry_id]
+        for index in range(len(path) - 1, -1, -1):
+            node = path[index]
+            if any(key[3] == entry_id for key in node.top):
+                candidates = [node.terminals] + [child.top for child in node.children.values()]
+                node.top = self._unique(heapq.merge(*candidates))
+            if index and not node.terminals and not node.children:
+                del path[index - 1].children[text[index - 1]]
+
+    @staticmethod
+    def _unique(keys, limit=TOP_K):
+        seen = set()
+        results = []
+        for key in keys:
+            if key[3] not in seen:
+                seen.add(key[3])
+                results.append(key)
+                if len(results) == limit:
+                    break
+        return results
+
+
+class CatalogIndex:
+    def __init__(self, version=None):
+        self.tries = {kind: PrefixTrie() for kind in KINDS}
+        self.version = version
+
+    @classmethod
+    def build(cls, version=None):
+        index = cls(version)
+        for brand_id, name in CarBrand.objects.values_list('id', 'name'):
+            index.tries['brand'].add(brand_id, name)
+        for model_id, brand_name, name in CarModels.objects.values_list('id', 'brand__name', 'name'):
+            index.tries['model'].add(model_id, f'{brand_name} {name}')
+        for make_id, name in CarMake.objects.values_list('id', 'name'):
+            index.tries['make'].add(make_id, name)
+        return index
+
+    def catch_up(self, version):
+        """
+        Apply the changes logged since this index's version. False if the
+        log does not reach `version`, in which case the index must be rebuilt.
+        """
+        changed = {kind: set() for kind in KINDS}
+        current = self.version
+        for _ in range(MAX_CHANGE_STEPS):
+            change = cache.get(_change_key(current))
+            if change is None:
+                break
+            current, kind, entry_id = change
+            changed[kind].add(entry_id)
+        else:
+            return False
+        if current < version:
+            return False
+        self.refresh(changed)
+        self.version = current
+        return True
+
+    def refresh(self, changed):
+        """Re-read the changed rows, and the models of changed brands, whose labels hold the brand name."""
+        # From the primary, which a replica may not have caught up with yet.
+        brands = dict(CarBrand.objects.using(DEFAULT_DB_ALIAS)
+                      .filter(id__in=changed['brand']).values_list('id', 'name'))
+        models = {
+            model_id: f'{brand_name} {name}'
+            for model_id, brand_name, name in CarModels.objects.using(DEFAULT_DB_ALIAS)
+            .filter(Q(id__in=changed['model']) | Q(brand_id__in=changed['brand']))
+            .values_list('id', 'brand__name', 'name')
+        }
+        makes = dict(CarMake.objects.using(DEFAULT_DB_ALIAS)
+                     .filter(id__in=changed['make']).values_list('id', 'name'))
+        for kind, labels in (('brand', brands), ('model', models), ('make', makes)):
+            trie = self.tries[kind]
+            for entry_id in changed[kind] - labels.keys():
+                trie.remove(entry_id)
+            for entry_id, label in labels.items():
+                trie.add(entry_id, label)
+
+    def suggest(self, prefix, kinds=KINDS, limit=10):
+        ranked = heapq.merge(*[
+            [(key, kind) for key in self.tries[kind].search(prefix, limit)] for kind in kinds
+        ])
+        return [
+            {'kind': kind, 'id': key[3], 'label': self.tries[kind].labels.get(key[3])}
+            for key, kind in list(ranked)[:limit]
+        ]
+
+
+def _change_key(version):
+    return f'catalog-change:{version}'
+
+
+def record_catalog_change(kind, entry_id):
+    """
+    Log a committed change to a catalog row and bump CATALOG_VERSION to it.
+
+    The log is a chain in the shared default cache: the entry under each
+    version holds the next version and the row that changed. cache.add lets
+    exactly one writer extend a version, so concurrent writers follow the
+    chain to its end instead of overwriting each other's entries.
+    """
+    version = read_version(CATALOG_VERSION)
+    for _ in range(MAX_CHANGE_STEPS):
+        if version is None:
+            break
+        next_version = max(time.time_ns(), version + 1)
+        if cache.add(_change_key(version), (next_version, kind, entry_id), CATALOG_CHANGE_TTL):
+            bump_version(CATALOG_VERSION, next_version)
+            return
+        change = cache.get(_change_key(version))
+        if change is not None:
+            version = change[0]
+    # A stamp outside the chain makes every process rebuild its index.
+    bump_version(CATALOG_VERSION)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_catalog_index():
+    """
+    The index for the current CATALOG_VERSION. The first call builds it;
+    after a bump one thread per process applies the logged changes to it,
+    a query per kind of row, while the others keep answering from it as it
+    was. Only a gap in the log (an expired or evicted entry, a lost cache)
+    makes it rebuild.
+
+    Stamps grow along the log, so an index that has followed it past the
+    version this process last read is current.
+    """
+    global _index
+    version = get_version(CATALOG_VERSION)
+    index = _index
+    if index is not None and index.version >= version:
+        return index
+    # Without an index every caller waits for the first build.
+    if _index_lock.acquire(blocking=index is None):
+        try:
+            if _index is None or (_index.version < version and not _index.catch_up(version)):
+                _index = CatalogIndex.build(version)
+        finally:
+            _index_lock.release()
+    return _index
@@ -0,0 +1,103 @@
+import hashlib
+import threading
+from decimal import Decimal
+from types import MappingProxyType
+
+from django.conf import settings
+
+from main.models import Currency, ExchangeRate
+from main.versions import get_version
+
+RATES_VERSION = 'exchange_rates'
+CENT = Decimal('0.01')
+
+
+class RateSnapshot:
+    """
+    Immutable view of the latest ExchangeRate per Currency.
+
+    Rates are expressed in units of the currency per one unit of
+    settings.PRICE_BASE_CURRENCY, which is assumed to be 1 when it has no
+    rate of its own.
+    """
+
+    __slots__ = ('version', 'rates', 'currency_ids')
+
+    def __init__(self, version, rates, currency_ids):
+        self.version = version
+        self.rates = MappingProxyType(dict(rates))
+        self.currency_ids = MappingProxyType(dict(currency_ids))
+
+    @classmethod
+    def load(cls, version=None):
+        rates = {}
+        latest_first = (ExchangeRate.objects
+                        .order_by('currency_id', '-date', '-id')
+                        .values_list('currency__name', 'rate'))
+        for name, rate in latest_first:
+            rates.setdefault(name, rate)
+        rates.setdefault(settings.PRICE_BASE_CURRENCY, Decimal(1))
+
+        currency_ids = dict(Currency.objects.values_list('name', 'id'))
+        return cls(version, rates, currency_ids)
+
+    @property
+    def currencies(self):
+        return tuple(self.rates)
+
+    @property
+    def signature(self):
+        """Stable digest of the rates, identical in every process that loaded the same data."""
+        content = ';'.join(f'{name}={rate.normalize()}' for name, rate in sorted(self.rates.items()))
+        return hashlib.sha1(content.encode()).hexdigest()
+
+    def factors(self, target, sources):
+        target_rate = self.rates.get(target)
+        factors = {}
+        for source in sources:
+            source_rate = self.rates.get(source)
+            factors[source] = target_rate / source_rate if target_rate and source_rate else None
+        return factors
+
+    def convert(self, prices, currencies, targets=None):
+        """
+        Convert parallel sequences of prices and their currencies into every
+        target currency. Returns {target: [price or None, ...]}; None marks
+        a price whose currency has no known rate.
+        """
+        prices = [Decimal(price) for price in prices]
+        currencies = list(currencies)
+        sources = set(currencies)
+
+        converted = {}
+        for target in self.currencies if targets is None else targets:
+            factors = self.factors(target, sources)
+            converted[target] = [
+                (price * factors[currency]).quantize(CENT) if factors[currency] is not None else None
+                for price, currency in zip(prices, currencies)
+            ]
+        return converted
+
+    def convert_price(self, price, currency, targets=None):
+        return {target: prices[0] for target, prices in self.convert([price], [currency], targets).items()}
+
+    def to_base(self, prices, currencies):
+        return self.convert(prices, currencies, [settings.PRICE_BASE_CURRENCY])[settings.PRICE_BASE_CURRENCY]
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_rate_snapshot():
+    """Return the current RateSnapshot, reloading it only after rates change."""
+    global _snapshot
+    version = get_version(RATES_VERSION)
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = RateSnapshot.load(version)
+        return _snapshot
@@ -0,0 +1,83 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from main.models import Ad, AdViewDaily, Conversation
+from main.statistics import get_average_prices_bulk
+from main.view_tracking import get_view_statistics_bulk
+
+
+def seller_ads(seller_id):
+    return (Ad.objects
+            .filter(seller_id=seller_id)
+            .select_related('car_model__brand')
+            .only('id', 'title', 'price', 'currency', 'base_price', 'region', 'is_active', 'created_at',
+                  'car_model__name', 'car_model__brand', 'car_model__brand__name'))
+
+
+def compare(price, average):
+    """Percent above (+) or below (-) the average, both in the base currency."""
+    if price is None or not average:
+        return None
+    return float(((price / Decimal(average) - 1) * 100).quantize(Decimal('0.1')))
+
+
+def conversation_counts(ad_ids):
+    rows = (Conversation.objects
+            .filter(ad_id__in=ad_ids)
+            .values('ad_id')
+            .annotate(conversations=Count('id'), messages=Sum('message_count')))
+    return {row['ad_id']: row for row in rows}
+
+
+def ad_rows(ads):
+    """Dashboard entries for a page of ads: three grouped queries whatever the page size."""
+    ad_ids = [ad.pk for ad in ads]
+    views = get_view_statistics_bulk(ad_ids)
+    averages = get_average_prices_bulk([(ad.car_model.brand_id, ad.region) for ad in ads])
+    conversations = conversation_counts(ad_ids)
+
+    rows = []
+    for ad in ads:
+        average = averages[(ad.car_model.brand_id, ad.region)]
+        counts = conversations.get(ad.pk, {})
+        rows.append({
+            'id': ad.pk,
+            'title': ad.title,
+            'brand': ad.car_model.brand.name,
+            'model': ad.car_model.name,
+            'price': ad.price,
+            'currency': ad.currency,
+            'region': ad.region,
+            'is_active': ad.is_active,
+            'created_at': ad.created_at,
+            'views_total': views[ad.pk]['total'],
+            'views_today': views[ad.pk]['today'],
+            'views_week': views[ad.pk]['week'],
+            'views_month': views[ad.pk]['month'],
+            'average_price_brand': average['brand'],
+            'average_price_region': average['region'],
+            'price_vs_brand': compare(ad.base_price, average['brand']),
+            'price_vs_region': compare(ad.base_price, average['region']),
+            'conversations': counts.get('conversations', 0),
+            'messages': counts.get('messages') or 0,
+        })
+    return rows
+
+
+def seller_summary(seller_id):
+    """Totals over all of the seller's ads, one aggregate query per table."""
+    month_ago = timezone.localdate() - timedelta(days=30)
+    ads = Ad.objects.filter(seller_id=seller_id).aggregate(
+        ads=Count('id'), active_ads=Count('id', filter=Q(is_active=True)),
+    )
+    views = AdViewDaily.objects.filter(ad__seller_id=seller_id).aggregate(
+        views_total=Sum('count'), views_month=Sum('count', filter=Q(date__gte=month_ago)),
+    )
+    conversations = Conversation.objects.filter(seller_id=seller_id).aggregate(
+        conversations=Count('id'), messages=Sum('message_count'),
+    )
+    summary = {**ads, **views, **conversations}
+    return {key: value or 0 for key, value in summary.items()}
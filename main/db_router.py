@@ -0,0 +1,157 @@
+import contextvars
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# [replica alias or None] for the current request. A list rather than the
+# alias itself so a write in a sync_to_async thread, which runs in a copy of
+# the context, still sends the rest of the request to the primary.
+_request_replica = contextvars.ContextVar('request_replica', default=None)
+
+_down_until = {}
+_down_lock = threading.Lock()
+_jwt = JWTAuthentication()
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+def is_healthy(alias):
+    """
+    False for REPLICA_RETRY_SECONDS after a replica could not be connected
+    to; an open persistent connection is checked by CONN_HEALTH_CHECKS.
+    """
+    if _down_until.get(alias, 0) > time.monotonic():
+        return False
+    connection = connections[alias]
+    if connection.connection is not None:
+        return True
+    try:
+        connection.ensure_connection()
+    except DatabaseError:
+        with _down_lock:
+            _down_until[alias] = time.monotonic() + getattr(settings, 'REPLICA_RETRY_SECONDS', 30)
+        return False
+    return True
+
+
+def choose_replica():
+    healthy = [alias for alias in replica_aliases() if is_healthy(alias)]
+    return random.choice(healthy) if healthy else None
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the replica ReplicaRoutingMiddleware chose for the
+    request, and everything else to the primary. Reads stay on the primary
+    inside a transaction and once the request has written, so a request
+    always sees its own writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = _request_replica.get()
+        if replica is None or replica[0] is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica[0]
+
+    def db_for_write(self, model, **hints):
+        replica = _request_replica.get()
+        if replica is not None:
+            replica[0] = None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replica_aliases()
+
+
+def pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def request_user_id(request):
+    """The user a request is made for, from its access token or session, without a query; None if anonymous."""
+    header = _jwt.get_header(request)
+    raw_token = _jwt.get_raw_token(header) if header else None
+    if raw_token is not None:
+        try:
+            return _jwt.get_validated_token(raw_token).get(jwt_settings.USER_ID_CLAIM)
+        except (InvalidToken, TokenError):
+            return None
+    session = getattr(request, 'session', None)
+    return session.get(SESSION_KEY) if session is not None else None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Picks one healthy replica for each safe request, so all of its reads
+    see the same replication lag. A successful unsafe request pins its user
+    to the primary for REPLICA_PIN_SECONDS, long enough for the replicas to
+    catch up, so API and browser clients alike read their own writes. Pins
+    live in the shared default cache and are keyed by user id; anonymous
+    requests are never pinned.
+
+    Under ASGI it runs as a coroutine, so async views stay on the event loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = _request_replica.set([self.choose(request)])
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_replica.reset(token)
+        self.pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        # Health checks and pins may touch the network.
+        token = _request_replica.set([await sync_to_async(self.choose)(request)])
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_replica.reset(token)
+        await sync_to_async(self.pin)(request, response)
+        return response
+
+    def choose(self, request):
+        if request.method not in SAFE_METHODS or not replica_aliases():
+            return None
+        user_id = request_user_id(request)
+        if user_id is not None and cache.get(pin_key(user_id)):
+            return None
+        return choose_replica()
+
+    def pin(self, request, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400:
+            return
+        user = getattr(request, 'user', None)
+        user_id = user.pk if user is not None and user.is_authenticated else request_user_id(request)
+        if user_id is not None:
+            cache.set(pin_key(user_id), True, self.pin_seconds)
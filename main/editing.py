@@ -0,0 +1,122 @@
+import uuid
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from main.currency import get_rate_snapshot
+from main.models import Ad, AdPrice
+from main.moderation import enqueue
+from main.repricing import build_ad_prices
+from main.search import index_ad, index_ads
+from main.statistics import add_contributions, apply_change, contribution
+
+MAX_EDIT_ATTEMPTS = 3
+
+
+class EditConflict(Exception):
+    """The ad changed since the client read it; `version` is the current one."""
+
+    def __init__(self, version):
+        super().__init__(version)
+        self.version = version
+
+
+class EditLimitReached(Exception):
+    pass
+
+
+def insert_ads(ads, model_brands=None):
+    """
+    Insert new, unsaved ads with their AdPrice rows in one transaction, and
+    count them in the price aggregates, the search index and the moderation
+    queue, all with a fixed number of queries however many ads there are.
+
+    The brand of each ad comes from `model_brands` ({car_model_id: brand_id})
+    when given, otherwise from its loaded car_model.
+    """
+    snapshot = get_rate_snapshot()
+    prices = [ad.price for ad in ads]
+    currencies = [ad.currency for ad in ads]
+    for ad, base_price in zip(ads, snapshot.to_base(prices, currencies)):
+        # bulk_create skips Ad.save, so new ads start inactive explicitly.
+        ad.base_price = base_price
+        ad.is_active = False
+
+    with transaction.atomic():
+        if connection.features.can_return_rows_from_bulk_insert:
+            Ad.objects.bulk_create(ads)
+        else:
+            # Without RETURNING (MySQL) the new ids are read back by a token unique to each row.
+            batch = uuid.uuid4().hex
+            for index, ad in enumerate(ads):
+                ad.insert_token = f'{batch}:{index}'
+            Ad.objects.bulk_create(ads)
+            ids = dict(Ad.objects.filter(insert_token__startswith=f'{batch}:').values_list('insert_token', 'id'))
+            for ad in ads:
+                ad.pk = ids[ad.insert_token]
+                ad.insert_token = ''
+            Ad.objects.filter(pk__in=ids.values()).update(insert_token='')
+        add_contributions(
+            (model_brands[ad.car_model_id] if model_brands else ad.car_model.brand_id, ad.region, ad.base_price)
+            for ad in ads
+        )
+        index_ads(ads)
+        enqueue([ad.pk for ad in ads])
+        AdPrice.objects.bulk_create(
+            build_ad_prices([ad.pk for ad in ads], prices, currencies, snapshot), batch_size=1000,
+        )
+    return ads
+
+
+def create_ad(values, seller):
+    """One Ad INSERT plus one bulk INSERT of its prices, in a single transaction."""
+    values = {field: value for field, value in values.items() if field != 'version'}
+    return insert_ads([Ad(**values, seller=seller)])[0]
+
+
+def edit_ad(ad, changes, version=None):
+    """
+    Apply `changes` to `ad` with one conditional UPDATE that also bumps the
+    version and the edit counter, so concurrent edits can neither overwrite
+    each other nor get past MAX_EDIT_ATTEMPTS.
+
+    `version` is the one the client edited, if it sent one. An edited ad goes
+    back to moderation, like a saved one. Raises EditConflict or
+    EditLimitReached when the UPDATE matches no row.
+    """
+    if version is not None and version != ad.version:
+        raise EditConflict(ad.version)
+    version = ad.version
+    # Pinned to the version we read, `ad` is exactly the row the UPDATE replaces.
+    previous = contribution(ad)
+    snapshot = get_rate_snapshot()
+    price, currency = changes.get('price', ad.price), changes.get('currency', ad.currency)
+    base_price = snapshot.to_base([price], [currency])[0]
+
+    with transaction.atomic():
+        updated = (Ad.objects
+                   .filter(pk=ad.pk, version=version, edit_attempts__lt=MAX_EDIT_ATTEMPTS)
+                   .update(**changes, base_price=base_price, is_active=False,
+                           edit_attempts=F('edit_attempts') + 1, version=F('version') + 1))
+        if updated:
+            for field, value in changes.items():
+                setattr(ad, field, value)
+            ad.base_price = base_price
+            ad.is_active = False
+            ad.edit_attempts += 1
+            ad.version = version + 1
+            apply_change(previous, contribution(ad))
+
+            if changes.keys() & {'price', 'currency'}:
+                AdPrice.objects.filter(ad=ad).delete()
+                AdPrice.objects.bulk_create(build_ad_prices([ad.pk], [price], [currency], snapshot))
+            index_ad(ad)
+            transaction.on_commit(lambda: enqueue([ad.pk]))
+            return ad
+
+    current = Ad.objects.filter(pk=ad.pk).values('version').first()
+    if current is None or current['version'] != version:
+        raise EditConflict(current and current['version'])
+    # Outside the transaction, which raising the error would roll back.
+    Ad.objects.filter(pk=ad.pk, is_active=True).update(is_active=False)
+    raise EditLimitReached()
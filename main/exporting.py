@@ -0,0 +1,65 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from main.models import AdPrice, Currency
+
+FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv; charset=utf-8'}
+FIELDS = ('id', 'title', 'description', 'price', 'currency', 'region', 'is_active', 'created_at',
+          'brand', 'model', 'seller')
+COLUMNS = ('id', 'title', 'description', 'price', 'currency', 'region', 'is_active', 'created_at',
+           'car_model__brand__name', 'car_model__name', 'seller__email')
+
+
+def iter_ad_chunks(queryset, chunk_size=1000):
+    """
+    Yield lists of export rows in primary-key order, one keyset query per
+    chunk plus one query for the prices of the whole chunk.
+
+    Keyset chunks rather than one long cursor: the MySQL client buffers a
+    whole result set, so only bounded queries keep memory flat there. Rows
+    are read as tuples because building model instances dominates the cost.
+    """
+    queryset = queryset.order_by('pk').values_list(*COLUMNS)
+    last_id = 0
+    while True:
+        rows = [dict(zip(FIELDS, values)) for values in queryset.filter(pk__gt=last_id)[:chunk_size]]
+        if not rows:
+            return
+        last_id = rows[-1]['id']
+
+        prices = {row['id']: {} for row in rows}
+        for ad_id, currency, price in (AdPrice.objects
+                                       .filter(ad_id__in=list(prices))
+                                       .values_list('ad_id', 'currency__name', 'price')):
+            prices[ad_id][currency] = price
+        for row in rows:
+            row['prices'] = prices[row['id']]
+        yield rows
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def export_lines(queryset, format='ndjson', chunk_size=1000):
+    """Yield the export as text, one chunk of rows per item."""
+    if format == 'ndjson':
+        for rows in iter_ad_chunks(queryset, chunk_size):
+            yield ''.join(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n' for row in rows)
+        return
+
+    currencies = list(Currency.objects.order_by('name').values_list('name', flat=True))
+    writer = csv.writer(_Echo())
+    yield writer.writerow(FIELDS + tuple(f'price_{currency.lower()}' for currency in currencies))
+    for rows in iter_ad_chunks(queryset, chunk_size):
+        lines = []
+        for row in rows:
+            row['created_at'] = row['created_at'].isoformat()
+            lines.append(writer.writerow(
+                [row[field] for field in FIELDS] + [row['prices'].get(currency, '') for currency in currencies]
+            ))
+        yield ''.join(lines)
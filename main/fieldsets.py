@@ -0,0 +1,119 @@
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_fieldset(value):
+    """'id,car_model.name,car_model.brand' -> {'id': {}, 'car_model': {'name': {}, 'brand': {}}}"""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def requested_fieldset(request):
+    """The (fields, expand) trees of `?fields=` and `?expand=`; None for a missing parameter."""
+    params = getattr(request, 'query_params', None)
+    if params is None:
+        return None, None
+    fields, expand = params.get(FIELDS_PARAM), params.get(EXPAND_PARAM)
+    return (parse_fieldset(fields) if fields is not None else None,
+            parse_fieldset(expand) if expand is not None else None)
+
+
+def includes(fields, name):
+    return fields is None or name in fields
+
+
+def expands(fields, expand, name):
+    return includes(fields, name) and (expand is None or name in expand)
+
+
+def nested_fields(fields, name):
+    # `car_model` alone selects all of its fields.
+    return None if fields is None else fields.get(name) or None
+
+
+def nested_expand(expand, name):
+    return None if expand is None else expand.get(name, {})
+
+
+def ordering_columns(view):
+    """Columns KeysetPagination reads from the page rows to build cursors."""
+    orderings = getattr(view, 'cursor_orderings', None) or {}
+    return {field.lstrip('-') for ordering in orderings.values() for field in ordering}
+
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets for read serializers. `?fields=id,title,car_model.name`
+    keeps only the listed fields, dots reaching into nested serializers, and
+    `?expand=car_model.brand` nests only the listed relations and renders the
+    other nested serializers as primary keys. Without the parameters the
+    full representation is returned; unknown names are ignored.
+
+    The root serializer reads both from the request in its context, or takes
+    them as `fields=`/`expand=` trees; nested ones get their part from it.
+    Serializers given input data keep all of their fields.
+    setup_sparse_loading() builds the matching queryset.
+    """
+
+    # Columns the serializer or its views read whatever the fieldset.
+    loaded_columns = ()
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._fieldset = None if fields is None and expand is None else (fields, expand)
+
+    @property
+    def fieldset(self):
+        if self._fieldset is None:
+            parent = self.parent
+            root = parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+            # Input is validated against every field.
+            if root and not hasattr(self.root, 'initial_data'):
+                self._fieldset = requested_fieldset(self.context.get('request'))
+            else:
+                self._fieldset = (None, None)
+        return self._fieldset
+
+    def includes(self, name):
+        return includes(self.fieldset[0], name)
+
+    def get_fields(self):
+        fields, expand = self.fieldset
+        result = super().get_fields()
+        if fields is not None:
+            result = {name: field for name, field in result.items() if name in fields}
+
+        for name, field in result.items():
+            many = isinstance(field, serializers.ListSerializer)
+            nested = field.child if many else field
+            if not isinstance(nested, DynamicFieldsMixin):
+                continue
+            if expands(fields, expand, name):
+                nested._fieldset = (nested_fields(fields, name), nested_expand(expand, name))
+            else:
+                result[name] = serializers.PrimaryKeyRelatedField(read_only=True, many=many, source=field.source)
+        return result
+
+    @classmethod
+    def setup_sparse_loading(cls, queryset, fields=None, expand=None, keep=()):
+        """
+        setup_eager_loading() for the fieldset, with the columns of
+        unselected fields deferred; `keep` names columns to load anyway.
+        """
+        if hasattr(cls, 'setup_eager_loading'):
+            queryset = cls.setup_eager_loading(queryset, fields, expand)
+        if fields is None:
+            return queryset
+
+        keep = set(keep) | set(cls.loaded_columns)
+        deferred = [field.name for field in queryset.model._meta.concrete_fields
+                    if not field.primary_key and not field.is_relation
+                    and field.name not in fields and field.name not in keep]
+        return queryset.defer(*deferred) if deferred else queryset
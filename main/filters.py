@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Q, Value, When
+from django_filters import rest_framework as filters
+
+from main.currency import get_rate_snapshot
+from main.models import Ad, AdPrice
+
+
+class AdFilter(filters.FilterSet):
+    brand = filters.NumberFilter(field_name='car_model__brand')
+    model = filters.NumberFilter(field_name='car_model')
+    seller = filters.NumberFilter(field_name='seller')
+    currency = filters.CharFilter(field_name='currency')
+    is_active = filters.BooleanFilter(field_name='is_active')
+    price_min = filters.NumberFilter(method='filter_price_range')
+    price_max = filters.NumberFilter(method='filter_price_range')
+    price_currency = filters.CharFilter(method='filter_price_range')
+
+    class Meta:
+        model = Ad
+        fields = ['car_model__brand']
+
+    def filter_price_range(self, queryset, name, value):
+        # Applied once for all three parameters in filter_queryset.
+        return queryset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        price_min = self.form.cleaned_data.get('price_min')
+        price_max = self.form.cleaned_data.get('price_max')
+        if price_min is None and price_max is None:
+            return queryset
+
+        currency = self.form.cleaned_data.get('price_currency') or settings.PRICE_BASE_CURRENCY
+        bounds = {}
+        if price_min is not None:
+            bounds['price__gte'] = price_min
+        if price_max is not None:
+            bounds['price__lte'] = price_max
+
+        # Ads listed in the requested currency match on their own price, the
+        # rest on their converted AdPrice row; both sides are index range scans.
+        condition = Q(currency=currency, **bounds)
+        currency_id = get_rate_snapshot().currency_ids.get(currency)
+        if currency_id is not None:
+            converted = AdPrice.objects.filter(currency_id=currency_id, **bounds).values('ad_id')
+            condition |= Q(pk__in=converted)
+        return queryset.filter(condition)
+
+
+def price_bucket_expression(bounds):
+    whens = [When(base_price__isnull=True, then=Value(None))]
+    whens += [When(base_price__lt=bound, then=Value(index)) for index, bound in enumerate(bounds)]
+    return Case(*whens, default=Value(len(bounds)), output_field=IntegerField())
+
+
+def ad_facets(queryset, bounds=None):
+    """
+    Count ads per brand, per model and per base-currency price bucket with a
+    single grouped query over (brand, model, bucket).
+    """
+    bounds = sorted(bounds or settings.AD_PRICE_BUCKETS)
+    rows = (queryset
+            .order_by()
+            .annotate(bucket=price_bucket_expression(bounds))
+            .values('car_model__brand_id', 'car_model__brand__name', 'car_model_id', 'car_model__name', 'bucket')
+            .annotate(count=Count('id')))
+
+    brands, models, buckets = {}, {}, {}
+    for row in rows:
+        brand = brands.setdefault(row['car_model__brand_id'], {
+            'id': row['car_model__brand_id'], 'name': row['car_model__brand__name'], 'count': 0,
+        })
+        brand['count'] += row['count']
+        model = models.setdefault(row['car_model_id'], {
+            'id': row['car_model_id'], 'name': row['car_model__name'], 'brand': row['car_model__brand_id'], 'count': 0,
+        })
+        model['count'] += row['count']
+        if row['bucket'] is not None:
+            buckets[row['bucket']] = buckets.get(row['bucket'], 0) + row['count']
+
+    edges = [None] + bounds + [None]
+    return {
+        'brands': sorted(brands.values(), key=lambda item: (-item['count'], item['name'])),
+        'models': sorted(models.values(), key=lambda item: (-item['count'], item['name'])),
+        'price': [
+            {'min': edges[index], 'max': edges[index + 1], 'count': buckets.get(index, 0)}
+            for index in range(len(bounds) + 1)
+        ],
+        'price_currency': settings.PRICE_BASE_CURRENCY,
+    }
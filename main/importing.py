@@ -0,0 +1,214 @@
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import DatabaseError
+
+from main.editing import insert_ads
+from main.models import Ad, CarBrand, CarModels, CustomUser
+from main.search import normalize
+
+FORMATS = ('csv', 'ndjson')
+TITLE_MAX_LENGTH = Ad._meta.get_field('title').max_length
+REGION_MAX_LENGTH = Ad._meta.get_field('region').max_length
+MAX_PRICE = Decimal('99999999.99')
+
+
+class RowError(ValueError):
+    pass
+
+
+def detect_format(path):
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+
+def read_rows(stream, format):
+    """Yield (line_number, row) pairs without reading the whole stream into memory."""
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield line_number, RowError(f'invalid JSON: {error}')
+            continue
+        yield line_number, row if isinstance(row, dict) else RowError('expected a JSON object')
+
+
+def _key(name):
+    return ' '.join(normalize(name).split())
+
+
+class CatalogLookup:
+    """
+    Brand and model ids preloaded by case- and diacritic-insensitive name, so
+    resolving a row never touches the database. With `create_missing`, unknown
+    brands and models are created once and remembered.
+    """
+
+    def __init__(self, create_missing=False):
+        self.create_missing = create_missing
+        self.brands = {_key(name): brand_id for brand_id, name in CarBrand.objects.values_list('id', 'name')}
+        self.models = {}
+        self.model_brands = {}
+        for model_id, brand_id, name in CarModels.objects.values_list('id', 'brand_id', 'name'):
+            self.models[(brand_id, _key(name))] = model_id
+            self.model_brands[model_id] = brand_id
+
+    def resolve(self, brand, model):
+        brand_key, model_key = _key(brand), _key(model)
+        if not brand_key or not model_key:
+            raise RowError('brand and model are required')
+
+        brand_id = self.brands.get(brand_key)
+        if brand_id is None:
+            if not self.create_missing:
+                raise RowError(f'unknown brand {brand!r}')
+            brand_id = self.brands[brand_key] = CarBrand.objects.create(name=brand.strip()).pk
+
+        model_id = self.models.get((brand_id, model_key))
+        if model_id is None:
+            if not self.create_missing:
+                raise RowError(f'unknown model {model!r} for brand {brand!r}')
+            model_id = CarModels.objects.create(brand_id=brand_id, name=model.strip()).pk
+            self.models[(brand_id, model_key)] = model_id
+            self.model_brands[model_id] = brand_id
+        return model_id
+
+
+def parse_row(row, catalog, default_seller):
+    title = str(row.get('title') or '').strip()
+    if not title:
+        raise RowError('title is required')
+    if len(title) > TITLE_MAX_LENGTH:
+        raise RowError(f'title is longer than {TITLE_MAX_LENGTH} characters')
+
+    try:
+        price = Decimal(str(row.get('price', '')).strip())
+        # NaN survives quantize and only fails the range comparison below.
+        if not price.is_finite():
+            raise InvalidOperation
+        price = price.quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise RowError(f'invalid price {row.get("price")!r}')
+    if not Decimal(0) < price <= MAX_PRICE:
+        raise RowError(f'price {price} is out of range')
+
+    currency = str(row.get('currency') or '').strip().upper()
+    if len(currency) != 3 or not currency.isalpha():
+        raise RowError(f'invalid currency {row.get("currency")!r}')
+
+    region = str(row.get('region') or '').strip()
+    if len(region) > REGION_MAX_LENGTH:
+        raise RowError(f'region is longer than {REGION_MAX_LENGTH} characters')
+
+    seller = str(row.get('seller') or default_seller or '').strip().lower()
+    if not seller:
+        raise RowError('seller is required')
+
+    return {
+        'title': title,
+        'description': str(row.get('description') or ''),
+        'price': price,
+        'currency': currency,
+        'region': region,
+        'car_model_id': catalog.resolve(str(row.get('brand') or ''), str(row.get('model') or '')),
+        'seller': seller,
+    }
+
+
+class AdImporter:
+    """
+    Inserts parsed rows a chunk at a time: the ads, their AdPrice rows, the
+    price aggregates and the search postings of a chunk are written with
+    bulk queries in one transaction, so memory and transaction size stay
+    bounded by `chunk_size` whatever the size of the feed.
+
+    Rows that fail validation, or a chunk that the database rejects, are
+    handed to `reject(line_number, row, error)` instead of aborting the run.
+    """
+
+    def __init__(self, chunk_size=1000, default_seller=None, create_missing=False, reject=None, progress=None):
+        self.chunk_size = chunk_size
+        self.default_seller = default_seller
+        self.catalog = CatalogLookup(create_missing)
+        self.reject = reject or (lambda line_number, row, error: None)
+        self.progress = progress
+        self.sellers = {}
+        self.imported = 0
+        self.rejected = 0
+        self.started = None
+
+    def run(self, rows):
+        self.started = time.monotonic()
+        chunk = []
+        for line_number, row in rows:
+            if isinstance(row, Exception):
+                self._reject(line_number, None, row)
+                continue
+            try:
+                chunk.append((line_number, row, parse_row(row, self.catalog, self.default_seller)))
+            except RowError as error:
+                self._reject(line_number, row, error)
+                continue
+            if len(chunk) >= self.chunk_size:
+                self._flush(chunk)
+                chunk = []
+        if chunk:
+            self._flush(chunk)
+        return self.imported, self.rejected, time.monotonic() - self.started
+
+    def _reject(self, line_number, row, error):
+        self.rejected += 1
+        self.reject(line_number, row, str(error))
+
+    def _resolve_sellers(self, chunk):
+        missing = {values['seller'] for _, _, values in chunk} - self.sellers.keys()
+        if missing:
+            self.sellers.update(CustomUser.objects.filter(email__in=missing).values_list('email', 'id'))
+
+        resolved = []
+        for line_number, row, values in chunk:
+            seller_id = self.sellers.get(values['seller'])
+            if seller_id is None:
+                self._reject(line_number, row, f'unknown seller {values["seller"]!r}')
+            else:
+                resolved.append((line_number, row, values, seller_id))
+        return resolved
+
+    def _flush(self, chunk):
+        resolved = self._resolve_sellers(chunk)
+        if not resolved:
+            return
+        try:
+            self._insert(resolved)
+        except DatabaseError as error:
+            if len(resolved) == 1:
+                line_number, row, _, _ = resolved[0]
+                self._reject(line_number, row, error)
+            else:
+                # Retry row by row so one bad row does not quarantine its neighbours.
+                for item in resolved:
+                    try:
+                        self._insert([item])
+                    except DatabaseError as row_error:
+                        self._reject(item[0], item[1], row_error)
+        if self.progress:
+            self.progress(self.imported, self.rejected, time.monotonic() - self.started)
+
+    def _insert(self, resolved):
+        ads = [
+            Ad(title=values['title'], description=values['description'], price=values['price'],
+               currency=values['currency'], region=values['region'], car_model_id=values['car_model_id'],
+               seller_id=seller_id)
+            for _, _, values, seller_id in resolved
+        ]
+        insert_ads(ads, self.catalog.model_brands)
+        self.imported += len(ads)
@@ -0,0 +1,262 @@
+import contextvars
+import hashlib
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+def fingerprint(sql):
+    return hashlib.blake2b(sql.encode(), digest_size=4).hexdigest()
+
+
+class RequestTimings:
+    """What one request spent in the database, serializers and the renderer."""
+
+    __slots__ = ('started', 'queries', 'db_time', 'statements', 'serialize_time', 'serialize_depth',
+                 'render_started', 'render_time')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+        self.serialize_time = 0.0
+        self.serialize_depth = 0
+        self.render_started = None
+        self.render_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Called by time_query; the SQL still has its placeholders, so an
+        # N+1 loop repeats the exact same statement.
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.statements[sql] += 1
+
+    def duplicates(self, threshold):
+        return [(sql, count) for sql, count in self.statements.items() if count >= threshold]
+
+
+def current_timings():
+    return _current.get()
+
+
+def time_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings(execute, sql, params, many, context)
+
+
+def install_query_timer(connection, **kwargs):
+    # Connections are per thread and async views query from pool threads, so
+    # every connection gets the wrapper; the request's timings reach it through
+    # the context that sync_to_async copies into those threads.
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+connection_created.connect(install_query_timer)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+
+class MetricsRegistry:
+    """
+    Per-route request metrics of this process, in Prometheus text format.
+    Each worker keeps its own counters; Prometheus sums them across targets.
+    """
+
+    HISTOGRAMS = {
+        'http_request_duration_seconds': ('Time spent handling the request.', DURATION_BUCKETS),
+        'http_request_db_duration_seconds': ('Time spent in database queries.', DURATION_BUCKETS),
+        'http_request_db_queries': ('Database queries per request.', QUERY_BUCKETS),
+        'http_request_serialize_duration_seconds': ('Time spent in serializers.', DURATION_BUCKETS),
+        'http_request_render_duration_seconds': ('Time spent rendering the response body.', DURATION_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {name: Histogram(buckets) for name, (_, buckets) in self.HISTOGRAMS.items()}
+        self.requests = Counter()
+        self.duplicate_queries = Counter()
+
+    def record(self, route, method, status, timings, duration, duplicates):
+        labels = (route, method)
+        with self._lock:
+            self.requests[(route, method, str(status))] += 1
+            self.histograms['http_request_duration_seconds'].observe(labels, duration)
+            self.histograms['http_request_db_duration_seconds'].observe(labels, timings.db_time)
+            self.histograms['http_request_db_queries'].observe(labels, timings.queries)
+            self.histograms['http_request_serialize_duration_seconds'].observe(labels, timings.serialize_time)
+            self.histograms['http_request_render_duration_seconds'].observe(labels, timings.render_time)
+            for sql, count in duplicates:
+                self.duplicate_queries[(route, fingerprint(sql))] += count
+
+    def render(self):
+        lines = [
+            '# HELP http_requests_total Requests handled, by route, method and status.',
+            '# TYPE http_requests_total counter',
+        ]
+        with self._lock:
+            for (route, method, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{route="{route}",method="{method}",status="{status}"}} {count}')
+
+            for name, histogram in self.histograms.items():
+                lines.append(f'# HELP {name} {self.HISTOGRAMS[name][0]}')
+                lines.append(f'# TYPE {name} histogram')
+                for (route, method), (counts, total) in sorted(histogram.series.items()):
+                    labels = f'route="{route}",method="{method}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    cumulative += counts[-1]
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{labels}}} {total:.6f}')
+                    lines.append(f'{name}_count{{{labels}}} {cumulative}')
+
+            lines.append('# HELP http_request_duplicate_queries_total Repeated statements within one request '
+                         '(likely N+1), by route and SQL fingerprint.')
+            lines.append('# TYPE http_request_duplicate_queries_total counter')
+            for (route, sql_fingerprint), count in sorted(self.duplicate_queries.items()):
+                lines.append(f'http_request_duplicate_queries_total'
+                             f'{{route="{route}",fingerprint="{sql_fingerprint}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unmatched'
+
+
+def server_timing(timings, duration, duplicates):
+    entries = [
+        f'db;dur={timings.db_time * 1000:.1f};desc="{timings.queries} queries"',
+        f'serialize;dur={timings.serialize_time * 1000:.1f}',
+        f'render;dur={timings.render_time * 1000:.1f}',
+        f'total;dur={duration * 1000:.1f}',
+    ]
+    entries.extend(f'dup-{fingerprint(sql)};desc="{count}x"' for sql, count in duplicates)
+    return ', '.join(entries)
+
+
+class InstrumentationMiddleware:
+    """
+    Counts and times every query of the request through time_query, picks up
+    serializer time from InstrumentedSerializerMixin and render time around
+    the DRF response's render(), and reports them in a Server-Timing header
+    and the per-route histograms served at /metrics/.
+
+    Statements repeated DUPLICATE_QUERY_THRESHOLD times or more in one request
+    are reported by fingerprint; the SQL behind a fingerprint is logged.
+
+    Under ASGI it runs as a coroutine, so async views stay on the event loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'SERVER_TIMING', True)
+        self.threshold = getattr(settings, 'DUPLICATE_QUERY_THRESHOLD', 3)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        # Connections opened before this module was imported.
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        duration = time.perf_counter() - timings.started
+        duplicates = timings.duplicates(self.threshold)
+        route = route_name(request)
+        if route != 'metrics':
+            metrics.record(route, request.method, response.status_code, timings, duration, duplicates)
+        for sql, count in duplicates:
+            logger.info('%s ran %sx in one request to %s [%s]', sql, count, route, fingerprint(sql))
+        if self.server_timing:
+            response['Server-Timing'] = server_timing(timings, duration, duplicates)
+        return response
+
+    def process_template_response(self, request, response):
+        # Called just before a DRF Response is rendered.
+        timings = current_timings()
+        if timings is not None:
+            timings.render_started = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: self.rendered(timings))
+        return response
+
+    @staticmethod
+    def rendered(timings):
+        timings.render_time += time.perf_counter() - timings.render_started
+
+
+class InstrumentedSerializerMixin:
+    """Adds the serializer's to_representation time to the request's timings; nested calls count once."""
+
+    def to_representation(self, instance):
+        timings = current_timings()
+        if timings is None:
+            return super().to_representation(instance)
+
+        timings.serialize_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            timings.serialize_depth -= 1
+            if not timings.serialize_depth:
+                timings.serialize_time += time.perf_counter() - started
@@ -1,12 +1,50 @@
 from datetime import datetime, timedelta
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.views import TokenRefreshView
+from main.principals import get_principal_version
+
+def add_principal_claims(token, user):
+    token['is_premium'] = user.is_premium
+    token['account_type'] = user.account_type
+    token['roles'] = [role.id for role in user.roles.all()]
+    token['ver'] = get_principal_version(user.pk)
+    return token
 
 def get_access_token(user):
-    access_token = AccessToken.for_user(user)
+    access_token = add_principal_claims(AccessToken.for_user(user), user)
     access_token['exp'] = datetime.now() + timedelta(days=7)
     return str(access_token)
 
 def get_refresh_token(user):
-    refresh_token = RefreshToken.for_user(user)
+    refresh_token = add_principal_claims(RefreshToken.for_user(user), user)
     refresh_token['exp'] = datetime.now() + timedelta(days=30)
     return str(refresh_token)
+
+
+class PrincipalTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Re-reads the principal claims for the new access token. Access tokens
+    whose 'ver' is older than the user's principal version are rejected, and
+    the refresh token still carries the claims it was issued with.
+    """
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data['access'])
+        if 'ver' not in access:
+            return data
+        user = (get_user_model().objects
+                .filter(**{api_settings.USER_ID_FIELD: access[api_settings.USER_ID_CLAIM], 'is_active': True})
+                .first())
+        if user is None:
+            raise InvalidToken('User not found or inactive')
+        data['access'] = str(add_principal_claims(access, user))
+        return data
+
+
+class PrincipalTokenRefreshView(TokenRefreshView):
+    serializer_class = PrincipalTokenRefreshSerializer
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from main.jwt import add_principal_claims
+from main.models import Ad, CustomUser
+
+
+def summarize(timings, elapsed):
+    timings.sort()
+    return {
+        'requests': len(timings),
+        'p50_ms': round(statistics.median(timings), 2),
+        'p99_ms': round(timings[max(int(len(timings) * 0.99) - 1, 0)], 2),
+        'requests_per_second': round(len(timings) / elapsed, 1),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compare latency and throughput of the sync (WSGI) and async (ASGI) read endpoints under concurrent load.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests per route and mode.')
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--premium', action='store_true', help='Authenticate as a premium user.')
+
+    def handle(self, *args, **options):
+        ad = Ad.objects.order_by('pk').first()
+        if ad is None:
+            raise CommandError('No ads to read; seed some first (e.g. benchmark_import --keep).')
+
+        user, _ = CustomUser.objects.get_or_create(email='asgi-benchmark@example.com')
+        if user.is_premium != options['premium']:
+            user.is_premium = options['premium']
+            user.save()
+        token = add_principal_claims(RefreshToken.for_user(user), user).access_token
+        # The WSGI test client takes META keys, the ASGI one raw header names.
+        wsgi_headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+        asgi_headers = {'authorization': f'Bearer {token}'}
+
+        routes = {
+            'ad_list': ('/ads/', '/async/ads/'),
+            'ad_detail': (f'/ads/{ad.pk}/', f'/async/ads/{ad.pk}/'),
+            'car_brands': ('/car-brands/', '/async/car-brands/'),
+            'exchange_rates': ('/exchange-rates/', '/async/exchange-rates/'),
+        }
+        report = {'concurrency': options['concurrency'], 'premium': options['premium'], 'routes': {}}
+        for name, (sync_path, async_path) in routes.items():
+            report['routes'][name] = {
+                'wsgi': self.run_wsgi(sync_path, wsgi_headers, options['requests'], options['concurrency']),
+                'asgi': asyncio.run(self.run_asgi(async_path, asgi_headers, options['requests'], options['concurrency'])),
+            }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run_wsgi(self, path, headers, count, concurrency):
+        local = threading.local()
+
+        def request(_):
+            client = getattr(local, 'client', None) or setattr(local, 'client', Client()) or local.client
+            started = time.perf_counter()
+            response = client.get(path, **headers)
+            elapsed = (time.perf_counter() - started) * 1000
+            if response.status_code != 200:
+                raise CommandError(f'{path} returned {response.status_code}')
+            return elapsed
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            timings = list(pool.map(request, range(count)))
+        return summarize(timings, time.perf_counter() - started)
+
+    async def run_asgi(self, path, headers, count, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path, **headers)
+                elapsed = (time.perf_counter() - started) * 1000
+            if response.status_code != 200:
+                raise CommandError(f'{path} returned {response.status_code}')
+            return elapsed
+
+        started = time.perf_counter()
+        timings = await asyncio.gather(*[request() for _ in range(count)])
+        return summarize(list(timings), time.perf_counter() - started)
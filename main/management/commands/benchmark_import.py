@@ -0,0 +1,88 @@
+import csv
+import json
+import os
+import random
+import resource
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.importing import AdImporter, read_rows
+from main.models import Ad, CarBrand, CarModels, CustomUser
+
+FIELDS = ('title', 'description', 'price', 'currency', 'region', 'brand', 'model', 'seller')
+REGIONS = ('Kyiv', 'Lviv', 'Odesa', 'Kharkiv', 'Dnipro')
+CURRENCIES = ('USD', 'EUR', 'UAH')
+
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic dealer feed and measure import throughput and memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000)
+        parser.add_argument('--format', choices=('csv', 'ndjson'), default='ndjson')
+        parser.add_argument('--chunk-size', type=int, action='append',
+                            help='Chunk size to measure; repeat to compare several (default 1000).')
+        parser.add_argument('--invalid-ratio', type=float, default=0.01)
+        parser.add_argument('--keep', action='store_true', help='Keep the imported ads instead of rolling back.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        seller, _ = CustomUser.objects.get_or_create(email='import-benchmark@example.com')
+        brand, _ = CarBrand.objects.get_or_create(name='Benchmark')
+        models = [CarModels.objects.get_or_create(brand=brand, name=f'Model {index}')[0].name for index in range(10)]
+
+        with tempfile.NamedTemporaryFile('w', suffix=f'.{options["format"]}', delete=False,
+                                         newline='', encoding='utf-8') as feed:
+            self.write_feed(feed, options, rng, seller.email, brand.name, models)
+
+        report = {'rows': options['rows'], 'format': options['format'], 'runs': []}
+        try:
+            for chunk_size in options['chunk_size'] or [1000]:
+                report['runs'].append(self.measure(feed.name, options, chunk_size))
+        finally:
+            os.unlink(feed.name)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def write_feed(self, feed, options, rng, seller, brand, models):
+        writer = csv.DictWriter(feed, FIELDS) if options['format'] == 'csv' else None
+        if writer:
+            writer.writeheader()
+        for index in range(options['rows']):
+            row = {
+                'title': f'{brand} {rng.choice(models)} {rng.randint(2000, 2024)}',
+                'description': f'Imported listing {index}',
+                'price': rng.randint(1000, 100000),
+                'currency': rng.choice(CURRENCIES),
+                'region': rng.choice(REGIONS),
+                'brand': brand,
+                'model': rng.choice(models),
+                'seller': seller,
+            }
+            if rng.random() < options['invalid_ratio']:
+                row['price'] = 'call me'
+            if writer:
+                writer.writerow(row)
+            else:
+                feed.write(json.dumps(row) + '\n')
+
+    def measure(self, path, options, chunk_size):
+        before = Ad.objects.count()
+        with transaction.atomic():
+            with open(path, newline='', encoding='utf-8') as source:
+                importer = AdImporter(chunk_size=chunk_size)
+                imported, rejected, elapsed = importer.run(read_rows(source, options['format']))
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        return {
+            'chunk_size': chunk_size,
+            'imported': imported,
+            'rejected': rejected,
+            'seconds': round(elapsed, 2),
+            'ads_per_second': round(imported / elapsed) if elapsed else None,
+            'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'ads_before': before,
+        }
@@ -0,0 +1,269 @@
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import time
+from contextlib import nullcontext
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from main.jwt import add_principal_claims
+from main.messaging import latest_message_id, send_message
+from main.models import Ad, CarBrand, CarModels, Conversation, CustomUser, Message
+from main.seeding import PASSWORD
+
+# Routes that never finish on their own cannot be timed per request.
+SKIPPED = {'message-stream': 'server-sent events stream until the client disconnects'}
+
+
+def route_names(patterns=None):
+    """Every named route of the URLconf; format-suffix variants share their route's name."""
+    names = []
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            names.extend(route_names(pattern.url_patterns))
+        elif pattern.name and pattern.name not in names:
+            names.append(pattern.name)
+    return names
+
+
+def percentile(timings, fraction):
+    return timings[min(int(len(timings) * fraction), len(timings) - 1)]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Measure latency, throughput and SQL queries of every route on the current database '
+            '(seed it with seed_data first) and write the results as JSON for diffing between commits.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per route.')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per route.')
+        parser.add_argument('--routes', nargs='*', help='Only these route names (e.g. ad-list inbox).')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+        parser.add_argument('--compare', help='A previous report to diff against.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Relative p50 slowdown reported as a regression (default 0.2).')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        fixtures = self.fixtures()
+        specs = self.specs(fixtures)
+        names = route_names()
+        if options['routes']:
+            unknown = set(options['routes']) - set(names)
+            if unknown:
+                raise CommandError(f'Unknown routes: {", ".join(sorted(unknown))}')
+            names = [name for name in names if name in options['routes']]
+
+        # A failing route is reported with its status code instead of aborting the run.
+        client = Client(raise_request_exception=False)
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {fixtures["access"]}'}
+        report = {'meta': self.meta(options), 'routes': {}, 'skipped': {}}
+        for name in names:
+            if name in SKIPPED or name not in specs:
+                report['skipped'][name] = SKIPPED.get(name, 'no request defined for this route')
+                continue
+            for method, path, data in specs[name]:
+                label = name if method == 'get' else f'{name} {method.upper()}'
+                report['routes'][label] = self.measure(client, method, path, data, headers, options)
+                if options["verbosity"] > 1:
+                    self.stderr.write(f'{label}: {report["routes"][label]}')
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+        if report['skipped']:
+            self.stderr.write(f'Skipped: {", ".join(sorted(report["skipped"]))}')
+
+        if options['compare']:
+            with open(options['compare']) as file:
+                regressions = self.compare(json.load(file), report, options['threshold'], not options['routes'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'{len(regressions)} route(s) regressed: {", ".join(regressions)}')
+
+    def fixtures(self):
+        ad = Ad.objects.filter(is_active=True).order_by('pk').first()
+        if ad is None:
+            raise CommandError('No active ads; seed the database first (manage.py seed_data).')
+
+        user, created = CustomUser.objects.get_or_create(email='route-benchmark@example.com')
+        if created or not user.is_premium:
+            user.is_premium = True
+            user.account_type = 'premium'
+            user.set_password(PASSWORD)
+            user.save()
+        conversation, created = Conversation.objects.get_or_create(buyer=user, seller=ad.seller, ad=ad)
+        if created:
+            for index in range(10):
+                send_message(conversation, user if index % 2 == 0 else ad.seller, f'benchmark message {index}')
+
+        refresh = add_principal_claims(RefreshToken.for_user(user), user)
+        return {
+            'user': user,
+            'ad': ad,
+            'brand': CarBrand.objects.order_by('pk').first(),
+            'car_model': CarModels.objects.order_by('pk').first(),
+            'conversation': conversation,
+            'latest_message': latest_message_id(user.pk),
+            'access': str(refresh.access_token),
+            'refresh': str(refresh),
+        }
+
+    def specs(self, fixtures):
+        """(method, path, data) requests per route name; writes are rolled back after every request."""
+        user, ad, conversation = fixtures['user'], fixtures['ad'], fixtures['conversation']
+        return {
+            'api-root': [('get', '/', None)],
+            'customuser-list': [('get', '/users/', None)],
+            'customuser-detail': [('get', f'/users/{user.pk}/', None)],
+            'carbrand-list': [('get', '/car-brands/', None)],
+            'carbrand-detail': [('get', f'/car-brands/{fixtures["brand"].pk}/', None)],
+            'carmodels-list': [('get', '/car-models/', None)],
+            'carmodels-detail': [('get', f'/car-models/{fixtures["car_model"].pk}/', None)],
+            'ad-list': [
+                ('get', '/ads/', None),
+                ('post', '/ads/', {'title': 'Benchmark', 'description': 'diesel', 'price': '10000',
+                                   'currency': 'USD', 'car_model': ad.car_model_id}),
+            ],
+            'ad-batch': [('post', '/ads/batch/', [
+                {'title': f'Benchmark {index}', 'description': 'diesel automatic', 'price': '10000',
+                 'currency': 'USD', 'car_model': ad.car_model_id, 'region': 'Kyiv'}
+                for index in range(20)
+            ])],
+            'ad-export': [('get', f'/ads/export/?seller={ad.seller_id}', None)],
+            'ad-facets': [('get', '/ads/facets/', None)],
+            'ad-search': [('get', '/ads/search/?q=diesel+leather', None)],
+            'ad-detail': [
+                ('get', f'/ads/{ad.pk}/', None),
+                ('patch', f'/ads/{ad.pk}/', {'description': 'benchmark edit'}),
+            ],
+            'ad-create': [('post', '/ads/create/', {'title': 'Benchmark', 'description': 'diesel', 'price': '10000',
+                                                    'currency': 'USD', 'car_model': ad.car_model_id})],
+            'conversation-create': [('post', '/conversations/create/',
+                                     {'buyer': user.pk, 'seller': ad.seller_id, 'ad': ad.pk})],
+            'conversation-messages': [
+                ('get', f'/conversations/{conversation.pk}/messages/', None),
+                ('post', f'/conversations/{conversation.pk}/messages/', {'body': 'Is it still available?'}),
+            ],
+            'conversation-read': [('post', f'/conversations/{conversation.pk}/read/', None)],
+            'inbox': [('get', '/inbox/', None)],
+            'seller-dashboard': [('get', '/dashboard/', None)],
+            'message-poll': [('get', f'/messages/poll/?after={fixtures["latest_message"]}&timeout=0', None)],
+            'manager-create': [('post', '/managers/create/', {'user': user.pk})],
+            'car-makes-list': [('get', '/car-makes/', None)],
+            'missing-car-make-request': [('post', '/missing-car-make-request/',
+                                          {'car_make': 'Benchmark', 'seller': user.pk})],
+            'currency-list': [('get', '/currencies/', None)],
+            'exchange-rate-list': [('get', '/exchange-rates/', None)],
+            'exchange-rate-history': [('get', '/exchange-rates/history/?start=2024-01-01', None)],
+            'exchange-rate-as-of': [('get', '/exchange-rates/as-of/?date=2024-06-01', None)],
+            'ad-price-history': [('get', f'/ads/{ad.pk}/price-history/', None)],
+            'autocomplete': [('get', '/autocomplete/?q=to', None)],
+            'async-ad-list': [('get', '/async/ads/', None)],
+            'async-ad-detail': [('get', f'/async/ads/{ad.pk}/', None)],
+            'async-car-brand-list': [('get', '/async/car-brands/', None)],
+            'async-car-model-list': [('get', '/async/car-models/', None)],
+            'async-car-makes-list': [('get', '/async/car-makes/', None)],
+            'async-currency-list': [('get', '/async/currencies/', None)],
+            'async-exchange-rate-list': [('get', '/async/exchange-rates/', None)],
+            'token_obtain_pair': [('post', '/api/token/', {'email': user.email, 'password': PASSWORD})],
+            'token_refresh': [('post', '/api/token/refresh/', {'refresh': fixtures['refresh']})],
+            'metrics': [('get', '/metrics/', None)],
+        }
+
+    def request(self, client, method, path, data, headers):
+        if method == 'get':
+            response = client.get(path, **headers)
+        else:
+            response = getattr(client, method)(path, data=json.dumps(data or {}),
+                                               content_type='application/json', **headers)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response
+
+    def measure(self, client, method, path, data, headers, options):
+        timings, queries, statuses = [], [], set()
+        for iteration in range(options['warmup'] + options['iterations']):
+            write = method != 'get'
+            with transaction.atomic() if write else nullcontext(), CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = self.request(client, method, path, data, headers)
+                elapsed = (time.perf_counter() - started) * 1000
+                if write:
+                    transaction.set_rollback(True)
+            if iteration >= options['warmup']:
+                timings.append(elapsed)
+                # Savepoints belong to the harness, not to the view. Queries that async views run
+                # on pool threads go through other connections and are not counted.
+                queries.append(sum(1 for query in captured.captured_queries if 'SAVEPOINT' not in query['sql']))
+                statuses.add(response.status_code)
+
+        timings.sort()
+        return {
+            'method': method.upper(),
+            'path': path,
+            'status': sorted(statuses),
+            'queries': max(queries),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'requests_per_second': round(1000 * len(timings) / sum(timings), 1),
+        }
+
+    def meta(self, options):
+        return {
+            'commit': git_commit(),
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'ads': Ad.objects.count(),
+            'users': CustomUser.objects.count(),
+            'messages': Message.objects.count(),
+            'iterations': options['iterations'],
+            'warmup': options['warmup'],
+        }
+
+    def compare(self, baseline, report, threshold, complete=True):
+        self.stderr.write(f'Compared with {baseline["meta"].get("commit")} ({baseline["meta"].get("ads")} ads):')
+        regressions = []
+        for label, result in report['routes'].items():
+            old = baseline['routes'].get(label)
+            if old is None:
+                self.stderr.write(f'  {label:40} new route')
+                continue
+            change = result['p50_ms'] / old['p50_ms'] - 1 if old['p50_ms'] else 0
+            query_change = result['queries'] - old['queries']
+            regressed = change > threshold or query_change > 0 or result['status'] != old['status']
+            if regressed:
+                regressions.append(label)
+            self.stderr.write(
+                f'  {label:40} p50 {old["p50_ms"]:8.2f} -> {result["p50_ms"]:8.2f} ms ({change:+.0%})'
+                f'  queries {old["queries"]:3} -> {result["queries"]:3}  status {result["status"]}'
+                + ('  REGRESSION' if regressed else '')
+            )
+        for label in sorted(baseline['routes'].keys() - report['routes'].keys() if complete else ()):
+            self.stderr.write(f'  {label:40} missing from this run')
+        return regressions
@@ -0,0 +1,92 @@
+import itertools
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.models import Ad, CarBrand, CarModels, CustomUser
+from main.search import index_ads, search_ads
+
+COMMON_WORDS = (
+    'diesel petrol hybrid electric automatic manual sedan hatchback wagon coupe crossover suv leather '
+    'navigation camera sunroof xenon led alloy wheels winter tyres service history garage owner '
+    'accident free imported warranty cruise control heated seats parking sensors towbar metallic '
+    'black white silver blue red green grey long range sport comfort premium family economic'
+).split()
+VOCABULARY = COMMON_WORDS + [f'term{index}' for index in range(20000)]
+# Zipf-like frequencies: the n-th word is roughly n times rarer than the first.
+CUMULATIVE_WEIGHTS = list(itertools.accumulate(1 / rank for rank in range(1, len(VOCABULARY) + 1)))
+
+
+def words(rng, count):
+    return ' '.join(rng.choices(VOCABULARY, cum_weights=CUMULATIVE_WEIGHTS, k=count))
+
+
+class Command(BaseCommand):
+    help = 'Seed synthetic ads if needed and measure full-text search latency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ads', type=int, default=100000, help='Number of ads the index should hold.')
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        missing = options['ads'] - Ad.objects.count()
+        if missing > 0:
+            self.seed_ads(missing, rng)
+
+        brands = list(CarBrand.objects.values_list('id', flat=True)[:20])
+        timings = {'one_term': [], 'two_terms': [], 'two_terms_filtered': []}
+        for _ in range(options['queries']):
+            for name, query, queryset in (
+                ('one_term', words(rng, 1), None),
+                ('two_terms', words(rng, 2), None),
+                ('two_terms_filtered', words(rng, 2),
+                 Ad.objects.filter(car_model__brand=rng.choice(brands)) if brands else None),
+            ):
+                started = time.perf_counter()
+                search_ads(query, queryset, limit=20)
+                timings[name].append((time.perf_counter() - started) * 1000)
+
+        report = {'ads': Ad.objects.count(), 'queries': options['queries']}
+        for name, values in timings.items():
+            values.sort()
+            report[name] = {
+                'p50_ms': round(statistics.median(values), 3),
+                'p95_ms': round(values[int(len(values) * 0.95) - 1], 3),
+                'max_ms': round(values[-1], 3),
+            }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def seed_ads(self, count, rng, chunk_size=5000):
+        seller, _ = CustomUser.objects.get_or_create(email='search-benchmark@example.com')
+        car_models = list(CarModels.objects.all()[:50])
+        if not car_models:
+            brand = CarBrand.objects.create(name='Benchmark')
+            car_models = [CarModels.objects.create(brand=brand, name=f'Model {index}') for index in range(10)]
+
+        created = 0
+        while created < count:
+            size = min(chunk_size, count - created)
+            ads = [
+                Ad(
+                    title=words(rng, 4),
+                    description=words(rng, 20),
+                    price=rng.randint(1000, 100000),
+                    currency='USD',
+                    car_model=rng.choice(car_models),
+                    seller=seller,
+                )
+                for _ in range(size)
+            ]
+            with transaction.atomic():
+                Ad.objects.bulk_create(ads)
+                if ads[0].pk is None:
+                    ads = Ad.objects.order_by('-pk')[:size]
+                index_ads(ads)
+            created += size
+            self.stdout.write(f'{created}/{count} ads seeded')
@@ -0,0 +1,101 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from main.fieldsets import requested_fieldset
+from main.models import Ad, CustomUser
+from main.renderers import FastJSONRenderer, orjson
+from main.serializers import AdSerializer
+
+VARIANTS = {
+    'full': '',
+    'card': 'fields=id,title,price,currency,car_model.name,car_model.brand.name&expand=car_model.brand',
+    'ids': 'fields=id,price,currency,car_model,seller&expand=',
+}
+
+
+def variant(value):
+    name, _, query = value.partition('=')
+    if not name:
+        raise ValueError
+    return name, query
+
+
+class Command(BaseCommand):
+    help = ('Measure queries, serializer and renderer CPU time and payload bytes per 1k ads for full and '
+            'sparse (?fields=/?expand=) ad lists, with the stock and the fast JSON renderer.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ads', type=int, default=1000)
+        parser.add_argument('--iterations', type=int, default=5)
+        parser.add_argument('--premium', action='store_true', help='Serialize for a premium user (with statistics).')
+        parser.add_argument('--variant', type=variant, action='append', metavar='NAME=QUERY',
+                            help=f'A query string to measure, e.g. "mobile=fields=id,title"; '
+                                 f'defaults to {", ".join(VARIANTS)}.')
+
+    def handle(self, *args, **options):
+        ads = options['ads']
+        if Ad.objects.count() < ads:
+            raise CommandError(f'Fewer than {ads} ads; seed some first (seed_data --ads {ads}).')
+
+        renderers = {'json': JSONRenderer()}
+        if orjson is not None:
+            renderers['fast'] = FastJSONRenderer()
+        else:
+            self.stderr.write('orjson is not installed; FastJSONRenderer falls back to the stdlib and is skipped.')
+
+        scale = 1000 / ads
+        report = {'ads': ads, 'premium': options['premium'], 'per_1k_ads': {}}
+        # The benchmark user is created or changed only for the run and rolled back afterwards.
+        with transaction.atomic():
+            user, _ = CustomUser.objects.get_or_create(email='serialization-benchmark@example.com')
+            if user.is_premium != options['premium']:
+                user.is_premium = options['premium']
+                user.save()
+
+            for name, query in options['variant'] or VARIANTS.items():
+                runs = [self.measure(query, user, ads, renderers) for _ in range(options['iterations'])]
+                result = {'query': query, 'queries': runs[0]['queries']}
+                for key in runs[0]:
+                    if key.endswith('_ms'):
+                        result[key] = round(statistics.median(run[key] for run in runs) * scale, 1)
+                for key, renderer_name in (('bytes', 'json'), ('bytes_fast', 'fast')):
+                    if renderer_name in renderers:
+                        result[key] = round(runs[0][key] * scale)
+                report['per_1k_ads'][name] = result
+            transaction.set_rollback(True)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def measure(self, query, user, ads, renderers):
+        request = Request(APIRequestFactory().get('/ads/', data=query and dict(
+            part.split('=', 1) for part in query.split('&')
+        )))
+        request.user = user
+        fields, expand = requested_fieldset(request)
+        queryset = AdSerializer.setup_sparse_loading(Ad.objects.order_by('id'), fields, expand)[:ads]
+
+        result = {}
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            page = list(queryset)
+            result['fetch_ms'] = (time.perf_counter() - started) * 1000
+
+            started = time.process_time()
+            data = AdSerializer(page, many=True, context={'request': request}).data
+            result['serialize_cpu_ms'] = (time.process_time() - started) * 1000
+        result['queries'] = len(queries)
+
+        for renderer_name, renderer in renderers.items():
+            started = time.process_time()
+            body = renderer.render(data)
+            suffix = '' if renderer_name == 'json' else f'_{renderer_name}'
+            result[f'render{suffix}_cpu_ms'] = (time.process_time() - started) * 1000
+            result[f'bytes{suffix}'] = len(body)
+        return result
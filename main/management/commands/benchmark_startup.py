@@ -0,0 +1,92 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter, so every phase starts cold.
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+timings = {}
+
+def phase(name, since):
+    now = time.perf_counter()
+    timings[name] = (now - since) * 1000
+    return now
+
+import django
+mark = phase('import_django', started)
+django.setup()
+mark = phase('setup', mark)
+from django.test import Client
+from django.urls import get_resolver
+resolver = get_resolver()
+resolver.url_patterns
+mark = phase('urlconf', mark)
+if WARM_UP:
+    from main.startup import warm_up
+    warm_up()
+    mark = phase('warm_up', mark)
+client = Client(raise_request_exception=False)
+response = client.get(PATH)
+mark = phase('first_response', mark)
+client.get(PATH)
+mark = phase('second_response', mark)
+timings['time_to_first_response'] = timings['import_django'] + timings['setup'] + timings['urlconf'] \\
+    + timings.get('warm_up', 0) + timings['first_response']
+timings['status'] = response.status_code
+print(json.dumps(timings))
+'''
+
+
+def top_imports(stderr, limit):
+    """The slowest modules by cumulative import time, from `python -X importtime` output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((int(cumulative), name.strip()))
+    modules.sort(reverse=True)
+    return [{'module': name, 'cumulative_ms': round(micros / 1000, 1)} for micros, name in modules[:limit]]
+
+
+class Command(BaseCommand):
+    help = ('Measure cold worker startup in fresh interpreters: import and django.setup() time, URLconf '
+            'loading, the optional warm-up and time to the first response.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--path', default='/car-brands/', help='Request path for the first response.')
+        parser.add_argument('--warm-up', action='store_true', help='Run main.startup.warm_up before the first request.')
+        parser.add_argument('--top-imports', type=int, default=15,
+                            help='Also list the slowest imports of one run (0 to skip).')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)}
+        probe = PROBE.replace('WARM_UP', repr(options['warm_up'])).replace('PATH', repr(options['path']))
+
+        runs = [json.loads(self.run_probe(probe, env).stdout) for _ in range(options['runs'])]
+        phases = [name for name in runs[0] if name != 'status']
+        report = {
+            'runs': options['runs'],
+            'path': options['path'],
+            'status': runs[0]['status'],
+            'warm_up': options['warm_up'],
+            'median_ms': {name: round(statistics.median(run[name] for run in runs), 1) for name in phases},
+        }
+        if options['top_imports']:
+            stderr = self.run_probe(probe, env, '-X', 'importtime').stderr
+            report['top_imports'] = top_imports(stderr, options['top_imports'])
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run_probe(self, probe, env, *flags):
+        result = subprocess.run([sys.executable, *flags, '-c', probe], env=env, cwd=settings.BASE_DIR,
+                                capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'Probe failed.')
+        return result
@@ -0,0 +1,29 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from main.exporting import FORMATS, export_lines
+from main.models import Ad
+
+
+class Command(BaseCommand):
+    help = 'Stream every ad with its brand, model, seller and prices as NDJSON or CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--output', help='File to write to (default: stdout).')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--active-only', action='store_true')
+
+    def handle(self, *args, **options):
+        queryset = Ad.objects.all()
+        if options['active_only']:
+            queryset = queryset.filter(is_active=True)
+
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            for text in export_lines(queryset, options['format'], options['chunk_size']):
+                output.write(text)
+        finally:
+            if output is not sys.stdout:
+                output.close()
@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.importing import FORMATS, AdImporter, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Stream ads from a CSV or NDJSON feed into the database in bulk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--seller', help='Email of the seller for rows without a seller column.')
+        parser.add_argument('--create-catalog', action='store_true',
+                            help='Create brands and models that are not in the catalog yet.')
+        parser.add_argument('--quarantine', help='NDJSON file for rejected rows (default: <path>.rejected.ndjson).')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        quarantine_path = options['quarantine'] or f'{path}.rejected.ndjson'
+
+        def progress(imported, rejected, elapsed):
+            rate = imported / elapsed if elapsed else 0
+            self.stdout.write(f'{imported} ads imported, {rejected} rejected, {rate:.0f} ads/s')
+
+        try:
+            source = open(path, newline='', encoding='utf-8')
+        except OSError as error:
+            raise CommandError(error)
+
+        with source, open(quarantine_path, 'w', encoding='utf-8') as quarantine:
+            def reject(line_number, row, error):
+                quarantine.write(json.dumps({'line': line_number, 'error': error, 'row': row}, ensure_ascii=False) + '\n')
+
+            importer = AdImporter(
+                chunk_size=options['chunk_size'],
+                default_seller=options['seller'],
+                create_missing=options['create_catalog'],
+                reject=reject,
+                progress=progress,
+            )
+            imported, rejected, elapsed = importer.run(read_rows(source, options['format'] or detect_format(path)))
+
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f'Imported {imported} ads in {elapsed:.1f}s ({rate:.0f} ads/s).'))
+        if rejected:
+            self.stdout.write(self.style.WARNING(f'{rejected} rows rejected, see {quarantine_path}.'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.statistics import (compute_price_aggregates, find_price_aggregate_drift, normalize_missing_base_prices,
+                             rebuild_price_aggregates)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the brand/region/global price aggregates from the Ad table and report drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only compare the stored aggregates with the Ad table; exit with an error on drift.')
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            normalized = normalize_missing_base_prices()
+            if normalized:
+                self.stdout.write(f'Normalized {normalized} ads without a base price.')
+
+        expected = compute_price_aggregates()
+        drift = find_price_aggregate_drift(expected)
+        for (scope, key), (stored, actual) in sorted(drift.items()):
+            self.stdout.write(f'{scope}:{key} stored count={stored[0]} total={stored[1]}, '
+                              f'expected count={actual[0]} total={actual[1]}')
+
+        if options['check']:
+            if drift:
+                raise CommandError(f'{len(drift)} price aggregates have drifted.')
+            self.stdout.write(self.style.SUCCESS('Price aggregates are consistent.'))
+            return
+
+        rebuild_price_aggregates(expected)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt price aggregates ({len(drift)} drifted).'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from main.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Re-tokenize every ad into the AdSearchTerm inverted index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        def progress(indexed, last_id):
+            self.stdout.write(f'{indexed} ads indexed (last id {last_id})')
+
+        indexed = rebuild_search_index(options['chunk_size'], progress)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} ads.'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from main.repricing import reprice_ads
+
+
+class Command(BaseCommand):
+    help = 'Recompute AdPrice rows for every ad from the latest exchange rates.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue after the last checkpointed ad if the rates have not changed.')
+
+    def handle(self, *args, **options):
+        def progress(processed, last_id, elapsed):
+            rate = processed / elapsed if elapsed else 0
+            self.stdout.write(f'{processed} ads repriced (last id {last_id}), {rate:.0f} ads/s')
+
+        processed, elapsed = reprice_ads(options['chunk_size'], options['resume'], progress)
+        rate = processed / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f'Repriced {processed} ads in {elapsed:.1f}s ({rate:.0f} ads/s).'))
@@ -0,0 +1,59 @@
+import os
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from main.moderation import RELEASE_INTERVAL, release_stale_jobs, run_worker
+
+
+class Command(BaseCommand):
+    help = 'Run a pool of moderation workers that claim queued ads in batches and activate the clean ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--release-interval', type=float, default=RELEASE_INTERVAL,
+                            help='Seconds between requeueing the expired leases of dead workers.')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty.')
+
+    def handle(self, *args, **options):
+        released = release_stale_jobs()
+        if released:
+            self.stdout.write(f'Released {released} stale jobs.')
+
+        stop = threading.Event()
+        if not options['once']:
+            signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+        processed = []
+        lock = threading.Lock()
+
+        def work(index):
+            try:
+                count = run_worker(f'{os.getpid()}-{index}', options['batch_size'], options['poll_interval'],
+                                   stop, options['once'], options['release_interval'])
+                with lock:
+                    processed.append(count)
+            finally:
+                connections.close_all()
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=work, args=(index,)) for index in range(options['workers'])]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        elapsed = time.monotonic() - started
+        total = sum(processed)
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f'Moderated {total} ads in {elapsed:.1f}s ({rate:.0f} ads/s).'))
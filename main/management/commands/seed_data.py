@@ -0,0 +1,30 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import NotSupportedError
+
+from main.seeding import PASSWORD, seed
+
+
+class Command(BaseCommand):
+    help = 'Bulk-insert a reproducible synthetic data set (catalog, users, ads, prices, views, conversations).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ads', type=int, default=10000)
+        parser.add_argument('--users', type=int, help='Defaults to one user per 20 ads.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--no-search-index', action='store_true',
+                            help='Skip the inverted index; run rebuild_search_index later.')
+
+    def handle(self, *args, **options):
+        def progress(ads, elapsed):
+            self.stdout.write(f'{ads}/{options["ads"]} ads seeded, {ads / elapsed:.0f} ads/s')
+
+        try:
+            totals = seed(options['ads'], options['users'], options['seed'], options['chunk_size'],
+                          not options['no_search_index'], progress)
+        except NotSupportedError as error:
+            raise CommandError(error)
+        self.stdout.write(json.dumps(totals, indent=2))
+        self.stdout.write(self.style.SUCCESS(f'Seeded users share the password {PASSWORD!r}.'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.startup import warm_up
+
+
+class Command(BaseCommand):
+    help = 'Run the worker warm-up (URLconf, serializer fields, rate and catalog caches) and print each step\'s time.'
+
+    def handle(self, *args, **options):
+        failed = []
+        for step, seconds in warm_up():
+            if seconds is None:
+                failed.append(step)
+                self.stdout.write(f'{step}: failed')
+            else:
+                self.stdout.write(f'{step}: {seconds * 1000:.1f} ms')
+        if failed:
+            raise CommandError(f'Warm-up steps failed: {", ".join(failed)}')
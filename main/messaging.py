@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Case, F, Max, When
+from django.utils import timezone
+
+from main.models import Conversation, ConversationParticipant, Message
+
+POLL_INTERVAL = 2.0
+
+
+class MessageNotifier:
+    """
+    Wakes long-poll and SSE waiters in this process, threads and event loop
+    tasks alike, as soon as a message for them is committed. Waiters still
+    re-check the database every POLL_INTERVAL, which covers messages sent by
+    other processes.
+
+    Only users being watched have their latest message id kept, and it is
+    dropped when their last watcher leaves, so memory follows the number of
+    open waits rather than of users ever messaged.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._latest = {}
+        self._watchers = {}
+        self._async_waiters = set()
+
+    @contextmanager
+    def watching(self, user_id):
+        """Keep `user_id`'s notifications while the block runs; wait() only sees those."""
+        with self._condition:
+            self._watchers[user_id] = self._watchers.get(user_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._watchers[user_id] -= 1
+                if not self._watchers[user_id]:
+                    del self._watchers[user_id]
+                    self._latest.pop(user_id, None)
+
+    def notify(self, user_ids, message_id):
+        with self._condition:
+            for user_id in user_ids:
+                if user_id in self._watchers:
+                    self._latest[user_id] = max(self._latest.get(user_id, 0), message_id)
+            self._condition.notify_all()
+            for loop, event in self._async_waiters:
+                loop.call_soon_threadsafe(event.set)
+
+    def latest(self, user_id):
+        with self._condition:
+            return self._latest.get(user_id, 0)
+
+    def wait(self, user_id, after_id, timeout):
+        with self._condition:
+            return self._condition.wait_for(lambda: self._latest.get(user_id, 0) > after_id, timeout)
+
+    async def wait_async(self, user_id, after_id, timeout):
+        """wait() for coroutines: sleeps on the event loop instead of holding a thread."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._condition:
+            if self._latest.get(user_id, 0) > after_id:
+                return True
+            self._async_waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._condition:
+                self._async_waiters.discard(waiter)
+        return self.latest(user_id) > after_id
+
+
+notifier = MessageNotifier()
+
+
+def add_participants(conversation):
+    ConversationParticipant.objects.bulk_create(
+        [ConversationParticipant(conversation=conversation, user_id=user_id, last_activity=conversation.last_activity)
+         for user_id in {conversation.buyer_id, conversation.seller_id}],
+        ignore_conflicts=True,
+    )
+
+
+def send_message(conversation, sender, body):
+    """
+    Store a message and update the conversation's denormalized last message
+    and every participant's inbox position and unread counter, all in one
+    transaction with F() updates so concurrent senders cannot lose counts.
+    """
+    with transaction.atomic():
+        message = Message.objects.create(conversation=conversation, sender=sender, body=body)
+        Conversation.objects.filter(pk=conversation.pk).update(
+            last_message=message,
+            last_activity=message.created_at,
+            message_count=F('message_count') + 1,
+        )
+        participants = ConversationParticipant.objects.filter(conversation=conversation)
+        participants.update(
+            last_activity=message.created_at,
+            unread_count=Case(When(user=sender, then=0), default=F('unread_count') + 1),
+        )
+        user_ids = list(participants.values_list('user_id', flat=True))
+        transaction.on_commit(lambda: notifier.notify(user_ids, message.pk))
+    return message
+
+
+def mark_read(conversation, user):
+    return ConversationParticipant.objects.filter(conversation=conversation, user=user).update(
+        unread_count=0, last_read_at=timezone.now(),
+    )
+
+
+def user_messages(user_id):
+    conversation_ids = ConversationParticipant.objects.filter(user_id=user_id).values('conversation_id')
+    return Message.objects.filter(conversation_id__in=conversation_ids)
+
+
+def latest_message_id(user_id):
+    return user_messages(user_id).aggregate(latest=Max('id'))['latest'] or 0
+
+
+def new_messages(user_id, after_id, limit=100):
+    return list(user_messages(user_id).filter(pk__gt=after_id).order_by('pk')[:limit])
+
+
+def wait_for_messages(user_id, after_id, timeout, limit=100):
+    """Return messages newer than `after_id` as soon as there are any, or [] after `timeout` seconds."""
+    deadline = time.monotonic() + timeout
+    # Watch before the first query, so a message committed after it still wakes us.
+    with notifier.watching(user_id):
+        while True:
+            seen = max(after_id, notifier.latest(user_id))
+            messages = new_messages(user_id, after_id, limit)
+            remaining = deadline - time.monotonic()
+            if messages or remaining <= 0:
+                return messages
+            notifier.wait(user_id, seen, min(POLL_INTERVAL, remaining))
+
+
+async def await_messages(user_id, after_id, timeout, limit=100):
+    """wait_for_messages() for async views; only the database reads run in a thread."""
+    deadline = time.monotonic() + timeout
+    with notifier.watching(user_id):
+        while True:
+            seen = max(after_id, notifier.latest(user_id))
+            messages = await sync_to_async(new_messages)(user_id, after_id, limit)
+            remaining = deadline - time.monotonic()
+            if messages or remaining <= 0:
+                return messages
+            await notifier.wait_async(user_id, seen, min(POLL_INTERVAL, remaining))
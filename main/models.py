@@ -1,7 +1,6 @@
-import django
-django.setup()
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
+from django.utils import timezone
 
 
 class CarBrand(models.Model):
@@ -106,10 +105,26 @@ class Ad(models.Model):
     car_model = models.ForeignKey(CarModels, on_delete=models.CASCADE)
     seller = models.ForeignKey('main.CustomUser', on_delete=models.CASCADE)
     is_active = models.BooleanField(default=True)
+    region = models.CharField(max_length=255, blank=True, default='')
+    base_price = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True, editable=False)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    edit_attempts = models.PositiveSmallIntegerField(default=0, editable=False)
+    version = models.PositiveIntegerField(default=1, editable=False)
+    # Set by insert_ads on backends that cannot return ids from a bulk INSERT, to read them back.
+    insert_token = models.CharField(max_length=48, blank=True, default='', editable=False, db_index=True)
 
     class Meta:
         verbose_name = 'Ad'
         verbose_name_plural = 'Ad'
+        indexes = [
+            models.Index(fields=['price', 'id']),
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['car_model', 'is_active']),
+            models.Index(fields=['seller', 'is_active']),
+            models.Index(fields=['seller', 'created_at', 'id']),
+            models.Index(fields=['currency', 'price']),
+            models.Index(fields=['is_active', 'base_price']),
+        ]
 
     def save(self, *args, **kwargs):
         self.is_active = False
@@ -124,6 +139,9 @@ class Conversation(models.Model):
     seller = models.ForeignKey(CustomUser, related_name='seller_conversations', on_delete=models.CASCADE)
     ad = models.ForeignKey(Ad, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    last_message = models.ForeignKey('main.Message', null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    last_activity = models.DateTimeField(default=timezone.now)
+    message_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         verbose_name = 'Conversation'
@@ -133,6 +151,43 @@ class Conversation(models.Model):
         return f'Conversation #{self.id}'
 
 
+class ConversationParticipant(models.Model):
+    """One inbox row per user and conversation, ordered by (user, last_activity)."""
+
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='participants')
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='conversation_memberships')
+    unread_count = models.PositiveIntegerField(default=0)
+    last_activity = models.DateTimeField(default=timezone.now)
+    last_read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Conversation Participant'
+        verbose_name_plural = 'Conversation Participants'
+        constraints = [
+            models.UniqueConstraint(fields=['conversation', 'user'], name='unique_conversation_participant'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'last_activity', 'id']),
+        ]
+
+
+class Message(models.Model):
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
+    sender = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='sent_messages')
+    body = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Message'
+        verbose_name_plural = 'Messages'
+        indexes = [
+            models.Index(fields=['conversation', 'id']),
+        ]
+
+    def __str__(self):
+        return f'Message #{self.id}'
+
+
 class Manager(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE)
 
@@ -180,11 +235,14 @@ class Currency(models.Model):
 class ExchangeRate(models.Model):
     currency = models.ForeignKey(Currency, on_delete=models.CASCADE)
     rate = models.DecimalField(max_digits=10, decimal_places=4)
-    date = models.DateField(auto_now_add=True)
+    date = models.DateField(default=timezone.localdate)
 
     class Meta:
         verbose_name = 'Exchange Rate'
         verbose_name_plural = 'Exchange Rates'
+        indexes = [
+            models.Index(fields=['currency', 'date']),
+        ]
 
     def __str__(self):
         return f"{self.currency} - {self.rate}"
@@ -197,9 +255,140 @@ class AdPrice(models.Model):
     class Meta:
         verbose_name = 'Ad Price'
         verbose_name_plural = 'Ad Prices'
+        constraints = [
+            models.UniqueConstraint(fields=['ad', 'currency'], name='unique_ad_price_currency'),
+        ]
+        indexes = [
+            models.Index(fields=['currency', 'price', 'ad']),
+        ]
 
     def __str__(self):
         return f"{self.ad} - {self.currency} - {self.price}"
 
 
+class AdView(models.Model):
+    ad = models.ForeignKey(Ad, on_delete=models.CASCADE, related_name='views')
+    viewer = models.ForeignKey(CustomUser, null=True, blank=True, on_delete=models.SET_NULL)
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Ad View'
+        verbose_name_plural = 'Ad Views'
+        indexes = [
+            models.Index(fields=['ad', 'timestamp']),
+        ]
+
+    def __str__(self):
+        return f"{self.ad_id} - {self.timestamp}"
+
+
+class AdViewDaily(models.Model):
+    ad = models.ForeignKey(Ad, on_delete=models.CASCADE, related_name='daily_views')
+    date = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Ad View Daily'
+        verbose_name_plural = 'Ad Views Daily'
+        constraints = [
+            models.UniqueConstraint(fields=['ad', 'date'], name='unique_ad_view_daily'),
+        ]
+
+    def __str__(self):
+        return f"{self.ad_id} - {self.date} - {self.count}"
+
+
+class PriceAggregate(models.Model):
+    SCOPE_GLOBAL = 'global'
+    SCOPE_BRAND = 'brand'
+    SCOPE_REGION = 'region'
+
+    scope = models.CharField(max_length=16, choices=((SCOPE_GLOBAL, 'Global'), (SCOPE_BRAND, 'Brand'),
+                                                     (SCOPE_REGION, 'Region')))
+    key = models.CharField(max_length=255, blank=True, default='')
+    count = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=20, decimal_places=2, default=0)
 
+    class Meta:
+        verbose_name = 'Price Aggregate'
+        verbose_name_plural = 'Price Aggregates'
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='unique_price_aggregate'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.key} - {self.count}"
+
+    @property
+    def average(self):
+        if not self.count:
+            return None
+        return round(self.total / self.count, 2)
+
+
+class JobCheckpoint(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    version = models.CharField(max_length=255, blank=True, default='')
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Job Checkpoint'
+        verbose_name_plural = 'Job Checkpoints'
+
+    def __str__(self):
+        return f"{self.name} - {self.position}"
+
+
+class AdSearchTerm(models.Model):
+    term = models.CharField(max_length=64)
+    ad = models.ForeignKey(Ad, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        verbose_name = 'Ad Search Term'
+        verbose_name_plural = 'Ad Search Terms'
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'ad'], name='unique_ad_search_term'),
+        ]
+        indexes = [
+            models.Index(fields=['term', 'weight', 'ad']),
+        ]
+
+    def __str__(self):
+        return f"{self.term} - {self.ad_id}"
+
+
+class ModerationJob(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    ad = models.ForeignKey(Ad, on_delete=models.CASCADE, related_name='moderation_jobs')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    approved = models.BooleanField(null=True)
+    reason = models.CharField(max_length=255, blank=True, default='')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=64, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Moderation Job'
+        verbose_name_plural = 'Moderation Jobs'
+        indexes = [
+            models.Index(fields=['status', 'available_at', 'id']),
+            models.Index(fields=['locked_by']),
+            models.Index(fields=['ad', 'status']),
+        ]
+
+    def __str__(self):
+        return f"Moderation of ad #{self.ad_id} - {self.status}"
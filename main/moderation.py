@@ -0,0 +1,154 @@
+import time
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from main.models import Ad, ModerationJob
+from main.search import tokenize
+
+BANNED_WORDS = frozenset({
+    'fuck', 'shit', 'bitch', 'asshole', 'scam',
+    'блять', 'бля', 'сука', 'хуй', 'пизда', 'нахуй',
+})
+MAX_ATTEMPTS = 5
+RETRY_DELAY = timedelta(seconds=30)
+LEASE = timedelta(minutes=5)
+RELEASE_INTERVAL = 60
+
+
+def banned_words():
+    return BANNED_WORDS | frozenset(word.casefold() for word in getattr(settings, 'MODERATION_BANNED_WORDS', ()))
+
+
+def check_ad(title, description, banned=None):
+    """Return (approved, reason) for an ad's text."""
+    banned = banned_words() if banned is None else banned
+    found = sorted(set(tokenize(f'{title} {description}')) & banned)
+    if found:
+        return False, f'banned words: {", ".join(found)}'[:255]
+    if not tokenize(title):
+        return False, 'empty title'
+    return True, ''
+
+
+def enqueue(ad_ids):
+    """Queue moderation for ads that do not already have a pending job."""
+    ad_ids = set(ad_ids)
+    pending = set(ModerationJob.objects
+                  .filter(ad_id__in=ad_ids, status=ModerationJob.STATUS_PENDING)
+                  .values_list('ad_id', flat=True))
+    ModerationJob.objects.bulk_create(
+        [ModerationJob(ad_id=ad_id) for ad_id in sorted(ad_ids - pending)], batch_size=1000,
+    )
+
+
+def release_stale_jobs(lease=LEASE):
+    """Return jobs whose worker died mid-batch to the queue."""
+    return (ModerationJob.objects
+            .filter(status=ModerationJob.STATUS_PROCESSING, locked_at__lt=timezone.now() - lease)
+            .update(status=ModerationJob.STATUS_PENDING, locked_by='', locked_at=None))
+
+
+def due_jobs(now=None):
+    return ModerationJob.objects.filter(status=ModerationJob.STATUS_PENDING, available_at__lte=now or timezone.now())
+
+
+def claim_jobs(worker, batch_size=100):
+    """
+    Atomically take up to `batch_size` due jobs for `worker`.
+
+    Backends with SKIP LOCKED let concurrent workers lock disjoint rows
+    without waiting. Elsewhere the ids are read first, since MySQL rejects
+    LIMIT in an IN subquery, and the UPDATE, tagged with a unique token,
+    only takes those still pending, so two workers never take the same row;
+    one that loses a race just claims fewer jobs.
+    """
+    now = timezone.now()
+    token = f'{worker}:{uuid.uuid4().hex[:12]}'
+    due = due_jobs(now).order_by('id')
+    claim = dict(status=ModerationJob.STATUS_PROCESSING, locked_by=token, locked_at=now, attempts=F('attempts') + 1)
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(due.select_for_update(skip_locked=True).values_list('id', flat=True)[:batch_size])
+            claimed = ModerationJob.objects.filter(id__in=ids).update(**claim) if ids else 0
+    else:
+        ids = list(due.values_list('id', flat=True)[:batch_size])
+        claimed = due_jobs(now).filter(id__in=ids).update(**claim) if ids else 0
+
+    if not claimed:
+        return []
+    return list(ModerationJob.objects.filter(locked_by=token, status=ModerationJob.STATUS_PROCESSING))
+
+
+def process_jobs(jobs, banned=None):
+    """Check the claimed ads, then activate the approved ones and close the jobs with a few set-based UPDATEs."""
+    banned = banned_words() if banned is None else banned
+    ads = Ad.objects.only('id', 'title', 'description').in_bulk({job.ad_id for job in jobs})
+    outcomes = defaultdict(list)
+    for job in jobs:
+        ad = ads.get(job.ad_id)
+        outcome = check_ad(ad.title, ad.description, banned) if ad else (False, 'ad deleted')
+        outcomes[outcome].append(job)
+
+    now = timezone.now()
+    with transaction.atomic():
+        for (approved, reason), outcome_jobs in outcomes.items():
+            if approved:
+                # An edit saved after the claim has queued a new job; leave that ad inactive for it.
+                (Ad.objects
+                 .filter(pk__in=[job.ad_id for job in outcome_jobs])
+                 .exclude(moderation_jobs__status=ModerationJob.STATUS_PENDING)
+                 .update(is_active=True))
+            (ModerationJob.objects
+             .filter(pk__in=[job.pk for job in outcome_jobs])
+             .update(status=ModerationJob.STATUS_DONE, approved=approved, reason=reason, locked_at=now))
+    return len(jobs)
+
+
+def fail_jobs(jobs, error):
+    for job in jobs:
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = ModerationJob.STATUS_FAILED
+        else:
+            job.status = ModerationJob.STATUS_PENDING
+            job.available_at = timezone.now() + RETRY_DELAY * job.attempts
+        job.reason = str(error)[:255]
+        job.locked_by = ''
+    ModerationJob.objects.bulk_update(jobs, ['status', 'available_at', 'reason', 'locked_by'])
+
+
+def run_worker(worker, batch_size=100, poll_interval=1.0, stop=None, once=False, release_interval=RELEASE_INTERVAL):
+    """
+    Claim and process batches until `stop` is set, or until the queue is empty with `once`.
+    Every `release_interval` seconds the worker also requeues the expired leases of workers that died.
+    """
+    processed = 0
+    banned = banned_words()
+    next_release = time.monotonic() + release_interval
+    while not (stop and stop.is_set()):
+        try:
+            if time.monotonic() >= next_release:
+                release_stale_jobs()
+                next_release = time.monotonic() + release_interval
+            jobs = claim_jobs(worker, batch_size)
+        except DatabaseError:
+            # Lock timeouts and dropped connections are transient for a poller.
+            time.sleep(poll_interval)
+            continue
+        if not jobs:
+            if not once:
+                time.sleep(poll_interval)
+            elif not due_jobs().exists():
+                break
+            continue
+        try:
+            processed += process_jobs(jobs, banned)
+        except Exception as error:
+            fail_jobs(jobs, error)
+    return processed
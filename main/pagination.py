@@ -0,0 +1,157 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks on indexed columns instead of counting
+    offsets, so every page costs the same as the first one.
+
+    Views choose their orderings with a `cursor_orderings` dict mapping the
+    `?ordering=` value to a tuple of fields; the first entry is the default
+    and every tuple must end with a unique column such as id.
+    """
+
+    page_size = api_settings.PAGE_SIZE or 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    default_orderings = {'id': ('id',)}
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.build_page(list(self.page_queryset(queryset, request, view)))
+
+    def page_queryset(self, queryset, request, view=None):
+        """
+        The unevaluated queryset for the requested page plus one look-ahead
+        row; evaluate it (sync or async) and pass the rows to build_page().
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering_key, self.ordering = self.get_ordering(request, view)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+
+        self.cursor = self.decode_cursor(request, queryset.model)
+        self.reverse = bool(self.cursor and self.cursor['reverse'])
+        ordering = [self._flip(field) for field in self.ordering] if self.reverse else list(self.ordering)
+
+        if self.cursor:
+            queryset = queryset.filter(self._seek(ordering, self.cursor['values']))
+        return queryset.order_by(*ordering)[:self.page_size + 1]
+
+    def build_page(self, results):
+        cursor, reverse = self.cursor, self.reverse
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_position = self.previous_position = None
+        if results:
+            if has_more or reverse:
+                self.next_position = self._position(results[-1])
+            if (has_more and reverse) or (cursor and not reverse):
+                self.previous_position = self._position(results[0])
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_ordering(self, request, view):
+        orderings = getattr(view, 'cursor_orderings', None) or self.default_orderings
+        key = request.query_params.get(self.ordering_query_param)
+        if key not in orderings:
+            key = next(iter(orderings))
+        return key, tuple(orderings[key])
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode() + b'=' * (-len(encoded) % 4)))
+            if payload['o'] != self.ordering_key or len(payload['v']) != len(self.fields):
+                raise ValueError
+            values = [model._meta.get_field(field).to_python(value)
+                      for field, value in zip(self.fields, payload['v'])]
+            return {'values': values, 'reverse': bool(payload.get('r'))}
+        except (binascii.Error, KeyError, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, values, reverse):
+        payload = {'o': self.ordering_key, 'v': values}
+        if reverse:
+            payload['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+        url = replace_query_param(self.base_url, self.cursor_query_param, encoded.rstrip('='))
+        return replace_query_param(url, self.ordering_query_param, self.ordering_key)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_paginated_data(self, data):
+        return OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def _position(self, instance):
+        values = []
+        for field in self.fields:
+            value = getattr(instance, field)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        return values
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+    @staticmethod
+    def _seek(ordering, values):
+        # (a, b) > (x, y) expands to a > x OR (a = x AND b > y).
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
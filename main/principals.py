@@ -0,0 +1,73 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from main.versions import bump_version_on_commit, get_version
+
+
+def principal_version_name(user_id):
+    return f'principal:{user_id}'
+
+
+def get_principal_version(user_id):
+    return get_version(principal_version_name(user_id))
+
+
+class PrincipalCache:
+    """
+    Per-process LRU of authenticated users with a TTL.
+
+    Entries are tagged with the user's principal version stamp. A user or
+    role change bumps it once committed, and the stamp lives in the shared
+    default cache, so the next lookup misses in this process at once and in
+    every other one within VERSION_CHECK_INTERVAL seconds. The TTL only
+    bounds staleness if that cache is lost.
+    """
+
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            cached_version, expires_at, user = entry
+            if cached_version != version or expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+        return copy.copy(user)
+
+    def set(self, user_id, version, user):
+        with self._lock:
+            self._entries[user_id] = (version, time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(
+    max_size=getattr(settings, 'PRINCIPAL_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'PRINCIPAL_CACHE_TTL', 60),
+)
+
+
+def invalidate_principals(user_ids):
+    for user_id in user_ids:
+        principal_cache.invalidate(user_id)
+        bump_version_on_commit(principal_version_name(user_id))
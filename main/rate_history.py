@@ -0,0 +1,178 @@
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+
+from main.currency import CENT, RATES_VERSION
+from main.models import ExchangeRate
+from main.versions import get_version
+
+# ExchangeRate.rate has four decimal places, so rates are stored exactly as scaled integers.
+RATE_PLACES = ExchangeRate._meta.get_field('rate').decimal_places
+SCALE = 10 ** RATE_PLACES
+MAX_DAYS = 3 * 366
+
+
+def unscale(scaled):
+    """A scaled rate as a Decimal with the rate's four places, e.g. 9000 -> Decimal('0.9000')."""
+    return Decimal(scaled).scaleb(-RATE_PLACES)
+
+
+ONE = unscale(SCALE)
+
+
+class RateSeries:
+    """
+    The rates of one currency as two parallel arrays sorted by day: date
+    ordinals and scaled integer rates. A rate holds from its day until the
+    next one; several rates on one day keep the last inserted.
+    """
+
+    __slots__ = ('days', 'rates')
+
+    def __init__(self):
+        self.days = array('l')
+        self.rates = array('q')
+
+    def add(self, day, rate):
+        ordinal = day.toordinal()
+        scaled = int(rate * SCALE)
+        index = bisect_right(self.days, ordinal)
+        if index and self.days[index - 1] == ordinal:
+            self.rates[index - 1] = scaled
+        elif index == len(self.days):
+            self.days.append(ordinal)
+            self.rates.append(scaled)
+        else:
+            self.days.insert(index, ordinal)
+            self.rates.insert(index, scaled)
+
+    def scaled_on(self, day):
+        index = bisect_right(self.days, day.toordinal())
+        return self.rates[index - 1] if index else None
+
+    def rate_on(self, day):
+        scaled = self.scaled_on(day)
+        return None if scaled is None else unscale(scaled)
+
+    def scaled_daily(self, start, days):
+        """Scaled rates for `days` consecutive days from `start` in one pass; None before the first rate."""
+        ordinal = start.toordinal()
+        index = bisect_right(self.days, ordinal) - 1
+        count = len(self.days)
+        result = []
+        for offset in range(days):
+            while index + 1 < count and self.days[index + 1] <= ordinal + offset:
+                index += 1
+            result.append(self.rates[index] if index >= 0 else None)
+        return result
+
+    def changes(self, start, end):
+        """(day, rate) pairs in force during [start, end], beginning with the one in force on `start`."""
+        first = max(bisect_right(self.days, start.toordinal()) - 1, 0)
+        last = bisect_left(self.days, end.toordinal() + 1)
+        return [(date.fromordinal(self.days[index]), unscale(self.rates[index]))
+                for index in range(first, last)]
+
+
+class BaseSeries:
+    """Rates are quoted per unit of the base currency, so its own rate is 1 on every day."""
+
+    def scaled_on(self, day):
+        return SCALE
+
+    def rate_on(self, day):
+        return ONE
+
+    def scaled_daily(self, start, days):
+        return [SCALE] * days
+
+    def changes(self, start, end):
+        return [(start, ONE)]
+
+
+class RateHistory:
+    def __init__(self, version=None):
+        self.version = version
+        self.series = {}
+
+    def load(self):
+        """Add every ExchangeRate row, in (date, id) order."""
+        rows = (ExchangeRate.objects
+                .order_by('date', 'id')
+                .values_list('currency__name', 'date', 'rate'))
+        for currency, day, rate in rows:
+            self.series.setdefault(currency, RateSeries()).add(day, rate)
+        return self
+
+    @property
+    def currencies(self):
+        return tuple(sorted(set(self.series) | {settings.PRICE_BASE_CURRENCY}))
+
+    def get(self, currency):
+        if currency == settings.PRICE_BASE_CURRENCY:
+            return BaseSeries()
+        return self.series.get(currency)
+
+    def rates_on(self, day):
+        rates = {}
+        for currency in self.currencies:
+            rate = self.get(currency).rate_on(day)
+            if rate is not None:
+                rates[currency] = rate
+        return rates
+
+    def price_history(self, price, currency, targets, start, days):
+        """
+        The price converted into each target currency on each of `days`
+        consecutive days from `start`, as {target: [price or None, ...]}.
+        Every series is walked once, so a year costs one pass per currency.
+        """
+        source = self.get(currency)
+        source_rates = source.scaled_daily(start, days) if source else [None] * days
+        price = Decimal(price)
+
+        history = {}
+        for target in targets:
+            series = self.get(target)
+            target_rates = series.scaled_daily(start, days) if series else [None] * days
+            history[target] = [
+                (price * target_rate / source_rate).quantize(CENT) if target_rate and source_rate else None
+                for target_rate, source_rate in zip(target_rates, source_rates)
+            ]
+        return history
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_rate_history():
+    """
+    The process-wide RateHistory, reloaded whenever RATES_VERSION changes.
+    The version is bumped on commit, so a reload sees every row it stands
+    for; reading all rows again, rather than those above the last id seen,
+    also picks up rates that committed out of id order. Rates are daily,
+    so the whole table stays small.
+    """
+    global _history
+    version = get_version(RATES_VERSION)
+    history = _history
+    if history is not None and history.version == version:
+        return history
+
+    with _history_lock:
+        if _history is None or _history.version != version:
+            _history = RateHistory(version).load()
+        return _history
+
+
+def date_range(start, end):
+    return (end - start).days + 1
+
+
+def days_from(start, days):
+    return [start + timedelta(days=offset) for offset in range(days)]
@@ -0,0 +1,90 @@
+import time
+
+from django.db import connection, transaction
+
+from main.currency import get_rate_snapshot
+from main.models import Ad, AdPrice, JobCheckpoint
+from main.statistics import rebuild_price_aggregates
+
+CHECKPOINT_NAME = 'reprice_ads'
+
+
+def build_ad_prices(ad_ids, prices, currencies, snapshot):
+    """Unsaved AdPrice rows for every currency that has a rate and a Currency row."""
+    targets = [currency for currency in snapshot.currencies if currency in snapshot.currency_ids]
+    converted = snapshot.convert(prices, currencies, targets)
+    return [
+        AdPrice(ad_id=ad_id, currency_id=snapshot.currency_ids[target], price=price)
+        for target, target_prices in converted.items()
+        for ad_id, price in zip(ad_ids, target_prices)
+        if price is not None
+    ]
+
+
+def reprice_chunk(rows, snapshot):
+    """
+    Recompute AdPrice rows and Ad.base_price for a chunk of
+    (id, price, currency) tuples sorted by id. Returns the number of ads repriced.
+    """
+    ad_ids = [row[0] for row in rows]
+    prices = [row[1] for row in rows]
+    currencies = [row[2] for row in rows]
+    ad_prices = build_ad_prices(ad_ids, prices, currencies, snapshot)
+
+    # Rounded by the same snapshot code as edit_ad and the importer, not by SQL ROUND.
+    ads = [Ad(pk=ad_id, base_price=base_price)
+           for ad_id, base_price in zip(ad_ids, snapshot.to_base(prices, currencies))]
+    # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target; it uses the unique constraint.
+    conflict_target = {}
+    if connection.features.supports_update_conflicts_with_target:
+        conflict_target['unique_fields'] = ['ad', 'currency']
+
+    with transaction.atomic():
+        AdPrice.objects.bulk_create(
+            ad_prices,
+            batch_size=1000,
+            update_conflicts=True,
+            update_fields=['price'],
+            **conflict_target,
+        )
+        Ad.objects.bulk_update(ads, ['base_price'], batch_size=1000)
+    return len(rows)
+
+
+def reprice_ads(chunk_size=1000, resume=False, progress=None):
+    """
+    Stream every ad in primary-key order and rewrite its prices in all
+    currencies from the current rate snapshot.
+
+    Progress is checkpointed after each chunk together with the rate
+    signature, so an interrupted run can resume as long as the rates did
+    not change in between. `progress` is called with (processed, last_id, elapsed).
+    """
+    snapshot = get_rate_snapshot()
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+    if resume and checkpoint.version == snapshot.signature:
+        last_id = checkpoint.position
+    else:
+        last_id = 0
+        checkpoint.version = snapshot.signature
+        checkpoint.position = 0
+        checkpoint.save()
+
+    processed = 0
+    started = time.monotonic()
+    while True:
+        rows = list(Ad.objects
+                    .filter(pk__gt=last_id)
+                    .order_by('pk')
+                    .values_list('id', 'price', 'currency')[:chunk_size])
+        if not rows:
+            break
+
+        processed += reprice_chunk(rows, snapshot)
+        last_id = rows[-1][0]
+        JobCheckpoint.objects.filter(pk=checkpoint.pk).update(position=last_id)
+        if progress:
+            progress(processed, last_id, time.monotonic() - started)
+
+    rebuild_price_aggregates()
+    return processed, time.monotonic() - started
@@ -0,0 +1,169 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+from django.utils.module_loading import import_string
+
+from main.models import CarBrand, CarMake, CarModels, Currency, ExchangeRate
+from main.versions import bump_version, get_version
+
+# Which cached endpoint groups render data from each model.
+CACHE_GROUPS = {
+    CarBrand: ('car-brands', 'car-models'),
+    CarModels: ('car-models',),
+    CarMake: ('car-makes',),
+    Currency: ('currencies', 'exchange-rates'),
+    ExchangeRate: ('exchange-rates',),
+}
+
+
+class CachedResponse:
+    __slots__ = ('body', 'content_type', 'etag', 'last_modified')
+
+    def __init__(self, body, content_type, last_modified):
+        self.body = body
+        self.content_type = content_type
+        self.etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.last_modified = int(last_modified)
+
+    def is_fresh(self, request):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            return if_none_match.strip() == '*' or self.etag in [tag.strip() for tag in if_none_match.split(',')]
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        return if_modified_since is not None and self.last_modified <= if_modified_since
+
+    def to_response(self, request):
+        if self.is_fresh(request):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(self.body, content_type=self.content_type)
+        response['ETag'] = self.etag
+        response['Last-Modified'] = http_date(self.last_modified)
+        return response
+
+
+class LocMemResponseCache:
+    """
+    In-process LRU of rendered responses. Group versions are main.versions
+    stamps in the shared default cache, so a change bumps every worker's
+    groups; entries also expire after `timeout` seconds.
+    """
+
+    def __init__(self, max_entries=1024, timeout=300):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_version(self, group):
+        # Stamps are in nanoseconds; versions double as Last-Modified seconds.
+        return get_version(f'response:{group}') / 10 ** 9
+
+    def bump_versions(self, groups):
+        for group in groups:
+            bump_version(f'response:{group}')
+
+
+class SharedResponseCache:
+    """Stores responses and versions in a Django cache alias shared by all workers."""
+
+    def __init__(self, alias='default', timeout=300, key_prefix='response'):
+        self.cache = caches[alias]
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+
+    def get(self, key):
+        return self.cache.get(f'{self.key_prefix}:{key}')
+
+    def set(self, key, entry):
+        self.cache.set(f'{self.key_prefix}:{key}', entry, self.timeout)
+
+    def get_version(self, group):
+        version_key = f'{self.key_prefix}:version:{group}'
+        version = self.cache.get(version_key)
+        if version is None:
+            self.cache.add(version_key, time.time(), None)
+            version = self.cache.get(version_key)
+        return version
+
+    def bump_versions(self, groups):
+        now = time.time()
+        self.cache.set_many({f'{self.key_prefix}:version:{group}': now for group in groups}, None)
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                config = getattr(settings, 'RESPONSE_CACHE', {})
+                backend = import_string(config.get('BACKEND', 'main.response_cache.LocMemResponseCache'))
+                _response_cache = backend(**config.get('OPTIONS', {}))
+    return _response_cache
+
+
+class CachedResponseMixin:
+    """
+    Serves list/retrieve responses as pre-rendered bytes with ETag and
+    Last-Modified headers, answering 304 when the client copy is current.
+
+    Entries are keyed by the group's version, which is bumped by the model
+    signals in CACHE_GROUPS, so a change invalidates only its own groups.
+    """
+
+    response_cache_group = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        cache = get_response_cache()
+        version = cache.get_version(self.response_cache_group)
+        key = f'{self.response_cache_group}:{version}:{request.accepted_media_type}:{request.get_full_path()}'
+
+        entry = cache.get(key)
+        if entry is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+            renderer = request.accepted_renderer
+            body = renderer.render(response.data, request.accepted_media_type, self.get_renderer_context())
+            content_type = renderer.media_type
+            if renderer.charset:
+                content_type = f'{content_type}; charset={renderer.charset}'
+            entry = CachedResponse(body, content_type, version)
+            cache.set(key, entry)
+        return entry.to_response(request)
@@ -0,0 +1,142 @@
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from django.db import connection, transaction
+from django.core.cache import cache
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+
+from main.models import Ad, AdSearchTerm
+
+TERM_MAX_LENGTH = 64
+MAX_TERMS_PER_AD = 200
+MAX_WEIGHT = 255
+TITLE_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+DOCUMENT_COUNT_TTL = 300
+
+STOP_WORDS = frozenset({
+    'a', 'an', 'and', 'for', 'in', 'is', 'of', 'on', 'or', 'the', 'to', 'with',
+    'в', 'з', 'і', 'й', 'та', 'на', 'до', 'для', 'и', 'с', 'по', 'не',
+})
+
+_word = re.compile(r'\w+')
+
+
+def normalize(text):
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def tokenize(text):
+    return [word[:TERM_MAX_LENGTH] for word in _word.findall(normalize(text or ''))
+            if len(word) > 1 and word not in STOP_WORDS]
+
+
+def ad_terms(title, description):
+    weights = Counter()
+    for term in tokenize(title):
+        weights[term] += TITLE_WEIGHT
+    for term in tokenize(description):
+        weights[term] += DESCRIPTION_WEIGHT
+    return {term: min(weight, MAX_WEIGHT) for term, weight in weights.most_common(MAX_TERMS_PER_AD)}
+
+
+def index_ads(ads):
+    """Replace the postings of the given ads with freshly tokenized ones."""
+    ads = list(ads)
+    postings = [
+        (term, ad.pk, weight)
+        for ad in ads
+        for term, weight in ad_terms(ad.title, ad.description).items()
+    ]
+    with transaction.atomic():
+        AdSearchTerm.objects.filter(ad_id__in=[ad.pk for ad in ads]).delete()
+        _insert_postings(postings)
+    return len(postings)
+
+
+def _insert_postings(postings, batch_size=5000):
+    # Postings outnumber ads ~20 to 1; building model instances for
+    # bulk_create cost more than the inserts themselves.
+    quote = connection.ops.quote_name
+    columns = [AdSearchTerm._meta.get_field(name).column for name in ('term', 'ad', 'weight')]
+    sql = 'INSERT INTO {} ({}) VALUES (%s, %s, %s)'.format(
+        quote(AdSearchTerm._meta.db_table), ', '.join(quote(column) for column in columns),
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(postings), batch_size):
+            cursor.executemany(sql, postings[start:start + batch_size])
+
+
+def index_ad(ad):
+    return index_ads([ad])
+
+
+def rebuild_search_index(chunk_size=1000, progress=None):
+    indexed = 0
+    last_id = 0
+    while True:
+        ads = list(Ad.objects.filter(pk__gt=last_id).order_by('pk').only('id', 'title', 'description')[:chunk_size])
+        if not ads:
+            return indexed
+        index_ads(ads)
+        indexed += len(ads)
+        last_id = ads[-1].pk
+        if progress:
+            progress(indexed, last_id)
+
+
+def search_ads(query, queryset=None, limit=20, offset=0):
+    """
+    Rank ads matching every term of `query` and return [(ad_id, score)].
+
+    Scores are the sum of term weight times inverse document frequency.
+    Candidate ads can be narrowed with a filtered Ad `queryset`; the search
+    reads only the (term, ad) postings and never scans the text columns.
+    """
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return []
+
+    frequencies = dict(AdSearchTerm.objects
+                       .filter(term__in=terms)
+                       .values_list('term')
+                       .annotate(count=Count('id'))
+                       .order_by())
+    if len(frequencies) < len(terms):
+        return []
+
+    total = cache.get_or_set('search:ad_count', Ad.objects.count, DOCUMENT_COUNT_TTL)
+    idf = {term: math.log(1 + total / frequencies[term]) for term in terms}
+
+    if len(terms) == 1:
+        # The score is proportional to the weight, so the (term, weight, ad)
+        # index yields the top results without reading every posting.
+        term = terms[0]
+        postings = AdSearchTerm.objects.filter(term=term)
+        if queryset is not None:
+            postings = postings.filter(ad__in=queryset.order_by().values('pk'))
+        rows = postings.order_by('-weight', '-ad_id').values_list('ad_id', 'weight')[offset:offset + limit]
+        return [(ad_id, weight * idf[term]) for ad_id, weight in rows]
+
+    # Only ads holding the rarest term can match, so drive the scan from it.
+    rarest = min(terms, key=frequencies.get)
+    candidates = AdSearchTerm.objects.filter(term=rarest)
+    if queryset is not None:
+        candidates = candidates.filter(ad__in=queryset.order_by().values('pk'))
+
+    rows = (AdSearchTerm.objects
+            .filter(term__in=terms, ad__in=candidates.values('ad_id'))
+            .values('ad_id')
+            .annotate(matched=Count('term'), score=Sum(F('weight') * _idf_case(idf)))
+            .filter(matched=len(terms))
+            .order_by('-score', '-ad_id')
+            .values_list('ad_id', 'score'))[offset:offset + limit]
+    return list(rows)
+
+
+def _idf_case(idf):
+    return Case(*[When(term=term, then=Value(weight)) for term, weight in idf.items()],
+                default=Value(0.0), output_field=FloatField())
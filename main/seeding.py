@@ -0,0 +1,205 @@
+import random
+import time
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import NotSupportedError, connection, transaction
+from django.utils import timezone
+
+from main.currency import get_rate_snapshot
+from main.models import Ad, AdPrice, AdViewDaily, CarBrand, CarMake, CarModels, Conversation, \
+    ConversationParticipant, Currency, CustomUser, ExchangeRate, Message
+from main.repricing import build_ad_prices
+from main.search import index_ads
+from main.statistics import rebuild_price_aggregates
+
+CATALOG = {
+    'Audi': ['A3', 'A4', 'A6', 'Q5', 'Q7'],
+    'BMW': ['X3', 'X5', '320', '520', 'i3'],
+    'Chevrolet': ['Aveo', 'Cruze', 'Lacetti'],
+    'Daewoo': ['Lanos', 'Matiz', 'Nexia'],
+    'Ford': ['Focus', 'Fiesta', 'Mondeo', 'Kuga'],
+    'Honda': ['Accord', 'Civic', 'CR-V'],
+    'Hyundai': ['Accent', 'Elantra', 'Tucson', 'Santa Fe'],
+    'Kia': ['Ceed', 'Rio', 'Sportage', 'Sorento'],
+    'Mazda': ['3', '6', 'CX-5'],
+    'Mercedes-Benz': ['C-Class', 'E-Class', 'GLC', 'Sprinter'],
+    'Mitsubishi': ['Lancer', 'Outlander', 'Pajero'],
+    'Nissan': ['Leaf', 'Qashqai', 'X-Trail', 'Juke'],
+    'Opel': ['Astra', 'Vectra', 'Zafira', 'Insignia'],
+    'Peugeot': ['308', '3008', 'Partner'],
+    'Renault': ['Logan', 'Megane', 'Duster', 'Kangoo'],
+    'Škoda': ['Octavia', 'Fabia', 'Superb', 'Kodiaq'],
+    'Tesla': ['Model 3', 'Model S', 'Model Y'],
+    'Toyota': ['Camry', 'Corolla', 'RAV4', 'Land Cruiser', 'Prius'],
+    'Volkswagen': ['Golf', 'Passat', 'Jetta', 'Tiguan', 'Touareg'],
+    'ЗАЗ': ['Sens', 'Lanos', 'Forza'],
+}
+REGIONS = ('Kyiv', 'Lviv', 'Odesa', 'Kharkiv', 'Dnipro', 'Zaporizhzhia', 'Vinnytsia', 'Poltava', 'Chernihiv',
+           'Ivano-Frankivsk', 'Ternopil', 'Uzhhorod', 'Rivne', 'Lutsk', 'Zhytomyr', 'Cherkasy', 'Sumy')
+RATES = {'USD': Decimal('1'), 'EUR': Decimal('0.92'), 'UAH': Decimal('41.2')}
+CURRENCY_WEIGHTS = {'USD': 60, 'UAH': 25, 'EUR': 15}
+WORDS = (
+    'diesel petrol hybrid electric automatic manual sedan hatchback wagon coupe crossover leather navigation '
+    'camera sunroof xenon led alloy wheels winter tyres service history garage owner accident free imported '
+    'warranty cruise control heated seats parking sensors towbar metallic black white silver blue red grey '
+    'sport comfort premium family economic first registration customs cleared new battery'
+).split()
+PASSWORD = 'benchmark'
+
+
+def seed_catalog():
+    brands = {brand.name: brand for brand in CarBrand.objects.all()}
+    missing = [CarBrand(name=name) for name in CATALOG if name not in brands]
+    for brand in CarBrand.objects.bulk_create(missing):
+        brands[brand.name] = brand
+
+    existing = set(CarModels.objects.values_list('brand__name', 'name'))
+    CarModels.objects.bulk_create([
+        CarModels(brand=brands[brand], name=name)
+        for brand, names in CATALOG.items() for name in names if (brand, name) not in existing
+    ])
+    makes = set(CarMake.objects.values_list('name', flat=True))
+    CarMake.objects.bulk_create([CarMake(name=name) for name in CATALOG if name not in makes])
+
+    for name, rate in RATES.items():
+        currency, _ = Currency.objects.get_or_create(name=name)
+        if not ExchangeRate.objects.filter(currency=currency).exists():
+            ExchangeRate.objects.create(currency=currency, rate=rate)
+    return list(CarModels.objects.select_related('brand'))
+
+
+def seed_users(count, rng, premium_ratio=0.1):
+    """Users share one password hash so seeding does not spend minutes in the hasher."""
+    password = make_password(PASSWORD)
+    offset = CustomUser.objects.count()
+    users = [
+        CustomUser(email=f'user{offset + index}@example.com', password=password,
+                   is_premium=rng.random() < premium_ratio)
+        for index in range(count)
+    ]
+    for user in users:
+        user.account_type = 'premium' if user.is_premium else 'basic'
+    CustomUser.objects.bulk_create(users, batch_size=1000)
+    return list(CustomUser.objects.values_list('id', flat=True))
+
+
+def build_ads(count, rng, car_models, user_ids, now):
+    currencies = list(CURRENCY_WEIGHTS)
+    weights = list(CURRENCY_WEIGHTS.values())
+    ads = []
+    for _ in range(count):
+        car_model = rng.choice(car_models)
+        year = rng.randint(1998, 2024)
+        currency = rng.choices(currencies, weights)[0]
+        price_usd = Decimal(int(rng.lognormvariate(9.4, 0.7)))
+        ads.append(Ad(
+            title=f'{car_model.brand.name} {car_model.name} {year}',
+            description=' '.join(rng.choices(WORDS, k=rng.randint(8, 30))),
+            price=(price_usd * RATES[currency]).quantize(Decimal('1')),
+            currency=currency,
+            car_model=car_model,
+            seller_id=rng.choice(user_ids),
+            region=rng.choice(REGIONS),
+            is_active=rng.random() < 0.9,
+            created_at=now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600)),
+        ))
+    return ads
+
+
+def build_views(ads, rng, today, ratio=0.2, days=3):
+    views = Counter()
+    for ad in ads:
+        if rng.random() < ratio:
+            for _ in range(days):
+                views[(ad.pk, today - timedelta(days=rng.randint(0, 29)))] += rng.randint(1, 20)
+    return [AdViewDaily(ad_id=ad_id, date=day, count=count) for (ad_id, day), count in views.items()]
+
+
+def seed_conversations(ads, rng, user_ids, ratio=0.1, max_messages=5):
+    """Conversations with messages and the denormalized inbox rows send_message would have written."""
+    chosen = [ad for ad in ads if rng.random() < ratio]
+    conversations = []
+    for ad in chosen:
+        buyer_id = rng.choice(user_ids)
+        if buyer_id != ad.seller_id:
+            conversations.append(Conversation(buyer_id=buyer_id, seller_id=ad.seller_id, ad=ad))
+    Conversation.objects.bulk_create(conversations)
+
+    messages = []
+    for conversation in conversations:
+        started = conversation.ad.created_at + timedelta(hours=rng.randint(1, 72))
+        for index in range(rng.randint(1, max_messages)):
+            sender_id = conversation.buyer_id if index % 2 == 0 else conversation.seller_id
+            messages.append(Message(conversation_id=conversation.pk, sender_id=sender_id,
+                                    body=' '.join(rng.choices(WORDS, k=rng.randint(3, 12))),
+                                    created_at=started + timedelta(minutes=10 * index)))
+    Message.objects.bulk_create(messages, batch_size=1000)
+
+    last = {}
+    for message in messages:
+        last[message.conversation_id] = message
+    counts = Counter(message.conversation_id for message in messages)
+    participants = []
+    for conversation in conversations:
+        message = last[conversation.pk]
+        conversation.last_message = message
+        conversation.last_activity = message.created_at
+        conversation.message_count = counts[conversation.pk]
+        for user_id in (conversation.buyer_id, conversation.seller_id):
+            participants.append(ConversationParticipant(
+                conversation_id=conversation.pk, user_id=user_id, last_activity=message.created_at,
+                unread_count=0 if user_id == message.sender_id else rng.randint(0, 2),
+            ))
+    Conversation.objects.bulk_update(conversations, ['last_message', 'last_activity', 'message_count'],
+                                     batch_size=500)
+    ConversationParticipant.objects.bulk_create(participants, batch_size=1000)
+    return len(conversations), len(messages)
+
+
+def seed(ads=10000, users=None, seed=42, chunk_size=5000, search_index=True, progress=None):
+    """
+    Bulk-insert a realistic data set: the catalog, users, ads with their
+    AdPrice rows, daily views and conversations, then the derived price
+    aggregates. Every chunk is one transaction, so memory stays flat from
+    10k to 1M ads. Returns a dict of row counts.
+    """
+    if not connection.features.can_return_rows_from_bulk_insert:
+        raise NotSupportedError('Seeding needs a backend that returns ids from bulk inserts (SQLite, PostgreSQL).')
+    rng = random.Random(seed)
+    started = time.monotonic()
+    car_models = seed_catalog()
+    user_ids = seed_users(users if users is not None else max(ads // 20, 10), rng)
+    snapshot = get_rate_snapshot()
+    now = timezone.now()
+    today = timezone.localdate(now)
+    totals = Counter()
+
+    while totals['ads'] < ads:
+        chunk = build_ads(min(chunk_size, ads - totals['ads']), rng, car_models, user_ids, now)
+        base_prices = snapshot.to_base([ad.price for ad in chunk], [ad.currency for ad in chunk])
+        for ad, base_price in zip(chunk, base_prices):
+            ad.base_price = base_price
+
+        with transaction.atomic():
+            Ad.objects.bulk_create(chunk, batch_size=1000)
+            ad_prices = build_ad_prices([ad.pk for ad in chunk], [ad.price for ad in chunk],
+                                        [ad.currency for ad in chunk], snapshot)
+            AdPrice.objects.bulk_create(ad_prices, batch_size=1000)
+            views = build_views(chunk, rng, today)
+            AdViewDaily.objects.bulk_create(views, batch_size=1000)
+            conversations, messages = seed_conversations(chunk, rng, user_ids)
+            if search_index:
+                totals['search_terms'] += index_ads(chunk)
+
+        totals.update(ads=len(chunk), ad_prices=len(ad_prices), view_days=len(views),
+                      conversations=conversations, messages=messages)
+        if progress:
+            progress(totals['ads'], time.monotonic() - started)
+
+    rebuild_price_aggregates()
+    totals['users'] = len(user_ids)
+    totals['seconds'] = round(time.monotonic() - started, 1)
+    return dict(totals)
@@ -1,32 +1,46 @@
 from rest_framework import serializers
+from django.db.models import Prefetch
+from django.db.models.manager import BaseManager
 from main.models import CustomUser, CarBrand, CarModels, Ad, Role, \
-    Conversation, Manager, CarMake, MissingCarMakeRequest, Currency, ExchangeRate, AdPrice
-from datetime import date, timedelta
-from django.db.models import Avg
+    Conversation, Manager, CarMake, MissingCarMakeRequest, Currency, ExchangeRate, AdPrice, ConversationParticipant, \
+    Message
+from main.view_tracking import get_view_statistics, get_view_statistics_bulk
+from main.statistics import get_average_prices, get_average_prices_bulk
 from rest_framework_simplejwt.tokens import RefreshToken
+from main.jwt import add_principal_claims
+from main.instrumentation import InstrumentedSerializerMixin
+from main.fieldsets import DynamicFieldsMixin, expands, includes, nested_expand, nested_fields
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(InstrumentedSerializerMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ('id', 'email', 'is_premium', 'account_type', 'roles')
 
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None, expand=None):
+        return queryset.prefetch_related('roles') if includes(fields, 'roles') else queryset
 
-class CarBrandSerializer(serializers.ModelSerializer):
+
+class CarBrandSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CarBrand
         fields = ('id', 'name')
 
 
-class CarModelSerializer(serializers.ModelSerializer):
+class CarModelSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     brand = CarBrandSerializer()
 
     class Meta:
         model = CarModels
         fields = ('id', 'name', 'brand')
 
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None, expand=None):
+        return queryset.select_related('brand') if expands(fields, expand, 'brand') else queryset
+
 
-class AdPriceSerializer(serializers.ModelSerializer):
+class AdPriceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     currency = serializers.StringRelatedField()
 
     class Meta:
@@ -34,32 +48,75 @@ class AdPriceSerializer(serializers.ModelSerializer):
         fields = ('id', 'currency', 'price')
 
 
-class AdSerializer(serializers.ModelSerializer):
+class AdListSerializer(InstrumentedSerializerMixin, serializers.ListSerializer):
+    def to_representation(self, data):
+        ads = list(data.all() if isinstance(data, BaseManager) else data)
+        # The async views fetch the statistics themselves and pass them in.
+        if self.child.with_statistics() and 'ad_statistics' not in self.context:
+            self.context['ad_statistics'] = (
+                get_view_statistics_bulk([ad.pk for ad in ads]),
+                get_average_prices_bulk([(ad.car_model.brand_id, ad.region) for ad in ads]),
+            )
+        return super().to_representation(ads)
+
+
+class AdSerializer(InstrumentedSerializerMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     car_model = CarModelSerializer()
     seller = UserSerializer()
     prices = AdPriceSerializer(many=True)
+    # The premium statistics are grouped by brand and region.
+    loaded_columns = ('region',)
 
     class Meta:
         model = Ad
-        fields = ('id', 'title', 'description', 'price', 'currency', 'car_model', 'seller', 'prices')
+        fields = ('id', 'title', 'description', 'price', 'currency', 'car_model', 'seller', 'prices', 'version')
+        list_serializer_class = AdListSerializer
+
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None, expand=None):
+        related, prefetches = [], []
+        if expands(fields, expand, 'car_model'):
+            car_model_fields, car_model_expand = nested_fields(fields, 'car_model'), nested_expand(expand, 'car_model')
+            related.append('car_model__brand' if expands(car_model_fields, car_model_expand, 'brand') else 'car_model')
+        elif includes(fields, 'statistics'):
+            related.append('car_model')
+        if expands(fields, expand, 'seller'):
+            related.append('seller')
+            if includes(nested_fields(fields, 'seller'), 'roles'):
+                prefetches.append('seller__roles')
+        if includes(fields, 'prices'):
+            if expands(fields, expand, 'prices'):
+                prices = AdPrice.objects.select_related('currency')
+            else:
+                prices = AdPrice.objects.only('id', 'ad')
+            prefetches.append(Prefetch('prices', queryset=prices))
+        return queryset.select_related(*related).prefetch_related(*prefetches)
+
+    def with_statistics(self):
+        request = self.context.get('request')
+        return bool(request and request.user.is_authenticated and request.user.is_premium
+                    and self.includes('statistics'))
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
 
-        user = self.context['request'].user
-        if user.is_authenticated and user.is_premium:
-            today = date.today()
-            week_ago = today - timedelta(days=7)
-            month_ago = today - timedelta(days=30)
+        if self.with_statistics():
+            if 'ad_statistics' in self.context:
+                views_by_ad, average_prices_by_ad = self.context['ad_statistics']
+                views = views_by_ad[instance.pk]
+                average_prices = average_prices_by_ad[(instance.car_model.brand_id, instance.region)]
+            else:
+                views = get_view_statistics(instance.pk)
+                average_prices = get_average_prices(instance.car_model.brand_id, instance.region)
 
             statistics = {
-                'views_total': instance.views_total,
-                'views_today': instance.views.filter(timestamp__date=today).count(),
-                'views_week': instance.views.filter(timestamp__date__range=[week_ago, today]).count(),
-                'views_month': instance.views.filter(timestamp__date__range=[month_ago, today]).count(),
-                'average_price_region': Ad.objects.filter(car_model__brand=instance.car_model.brand).aggregate(
-                    Avg('price')),
-                'average_price_ukraine': Ad.objects.all().aggregate(Avg('price'))
+                'views_total': views['total'],
+                'views_today': views['today'],
+                'views_week': views['week'],
+                'views_month': views['month'],
+                'average_price_brand': average_prices['brand'],
+                'average_price_region': average_prices['region'],
+                'average_price_ukraine': average_prices['ukraine'],
             }
 
             representation['statistics'] = statistics
@@ -67,60 +124,165 @@ class AdSerializer(serializers.ModelSerializer):
         return representation
 
 
-class AdPremiumSerializer(serializers.ModelSerializer):
+class AdPremiumSerializer(InstrumentedSerializerMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     statistics = serializers.SerializerMethodField()
+    loaded_columns = ('region',)
 
     class Meta:
         model = Ad
         fields = ('id', 'title', 'description', 'price', 'currency', 'car_model', 'seller', 'statistics')
 
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None, expand=None):
+        return queryset.select_related('car_model')
+
     def get_statistics(self, obj):
         return self.context['statistics']
 
 
-class RoleSerializer(serializers.ModelSerializer):
+class AdWriteSerializer(serializers.ModelSerializer):
+    """Input of ad edits; `version` is the one the client last read, for optimistic concurrency."""
+    version = serializers.IntegerField(required=False, min_value=1)
+
+    class Meta:
+        model = Ad
+        fields = ('title', 'description', 'price', 'currency', 'car_model', 'region', 'version')
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('car_model')
+
+
+class AdBatchSerializer(serializers.ListSerializer):
+    """
+    Validates every ad of a batch on its own: `item_errors` holds one error
+    dict per item (empty when valid) and invalid items validate to None.
+    Car models are loaded once for the whole batch.
+    """
+    max_items = 100
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError({'non_field_errors': ['Expected a list of ads.']})
+        if not data or len(data) > self.max_items:
+            raise serializers.ValidationError({'non_field_errors': [f'Send between 1 and {self.max_items} ads.']})
+
+        model_ids = set()
+        car_model_field = self.child.fields['car_model']
+        for item in data:
+            if isinstance(item, dict) and item.get('car_model') is not None:
+                # Coerced like the item will be, so "1" finds model 1; invalid ids fail in the item.
+                try:
+                    model_ids.add(car_model_field.to_internal_value(item['car_model']))
+                except serializers.ValidationError:
+                    pass
+        self.car_models = CarModels.objects.in_bulk(model_ids)
+        validated, self.item_errors = [], []
+        for item in data:
+            try:
+                validated.append(self.child.run_validation(item))
+                self.item_errors.append({})
+            except serializers.ValidationError as error:
+                validated.append(None)
+                self.item_errors.append(error.detail)
+        return validated
+
+
+class AdBatchItemSerializer(AdWriteSerializer):
+    car_model = serializers.IntegerField()
+
+    class Meta(AdWriteSerializer.Meta):
+        fields = ('title', 'description', 'price', 'currency', 'car_model', 'region')
+        list_serializer_class = AdBatchSerializer
+
+    def validate_car_model(self, value):
+        car_model = self.parent.car_models.get(value)
+        if car_model is None:
+            raise serializers.ValidationError(f'Invalid pk "{value}" - object does not exist.')
+        return car_model
+
+
+class RoleSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Role
         fields = '__all__'
 
 
-class ConversationSerializer(serializers.ModelSerializer):
+class ConversationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Conversation
         fields = ('id', 'buyer', 'seller', 'ad', 'created_at')
 
 
-class ManagerSerializer(serializers.ModelSerializer):
+class MessageSerializer(InstrumentedSerializerMixin, DynamicFieldsMixin, serializers.ModelSerializer):
+    body = serializers.CharField(max_length=5000, trim_whitespace=True)
+
+    class Meta:
+        model = Message
+        fields = ('id', 'conversation', 'sender', 'body', 'created_at')
+        read_only_fields = ('conversation', 'sender', 'created_at')
+
+
+class InboxEntrySerializer(InstrumentedSerializerMixin, DynamicFieldsMixin, serializers.ModelSerializer):
+    conversation = serializers.IntegerField(source='conversation_id')
+    ad = serializers.IntegerField(source='conversation.ad_id')
+    ad_title = serializers.CharField(source='conversation.ad.title')
+    counterpart = serializers.SerializerMethodField()
+    last_message = MessageSerializer(source='conversation.last_message', allow_null=True)
+
+    class Meta:
+        model = ConversationParticipant
+        fields = ('conversation', 'ad', 'ad_title', 'counterpart', 'unread_count', 'last_activity', 'last_message')
+
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None, expand=None):
+        related = ['conversation']
+        if includes(fields, 'ad_title'):
+            related.append('conversation__ad')
+        if expands(fields, expand, 'last_message'):
+            related.append('conversation__last_message')
+        return queryset.select_related(*related)
+
+    def get_counterpart(self, obj):
+        conversation = obj.conversation
+        return conversation.seller_id if obj.user_id == conversation.buyer_id else conversation.buyer_id
+
+
+class ManagerSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Manager
         fields = '__all__'
 
 
-class CarMakeSerializer(serializers.ModelSerializer):
+class CarMakeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CarMake
         fields = ('id', 'name')
 
 
-class MissingCarMakeRequestSerializer(serializers.ModelSerializer):
+class MissingCarMakeRequestSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = MissingCarMakeRequest
         fields = ('id', 'car_make', 'seller', 'created_at')
 
 
-class CurrencySerializer(serializers.ModelSerializer):
+class CurrencySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Currency
         fields = ('id', 'name')
 
 
-class ExchangeRateSerializer(serializers.ModelSerializer):
+class ExchangeRateSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     currency = CurrencySerializer()
 
     class Meta:
         model = ExchangeRate
         fields = ('id', 'currency', 'rate', 'date')
 
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None, expand=None):
+        return queryset.select_related('currency') if expands(fields, expand, 'currency') else queryset
+
 
 class TokenObtainSerializer(serializers.Serializer):
     email = serializers.EmailField()
@@ -134,7 +296,7 @@ class TokenObtainSerializer(serializers.Serializer):
             user = CustomUser.objects.filter(email=email).first()
 
             if user and user.check_password(password):
-                refresh = RefreshToken.for_user(user)
+                refresh = add_principal_claims(RefreshToken.for_user(user), user)
                 attrs['refresh'] = str(refresh)
                 attrs['access'] = str(refresh.access_token)
                 attrs['user'] = user
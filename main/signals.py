@@ -0,0 +1,104 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.db import transaction
+from django.dispatch import receiver
+
+from main import autocomplete, messaging, moderation, search, statistics
+from main.currency import RATES_VERSION
+from main.principals import invalidate_principals
+from main.models import Ad, CarBrand, CarMake, CarModels, Conversation, Currency, CustomUser, ExchangeRate, Role
+from main.response_cache import CACHE_GROUPS, get_response_cache
+from main.versions import bump_version_on_commit
+
+
+@receiver(pre_save, sender=Ad)
+def remember_price_contribution(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance.base_price = statistics.to_base_price(instance.price, instance.currency)
+    instance._previous_contribution = statistics.stored_contribution(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Ad)
+def update_price_aggregates(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_contribution', None)
+    statistics.apply_change(previous, statistics.contribution(instance))
+
+
+@receiver(post_save, sender=Ad)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_ad(instance)
+
+
+@receiver(post_save, sender=Ad)
+def enqueue_moderation(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(lambda: moderation.enqueue([instance.pk]))
+
+
+@receiver(post_delete, sender=Ad)
+def remove_price_contribution(sender, instance, **kwargs):
+    statistics.apply_change(statistics.contribution(instance), None)
+
+
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+@receiver(post_save, sender=Currency)
+@receiver(post_delete, sender=Currency)
+def invalidate_rate_snapshot(sender, **kwargs):
+    bump_version_on_commit(RATES_VERSION)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_user_principal(sender, instance, **kwargs):
+    invalidate_principals([instance.pk])
+
+
+@receiver(m2m_changed, sender=CustomUser.roles.through)
+def invalidate_role_members(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_principals([instance.pk])
+    elif action == 'pre_clear':
+        invalidate_principals(instance.users.values_list('id', flat=True))
+    else:
+        invalidate_principals(pk_set)
+
+
+@receiver(post_save, sender=Role)
+@receiver(pre_delete, sender=Role)
+def invalidate_role_principals(sender, instance, **kwargs):
+    invalidate_principals(instance.users.values_list('id', flat=True))
+
+
+def invalidate_cached_responses(sender, **kwargs):
+    groups = CACHE_GROUPS[sender]
+    transaction.on_commit(lambda: get_response_cache().bump_versions(groups))
+
+
+for model in CACHE_GROUPS:
+    post_save.connect(invalidate_cached_responses, sender=model)
+    post_delete.connect(invalidate_cached_responses, sender=model)
+
+
+@receiver(post_save, sender=CarBrand)
+@receiver(post_save, sender=CarModels)
+@receiver(post_save, sender=CarMake)
+@receiver(post_delete, sender=CarBrand)
+@receiver(post_delete, sender=CarModels)
+@receiver(post_delete, sender=CarMake)
+def log_catalog_change(sender, instance, **kwargs):
+    kind, entry_id = autocomplete.CATALOG_KINDS[sender], instance.pk
+    transaction.on_commit(lambda: autocomplete.record_catalog_change(kind, entry_id))
+
+
+@receiver(post_save, sender=Conversation)
+def add_conversation_participants(sender, instance, created, **kwargs):
+    if created:
+        messaging.add_participants(instance)
@@ -0,0 +1,110 @@
+import logging
+import time
+
+from django.db import connections
+from django.urls import get_resolver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_lazy_views = []
+
+
+def lazy_view(dotted_path, asynchronous=False, **initkwargs):
+    """
+    A URLconf entry for the view at `dotted_path` that imports its module on
+    the first request (or in warm_up) instead of when the URLconf loads.
+    Class-based views are built with as_view(**initkwargs); async views need
+    `asynchronous=True` so Django still calls them as coroutines.
+
+    The wrapper is csrf_exempt like the DRF views it is used for, which check
+    CSRF themselves for session-authenticated requests.
+    """
+    loaded = []
+
+    def load():
+        if not loaded:
+            view = import_string(dotted_path)
+            loaded.append(view.as_view(**initkwargs) if hasattr(view, 'as_view') else view)
+        return loaded[0]
+
+    if asynchronous:
+        async def view(request, *args, **kwargs):
+            return await load()(request, *args, **kwargs)
+    else:
+        def view(request, *args, **kwargs):
+            return load()(request, *args, **kwargs)
+
+    view.__name__ = dotted_path.rsplit('.', 1)[-1]
+    view.__qualname__ = view.__name__
+    view.csrf_exempt = True
+    view.load = load
+    _lazy_views.append(view)
+    return view
+
+
+def load_urlconf():
+    resolver = get_resolver()
+    resolver.url_patterns
+    # Builds the reverse lookup tables of every included URLconf.
+    resolver.reverse_dict
+    for view in _lazy_views:
+        view.load()
+
+
+def build_serializers():
+    from rest_framework import serializers
+
+    from main import serializers as main_serializers
+
+    # Building the fields walks the models' _meta and DRF's field mapping,
+    # which is cached per model after the first time.
+    for value in vars(main_serializers).values():
+        if (isinstance(value, type) and issubclass(value, serializers.Serializer)
+                and value.__module__ == main_serializers.__name__):
+            value().fields
+
+
+def load_rates():
+    from main.currency import get_rate_snapshot
+    from main.rate_history import get_rate_history
+
+    get_rate_snapshot()
+    get_rate_history()
+
+
+def load_catalog():
+    from main.autocomplete import get_catalog_index
+
+    get_catalog_index()
+
+
+WARM_UP_STEPS = (
+    ('urlconf', load_urlconf),
+    ('serializers', build_serializers),
+    ('rates', load_rates),
+    ('catalog', load_catalog),
+)
+
+
+def warm_up():
+    """
+    Import the views and build the caches a first request would otherwise
+    pay for. A failing step (say, the database is not reachable yet) is
+    logged and skipped; the cache fills on first use instead.
+
+    Returns [(step, seconds or None if it failed)].
+    """
+    timings = []
+    for name, step in WARM_UP_STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.warning('Warm-up step %s failed', name, exc_info=True)
+            timings.append((name, None))
+        else:
+            timings.append((name, time.perf_counter() - started))
+    # Connections opened here must not be shared with workers forked after a preload.
+    connections.close_all()
+    return timings
@@ -0,0 +1,206 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Q, Sum, Value, When
+
+from main.currency import get_rate_snapshot
+from main.models import Ad, CarModels, PriceAggregate
+
+
+def to_base_price(price, currency):
+    """Normalize a price to settings.PRICE_BASE_CURRENCY, or None if no rate is known."""
+    if price is None:
+        return None
+    return get_rate_snapshot().to_base([price], [currency])[0]
+
+
+def aggregate_keys(brand_id, region):
+    keys = [(PriceAggregate.SCOPE_GLOBAL, '')]
+    if brand_id is not None:
+        keys.append((PriceAggregate.SCOPE_BRAND, str(brand_id)))
+    if region:
+        keys.append((PriceAggregate.SCOPE_REGION, region))
+    return keys
+
+
+def stored_contribution(ad_id):
+    """Return the (brand_id, region, base_price) currently stored for an ad."""
+    return (Ad.objects
+            .filter(pk=ad_id)
+            .values_list('car_model__brand_id', 'region', 'base_price')
+            .first())
+
+
+def contribution(ad):
+    if ad.car_model_id is None:
+        brand_id = None
+    elif Ad.car_model.is_cached(ad):
+        brand_id = ad.car_model.brand_id
+    else:
+        brand_id = CarModels.objects.values_list('brand_id', flat=True).get(pk=ad.car_model_id)
+    return brand_id, ad.region, ad.base_price
+
+
+def apply_change(previous, current):
+    """
+    Move an ad's price contribution from `previous` to `current`.
+
+    Both are (brand_id, region, base_price) tuples or None; ads without a
+    base price are not counted.
+    """
+    if previous == current:
+        return
+    _apply_deltas([(previous, -1), (current, 1)])
+
+
+def add_contributions(contributions):
+    """Count many new (brand_id, region, base_price) contributions with a fixed number of queries."""
+    _apply_deltas([(state, 1) for state in contributions])
+
+
+def _apply_deltas(changes):
+    deltas = defaultdict(lambda: [0, Decimal(0)])
+    for state, sign in changes:
+        if state is None or state[2] is None:
+            continue
+        brand_id, region, base_price = state
+        for key in aggregate_keys(brand_id, region):
+            deltas[key][0] += sign
+            deltas[key][1] += sign * base_price
+
+    deltas = {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+    if not deltas:
+        return
+    # One UPDATE for every aggregate at once; when some do not exist yet, they
+    # are created empty (losing no race to a concurrent insert) and updated in
+    # a second pass, so the query count never depends on the number of keys.
+    with transaction.atomic():
+        if _add_deltas(deltas) < len(deltas):
+            existing = set(PriceAggregate.objects.filter(_key_condition(deltas)).values_list('scope', 'key'))
+            missing = {key: delta for key, delta in deltas.items() if key not in existing}
+            PriceAggregate.objects.bulk_create([PriceAggregate(scope=scope, key=key) for scope, key in sorted(missing)],
+                                               ignore_conflicts=True)
+            _add_deltas(missing)
+
+
+def _key_condition(keys):
+    condition = Q()
+    for scope, key in sorted(keys):
+        condition |= Q(scope=scope, key=key)
+    return condition
+
+
+def _add_deltas(deltas):
+    return PriceAggregate.objects.filter(_key_condition(deltas)).update(
+        count=F('count') + Case(
+            *[When(scope=scope, key=key, then=Value(count)) for (scope, key), (count, _) in deltas.items()],
+            default=Value(0), output_field=IntegerField(),
+        ),
+        total=F('total') + Case(
+            *[When(scope=scope, key=key, then=Value(total)) for (scope, key), (_, total) in deltas.items()],
+            default=Value(Decimal(0)), output_field=DecimalField(max_digits=20, decimal_places=2),
+        ),
+    )
+
+
+def get_average_prices_bulk(pairs):
+    """
+    Read brand, region and global averages for many (brand_id, region) pairs
+    with a single query. Returns {(brand_id, region): {'brand', 'region', 'ukraine'}}.
+    """
+    pairs = set(pairs)
+    condition = Q(scope=PriceAggregate.SCOPE_GLOBAL, key='')
+    brand_keys = {str(brand_id) for brand_id, _ in pairs if brand_id is not None}
+    regions = {region for _, region in pairs if region}
+    if brand_keys:
+        condition |= Q(scope=PriceAggregate.SCOPE_BRAND, key__in=brand_keys)
+    if regions:
+        condition |= Q(scope=PriceAggregate.SCOPE_REGION, key__in=regions)
+
+    averages = {(aggregate.scope, aggregate.key): aggregate.average
+                for aggregate in PriceAggregate.objects.filter(condition)}
+
+    return {
+        (brand_id, region): {
+            'brand': averages.get((PriceAggregate.SCOPE_BRAND, str(brand_id))),
+            'region': averages.get((PriceAggregate.SCOPE_REGION, region)) if region else None,
+            'ukraine': averages.get((PriceAggregate.SCOPE_GLOBAL, '')),
+        }
+        for brand_id, region in pairs
+    }
+
+
+def get_average_prices(brand_id, region):
+    return get_average_prices_bulk([(brand_id, region)])[(brand_id, region)]
+
+
+def compute_price_aggregates():
+    """Recompute every aggregate from the Ad table with grouped queries."""
+    priced = Ad.objects.filter(base_price__isnull=False)
+    expected = {}
+
+    totals = priced.aggregate(count=Count('id'), total=Sum('base_price'))
+    if totals['count']:
+        expected[(PriceAggregate.SCOPE_GLOBAL, '')] = (totals['count'], totals['total'])
+
+    for row in priced.values('car_model__brand_id').annotate(count=Count('id'), total=Sum('base_price')):
+        expected[(PriceAggregate.SCOPE_BRAND, str(row['car_model__brand_id']))] = (row['count'], row['total'])
+
+    for row in priced.exclude(region='').values('region').annotate(count=Count('id'), total=Sum('base_price')):
+        expected[(PriceAggregate.SCOPE_REGION, row['region'])] = (row['count'], row['total'])
+
+    return expected
+
+
+def _cents(value):
+    return round(Decimal(value or 0), 2)
+
+
+def find_price_aggregate_drift(expected=None):
+    """Return {(scope, key): (stored, expected)} for every aggregate that differs."""
+    if expected is None:
+        expected = compute_price_aggregates()
+    stored = {(aggregate.scope, aggregate.key): (aggregate.count, aggregate.total)
+              for aggregate in PriceAggregate.objects.all()}
+
+    drift = {}
+    for key in stored.keys() | expected.keys():
+        stored_value = stored.get(key, (0, Decimal(0)))
+        expected_value = expected.get(key, (0, Decimal(0)))
+        if stored_value[0] != expected_value[0] or _cents(stored_value[1]) != _cents(expected_value[1]):
+            drift[key] = (stored_value, expected_value)
+    return drift
+
+
+def normalize_missing_base_prices(chunk_size=1000):
+    """Fill Ad.base_price for rows saved before a rate was available."""
+    updated = 0
+    last_id = 0
+    while True:
+        ads = list(Ad.objects
+                   .filter(pk__gt=last_id, base_price__isnull=True)
+                   .order_by('pk')
+                   .only('id', 'price', 'currency')[:chunk_size])
+        if not ads:
+            return updated
+        last_id = ads[-1].pk
+
+        base_prices = get_rate_snapshot().to_base([ad.price for ad in ads], [ad.currency for ad in ads])
+        for ad, base_price in zip(ads, base_prices):
+            ad.base_price = base_price
+        changed = [ad for ad in ads if ad.base_price is not None]
+        Ad.objects.bulk_update(changed, ['base_price'])
+        updated += len(changed)
+
+
+def rebuild_price_aggregates(expected=None):
+    if expected is None:
+        expected = compute_price_aggregates()
+    with transaction.atomic():
+        PriceAggregate.objects.all().delete()
+        PriceAggregate.objects.bulk_create(
+            [PriceAggregate(scope=scope, key=key, count=count, total=total)
+             for (scope, key), (count, total) in expected.items()],
+        )
+    return expected
@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from main.models import Ad, CarBrand, CarModels, Currency, CustomUser, ExchangeRate
+from main.principals import principal_cache
+from main.versions import forget_versions
+from main.view_tracking import view_buffer
+
+
+def reset_caches():
+    """Version stamps and per-process caches outlive the rolled-back test transaction."""
+    cache.clear()
+    forget_versions()
+    principal_cache.clear()
+    with view_buffer._lock:
+        view_buffer._events = []
+
+
+def make_rates(**rates):
+    """Currencies with one rate each, e.g. make_rates(USD=1, EUR='0.9')."""
+    for name, rate in rates.items():
+        ExchangeRate.objects.create(currency=Currency.objects.get_or_create(name=name)[0], rate=Decimal(str(rate)))
+
+
+def make_user(email='seller@example.com', is_premium=False):
+    return CustomUser.objects.create_user(email, password='password', is_premium=is_premium)
+
+
+def make_car_model(brand='Audi', name='A4'):
+    return CarModels.objects.create(brand=CarBrand.objects.get_or_create(name=brand)[0], name=name)
+
+
+def make_ads(count, seller, car_model, price='10000.00', currency='USD', region='Kyiv'):
+    return [
+        Ad.objects.create(title=f'{car_model} #{index}', description='Clean, one owner', price=Decimal(price),
+                          currency=currency, car_model=car_model, seller=seller, region=region)
+        for index in range(count)
+    ]
+
+
+class ResetCachesMixin:
+    def setUp(self):
+        super().setUp()
+        reset_caches()
+        self.addCleanup(reset_caches)
@@ -0,0 +1,77 @@
+import time
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from main.authentication import CachedJWTAuthentication
+from main.jwt import add_principal_claims
+from main.principals import principal_version_name
+from main.tests.factories import ResetCachesMixin, make_user
+from main.versions import forget_versions
+
+
+class CachedJWTAuthenticationTests(ResetCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user(is_premium=True)
+        self.refresh = add_principal_claims(RefreshToken.for_user(self.user), self.user)
+        self.use_token(self.refresh.access_token)
+
+    def use_token(self, token):
+        self.request = APIRequestFactory().get('/ads/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def authenticate(self):
+        return CachedJWTAuthentication().authenticate(self.request)[0]
+
+    def test_cached_user_is_served_without_queries(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate().pk, self.user.pk)
+
+    def test_change_is_seen_once_committed(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_bump_from_another_process_is_seen(self):
+        self.assertTrue(self.authenticate().is_premium)
+        # Another worker revoked premium and bumped the shared stamp.
+        type(self.user).objects.filter(pk=self.user.pk).update(is_premium=False)
+        cache.set(f'version:{principal_version_name(self.user.pk)}', time.time_ns(), None)
+        forget_versions()
+        self.use_token(add_principal_claims(RefreshToken.for_user(self.user), self.user).access_token)
+        self.assertFalse(self.authenticate().is_premium)
+
+    def test_token_older_than_principal_version_is_rejected(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_premium = False
+            self.user.save()
+        with self.assertRaises(InvalidToken):
+            self.authenticate()
+
+    def test_token_without_principal_claims_is_accepted(self):
+        self.use_token(RefreshToken.for_user(self.user).access_token)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.authenticate().pk, self.user.pk)
+
+    def test_refresh_issues_current_claims(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_premium = False
+            self.user.save()
+        response = self.client.post(reverse('token_refresh'), {'refresh': str(self.refresh)},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        access = AccessToken(response.json()['access'])
+        self.assertFalse(access['is_premium'])
+        self.use_token(access)
+        self.assertFalse(self.authenticate().is_premium)
@@ -0,0 +1,86 @@
+import time
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from main.autocomplete import CATALOG_VERSION, TOP_K, CatalogIndex, PrefixTrie, get_catalog_index
+from main.models import CarBrand, CarModels
+from main.tests.factories import ResetCachesMixin, make_car_model
+from main.versions import forget_versions, get_version
+
+
+class PrefixTrieTests(TestCase):
+    def test_entry_matching_several_words_is_listed_once(self):
+        trie = PrefixTrie()
+        trie.add(1, 'Alpha Alpine Alto')
+        for entry_id in range(2, TOP_K + 2):
+            trie.add(entry_id, f'Alpine {entry_id}')
+        results = trie.search('al')
+        self.assertEqual(len(results), TOP_K)
+        self.assertEqual(len({key[3] for key in results}), TOP_K)
+
+    def test_removed_entry_is_not_suggested(self):
+        trie = PrefixTrie()
+        trie.add(1, 'BMW X5')
+        trie.add(2, 'BMW X6')
+        trie.remove(1)
+        self.assertEqual([key[3] for key in trie.search('x')], [2])
+
+
+class CatalogIndexTests(ResetCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        make_car_model('BMW', 'X5')
+
+    def labels(self, prefix):
+        return [result['label'] for result in get_catalog_index().suggest(prefix)]
+
+    def test_change_is_seen_after_commit(self):
+        self.assertEqual(self.labels('x'), ['BMW X5'])
+        with self.captureOnCommitCallbacks(execute=True):
+            make_car_model('BMW', 'X6')
+            self.assertEqual(self.labels('x'), ['BMW X5'])
+        self.assertEqual(self.labels('x'), ['BMW X5', 'BMW X6'])
+
+    def test_changes_are_applied_without_a_rebuild(self):
+        index = get_catalog_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            brand = CarBrand.objects.get(name='BMW')
+            brand.name = 'Bmw'
+            brand.save()
+            CarModels.objects.filter(name='X5').get().delete()
+            make_car_model('Audi', 'A4')
+        with self.assertNumQueries(2):
+            self.assertIs(get_catalog_index(), index)
+        self.assertEqual(self.labels('bm'), ['Bmw'])
+        self.assertEqual(self.labels('a'), ['Audi', 'Audi A4'])
+
+    def test_changes_logged_by_another_process_are_applied(self):
+        # An index another process built before the changes were made.
+        other = CatalogIndex.build(get_version(CATALOG_VERSION))
+        with self.captureOnCommitCallbacks(execute=True):
+            make_car_model('BMW', 'X6')
+            make_car_model('BMW', 'X7')
+        self.assertTrue(other.catch_up(get_version(CATALOG_VERSION)))
+        self.assertEqual([result['label'] for result in other.suggest('x')], ['BMW X5', 'BMW X6', 'BMW X7'])
+
+    def test_writer_behind_the_log_extends_its_end(self):
+        start = get_version(CATALOG_VERSION)
+        other = CatalogIndex.build(start)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_car_model('BMW', 'X6')
+        # Another writer extended the log but has not bumped the version yet.
+        cache.set(f'version:{CATALOG_VERSION}', start, None)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_car_model('BMW', 'X7')
+        self.assertTrue(other.catch_up(get_version(CATALOG_VERSION)))
+        self.assertEqual([result['label'] for result in other.suggest('x')], ['BMW X5', 'BMW X6', 'BMW X7'])
+
+    def test_gap_in_the_log_rebuilds(self):
+        index = get_catalog_index()
+        CarBrand.objects.filter(name='BMW').update(name='Bmw')
+        # A bump whose change entry was lost, or another process's cache restart.
+        cache.set(f'version:{CATALOG_VERSION}', time.time_ns(), None)
+        forget_versions()
+        self.assertIsNot(get_catalog_index(), index)
+        self.assertEqual(self.labels('bm'), ['Bmw', 'Bmw X5'])
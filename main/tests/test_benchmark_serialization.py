@@ -0,0 +1,19 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from main.models import CustomUser
+from main.tests.factories import ResetCachesMixin, make_ads, make_car_model, make_rates, make_user
+
+
+class BenchmarkSerializationTests(ResetCachesMixin, TestCase):
+    def test_leaves_no_benchmark_user_behind(self):
+        make_rates(USD=1)
+        make_ads(2, make_user(), make_car_model())
+        stdout = StringIO()
+        call_command('benchmark_serialization', ads=2, iterations=1, premium=True, stdout=stdout, stderr=StringIO())
+
+        self.assertEqual(set(json.loads(stdout.getvalue())['per_1k_ads']), {'full', 'card', 'ids'})
+        self.assertFalse(CustomUser.objects.filter(email='serialization-benchmark@example.com').exists())
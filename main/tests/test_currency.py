@@ -0,0 +1,42 @@
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from main.currency import RATES_VERSION, get_rate_snapshot
+from main.models import Currency, ExchangeRate
+from main.tests.factories import ResetCachesMixin, make_rates
+from main.versions import forget_versions
+
+
+class RateSnapshotTests(ResetCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        make_rates(USD=1, EUR='0.9')
+
+    def test_converts_a_batch_without_queries(self):
+        snapshot = get_rate_snapshot()
+        with self.assertNumQueries(0):
+            converted = snapshot.convert([Decimal('100'), Decimal('90')], ['USD', 'EUR'])
+        self.assertEqual(converted['EUR'], [Decimal('90.00'), Decimal('90.00')])
+        self.assertEqual(converted['USD'], [Decimal('100.00'), Decimal('100.00')])
+
+    def test_rate_change_is_seen_after_commit(self):
+        snapshot = get_rate_snapshot()
+        with self.captureOnCommitCallbacks() as callbacks:
+            ExchangeRate.objects.create(currency=Currency.objects.get(name='EUR'), rate=Decimal('0.8'))
+            # Not committed yet: the old snapshot stays current.
+            self.assertIs(get_rate_snapshot(), snapshot)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_rate_snapshot().rates['EUR'], Decimal('0.8'))
+
+    def test_bump_from_another_process_is_seen(self):
+        snapshot = get_rate_snapshot()
+        ExchangeRate.objects.create(currency=Currency.objects.get(name='EUR'), rate=Decimal('0.8'))
+        # Another worker bumps the shared stamp; this one only reads the cache.
+        cache.set(f'version:{RATES_VERSION}', time.time_ns(), None)
+        forget_versions()
+        self.assertIsNot(get_rate_snapshot(), snapshot)
+        self.assertEqual(get_rate_snapshot().rates['EUR'], Decimal('0.8'))
@@ -0,0 +1,84 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from main.models import Ad, Conversation, PriceAggregate
+from main.tests.factories import ResetCachesMixin, make_ads, make_car_model, make_user
+
+
+class SellerDashboardTests(ResetCachesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller@example.com')
+        self.buyer = make_user('buyer@example.com')
+        self.car_model = make_car_model('Audi', 'A4')
+        self.client.force_authenticate(self.seller)
+
+    def dashboard(self, **params):
+        response = self.client.get('/dashboard/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_query_count_does_not_grow_with_ads(self):
+        ads = make_ads(1, self.seller, self.car_model)
+        Conversation.objects.create(buyer=self.buyer, seller=self.seller, ad=ads[0])
+        with self.assertNumQueries(7):
+            self.assertEqual(len(self.dashboard()['results']), 1)
+
+        for ad in make_ads(14, self.seller, self.car_model):
+            Conversation.objects.create(buyer=self.buyer, seller=self.seller, ad=ad)
+        cache.clear()
+        with self.assertNumQueries(7):
+            self.assertEqual(len(self.dashboard()['results']), 15)
+
+    def test_price_is_compared_with_brand_and_region_averages(self):
+        ad = make_ads(1, self.seller, self.car_model)[0]
+        Ad.objects.filter(pk=ad.pk).update(base_price=Decimal('11000.00'))
+        PriceAggregate.objects.all().delete()
+        PriceAggregate.objects.create(scope=PriceAggregate.SCOPE_BRAND, key=str(self.car_model.brand_id),
+                                      count=2, total=Decimal('20000.00'))
+        PriceAggregate.objects.create(scope=PriceAggregate.SCOPE_REGION, key='Kyiv', count=1, total=Decimal('8000.00'))
+
+        row = self.dashboard()['results'][0]
+        self.assertEqual((row['price_vs_brand'], row['price_vs_region']), (10.0, 37.5))
+
+    def test_conversation_and_message_counts(self):
+        asked, quiet = make_ads(2, self.seller, self.car_model)
+        Conversation.objects.create(buyer=self.buyer, seller=self.seller, ad=asked, message_count=3)
+        Conversation.objects.create(buyer=make_user('other@example.com'), seller=self.seller, ad=asked, message_count=2)
+
+        data = self.dashboard()
+        rows = {row['id']: row for row in data['results']}
+        self.assertEqual((rows[asked.pk]['conversations'], rows[asked.pk]['messages']), (2, 5))
+        self.assertEqual((rows[quiet.pk]['conversations'], rows[quiet.pk]['messages']), (0, 0))
+        self.assertEqual((data['summary']['conversations'], data['summary']['messages']), (2, 5))
+
+    def test_keyset_pagination_walks_every_ad_once(self):
+        ads = make_ads(5, self.seller, self.car_model)
+        seen = []
+        data = self.dashboard(ordering='id', page_size=2)
+        while True:
+            seen += [row['id'] for row in data['results']]
+            if not data['next']:
+                break
+            response = self.client.get(data['next'])
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+        self.assertEqual(seen, [ad.pk for ad in ads])
+
+    def test_cached_page_is_never_served_to_another_seller(self):
+        make_ads(2, self.seller, self.car_model)
+        other = make_user('other@example.com')
+        make_ads(1, other, self.car_model)
+
+        self.assertEqual(self.dashboard()['summary']['ads'], 2)
+        self.client.force_authenticate(other)
+        data = self.dashboard()
+        self.assertEqual(data['summary']['ads'], 1)
+        self.assertEqual({row['id'] for row in data['results']},
+                         set(Ad.objects.filter(seller=other).values_list('id', flat=True)))
+
+        self.client.force_authenticate(self.seller)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.dashboard()['summary']['ads'], 2)
@@ -0,0 +1,81 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from main.db_router import ReplicaRoutingMiddleware
+from main.models import Currency
+from main.tests.factories import ResetCachesMixin, make_user
+
+
+def read_currencies(request):
+    return HttpResponse(','.join(Currency.objects.order_by('name').values_list('name', flat=True)))
+
+
+def create_currency(request):
+    Currency.objects.create(name='GBP')
+    return HttpResponse(status=201)
+
+
+class ReplicaRoutingTests(ResetCachesMixin, TransactionTestCase):
+    databases = {'default', 'replica1', 'replica2'}
+
+    def setUp(self):
+        super().setUp()
+        # Per test rather than on the class, so the flush after each test still covers the replicas.
+        replicas = override_settings(DATABASE_REPLICAS=['replica1'])
+        replicas.enable()
+        self.addCleanup(replicas.disable)
+        Currency.objects.using('default').create(name='USD')
+        # Replication has not caught up with EUR yet.
+        Currency.objects.using('replica1').create(name='USD')
+        Currency.objects.using('default').create(name='EUR')
+        self.user = make_user()
+        self.factory = RequestFactory()
+
+    def request(self, method, user=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'} if user else {}
+        return getattr(self.factory, method)('/currencies/', **headers)
+
+    def read(self, user=None):
+        return ReplicaRoutingMiddleware(read_currencies)(self.request('get', user)).content.decode()
+
+    def test_safe_requests_read_from_a_replica(self):
+        self.assertEqual(self.read(self.user), 'USD')
+
+    def test_writer_reads_the_primary_after_a_write(self):
+        response = ReplicaRoutingMiddleware(create_currency)(self.request('post', self.user))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.read(self.user), 'EUR,GBP,USD')
+        # Other users are not pinned.
+        self.assertEqual(self.read(make_user('other@example.com')), 'USD')
+        self.assertEqual(self.read(), 'USD')
+
+    def test_reads_after_a_write_in_the_same_request_use_the_primary(self):
+        def write_then_read(request):
+            Currency.objects.create(name='GBP')
+            return read_currencies(request)
+
+        response = ReplicaRoutingMiddleware(write_then_read)(self.request('get'))
+        self.assertEqual(response.content.decode(), 'EUR,GBP,USD')
+
+    @override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+    def test_one_replica_per_request(self):
+        def aliases(request):
+            return HttpResponse(','.join({router.db_for_read(Currency) for _ in range(50)}))
+
+        for _ in range(10):
+            response = ReplicaRoutingMiddleware(aliases)(self.request('get'))
+            self.assertIn(response.content.decode(), ('replica1', 'replica2'))
+
+    async def test_async_requests_stay_async(self):
+        async def get_response(request):
+            return await sync_to_async(read_currencies)(request)
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = await middleware(self.request('get', self.user))
+        self.assertEqual(response.content.decode(), 'USD')
@@ -0,0 +1,80 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from main.models import AdPrice, Currency, Role
+from main.serializers import AdSerializer
+from main.tests.factories import ResetCachesMixin, make_ads, make_car_model, make_rates, make_user
+
+
+class AdQueryCountTests(ResetCachesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        make_rates(USD=1, EUR='0.9', UAH=41)
+        self.seller = make_user()
+        self.seller.roles.add(Role.objects.create(name='seller'))
+        self.car_model = make_car_model()
+        self.currencies = list(Currency.objects.all())
+
+    def add_ads(self, count):
+        ads = make_ads(count, self.seller, self.car_model)
+        AdPrice.objects.bulk_create([
+            AdPrice(ad=ad, currency=currency, price=ad.price) for ad in ads for currency in self.currencies
+        ])
+        return ads
+
+    def count_queries(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_list_query_count_does_not_grow_with_the_page(self):
+        self.client.force_authenticate(make_user('buyer@example.com'))
+        self.add_ads(2)
+        small = self.count_queries('/ads/')
+        self.add_ads(18)
+
+        # Page, car models with brands and sellers (one join), roles, prices with currencies.
+        with self.assertNumQueries(3):
+            response = self.client.get('/ads/')
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(small, 3)
+
+    def test_detail_query_count(self):
+        self.client.force_authenticate(make_user('buyer@example.com'))
+        ad = self.add_ads(1)[0]
+
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/ads/{ad.pk}/')
+        self.assertEqual(response.data['car_model']['brand']['name'], 'Audi')
+        self.assertEqual(len(response.data['prices']), 3)
+
+    def test_premium_list_statistics_are_fetched_in_bulk(self):
+        self.client.force_authenticate(make_user('premium@example.com', is_premium=True))
+        self.add_ads(2)
+        small = self.count_queries('/ads/')
+        self.add_ads(18)
+
+        # The list queries plus one grouped query each for views and average prices.
+        with self.assertNumQueries(5):
+            response = self.client.get('/ads/')
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertIn('statistics', response.data['results'][0])
+        self.assertEqual(small, 5)
+
+    def test_premium_detail_query_count(self):
+        self.client.force_authenticate(make_user('premium@example.com', is_premium=True))
+        ad = self.add_ads(1)[0]
+
+        # The ad with its car model, then its views and average prices.
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/ads/{ad.pk}/')
+        self.assertIn('statistics', response.data)
+
+    def test_related_manager_is_serialized(self):
+        # AdListSerializer evaluates managers (a RelatedManager is not iterable) once.
+        self.add_ads(3)
+        with self.assertNumQueries(1):
+            data = AdSerializer(self.seller.ad_set, many=True, fields={'id': {}, 'title': {}}).data
+        self.assertEqual(len(data), 3)
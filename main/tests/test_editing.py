@@ -0,0 +1,157 @@
+import threading
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from main.editing import MAX_EDIT_ATTEMPTS, EditConflict, EditLimitReached, edit_ad, insert_ads
+from main.models import Ad, AdPrice, PriceAggregate
+from main.statistics import find_price_aggregate_drift
+from main.tests.factories import ResetCachesMixin, make_ads, make_car_model, make_rates, make_user
+
+THREADS = 8
+
+
+class ConcurrentEditTests(ResetCachesMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        make_rates(USD=1)
+        self.ad = make_ads(1, make_user(), make_car_model())[0]
+
+    def hammer(self):
+        """Every thread edits its own copy of the ad, read at the same version, at once."""
+        copies = [Ad.objects.get(pk=self.ad.pk) for _ in range(THREADS)]
+        # The winner's copy is updated in place.
+        version = copies[0].version
+        barrier = threading.Barrier(THREADS)
+        results = [None] * THREADS
+
+        def edit(index):
+            try:
+                barrier.wait()
+                try:
+                    results[index] = edit_ad(copies[index], {'title': f'Edit {index}'}, copies[index].version)
+                except (EditConflict, EditLimitReached) as error:
+                    results[index] = error
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=edit, args=(index,)) for index in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return version, results
+
+    def test_exactly_one_edit_wins_per_version(self):
+        for _ in range(MAX_EDIT_ATTEMPTS):
+            version, results = self.hammer()
+            winners = [index for index, result in enumerate(results) if isinstance(result, Ad)]
+            conflicts = [result for result in results if isinstance(result, EditConflict)]
+
+            self.assertEqual(len(winners), 1)
+            self.assertEqual(len(conflicts), THREADS - 1)
+            self.assertEqual({conflict.version for conflict in conflicts}, {version + 1})
+            ad = Ad.objects.get(pk=self.ad.pk)
+            self.assertEqual((ad.version, ad.title), (version + 1, f'Edit {winners[0]}'))
+
+    def test_concurrent_edits_never_pass_the_limit(self):
+        Ad.objects.filter(pk=self.ad.pk).update(edit_attempts=MAX_EDIT_ATTEMPTS - 1)
+        _, results = self.hammer()
+        self.assertEqual(len([result for result in results if isinstance(result, Ad)]), 1)
+
+        # Approved by moderation, then hammered past the limit.
+        Ad.objects.filter(pk=self.ad.pk).update(is_active=True)
+        _, results = self.hammer()
+        self.assertTrue(all(isinstance(result, EditLimitReached) for result in results))
+        ad = Ad.objects.get(pk=self.ad.pk)
+        self.assertEqual((ad.edit_attempts, ad.is_active), (MAX_EDIT_ATTEMPTS, False))
+
+
+class EditLimitTests(ResetCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        make_rates(USD=1)
+        self.ad = make_ads(1, make_user(), make_car_model())[0]
+
+    def test_edit_past_the_limit_deactivates_the_ad(self):
+        for attempt in range(MAX_EDIT_ATTEMPTS):
+            edit_ad(self.ad, {'title': f'Edit {attempt}'})
+        # Approved by moderation after the last allowed edit.
+        Ad.objects.filter(pk=self.ad.pk).update(is_active=True)
+        with self.assertRaises(EditLimitReached):
+            edit_ad(self.ad, {'title': 'One too many'})
+        ad = Ad.objects.get(pk=self.ad.pk)
+        self.assertEqual((ad.title, ad.edit_attempts, ad.is_active), (f'Edit {MAX_EDIT_ATTEMPTS - 1}', MAX_EDIT_ATTEMPTS, False))
+
+
+class InsertAdsTests(ResetCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        make_rates(USD=1, EUR='0.9')
+        self.seller = make_user()
+        self.car_models = [make_car_model('Audi', 'A4'), make_car_model('BMW', 'X5')]
+
+    def new_ads(self, count):
+        return [Ad(title=f'Ad {index}', description='', price=Decimal(1000 + index), currency='USD',
+                   car_model=self.car_models[index % 2], seller=self.seller, region=f'Region {index % 2}')
+                for index in range(count)]
+
+    def insert(self, count):
+        ads = self.new_ads(count)
+        with self.captureOnCommitCallbacks(execute=True):
+            insert_ads(ads)
+        return ads
+
+    def assert_fixed_query_count(self):
+        # The first batch creates the aggregates, the others only update them.
+        self.insert(2)
+        with CaptureQueriesContext(connection) as small:
+            self.insert(2)
+        with CaptureQueriesContext(connection) as large:
+            self.insert(20)
+        self.assertEqual(len(small), len(large))
+
+    def assert_inserted(self, ads):
+        stored = dict(Ad.objects.values_list('id', 'title'))
+        self.assertEqual([stored[ad.pk] for ad in ads], [ad.title for ad in ads])
+        self.assertEqual(AdPrice.objects.filter(ad__in=ads).count(), len(ads) * 2)
+        self.assertEqual(find_price_aggregate_drift(), {})
+
+    def test_fixed_number_of_queries(self):
+        self.assert_fixed_query_count()
+        self.assert_inserted(list(Ad.objects.all()))
+
+    def test_fixed_number_of_queries_without_returning(self):
+        # As on MySQL: the ids are read back by the rows' insert tokens.
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            self.assert_fixed_query_count()
+            ads = self.insert(5)
+        self.assert_inserted(ads)
+        self.assertEqual(PriceAggregate.objects.get(scope=PriceAggregate.SCOPE_GLOBAL).count, 29)
+        self.assertFalse(Ad.objects.exclude(insert_token='').exists())
+        self.assertEqual({ad.insert_token for ad in ads}, {''})
+
+
+class AdBatchTests(ResetCachesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        make_rates(USD=1)
+        self.car_model = make_car_model()
+        self.client.force_authenticate(make_user())
+
+    def test_car_model_ids_are_coerced(self):
+        item = {'title': 'Audi A4', 'description': 'Clean', 'price': '1000.00', 'currency': 'USD', 'region': 'Kyiv'}
+        response = self.client.post('/ads/batch/', [
+            {**item, 'car_model': str(self.car_model.pk)},
+            {**item, 'car_model': self.car_model.pk},
+            {**item, 'car_model': 'x'},
+            {**item, 'car_model': self.car_model.pk + 1},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status'] for result in response.data['results']], [201, 201, 400, 400])
+        self.assertEqual(Ad.objects.filter(car_model=self.car_model).count(), 2)
@@ -0,0 +1,30 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from main.importing import AdImporter
+from main.models import Ad
+from main.tests.factories import ResetCachesMixin, make_car_model, make_user
+
+
+class AdImporterTests(ResetCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        make_car_model('Audi', 'A4')
+        make_user('seller@example.com')
+
+    def row(self, price):
+        return {'title': 'Audi A4', 'price': price, 'currency': 'usd', 'brand': 'audi', 'model': 'a4'}
+
+    def test_invalid_prices_are_row_errors(self):
+        rejected = []
+        importer = AdImporter(default_seller='seller@example.com',
+                              reject=lambda line_number, row, error: rejected.append((line_number, error)))
+        rows = enumerate([self.row(price) for price in ('NaN', 'sNaN', 'Infinity', 'abc', '-5', '12500.5')], 1)
+
+        imported, rejected_count, _ = importer.run(rows)
+
+        self.assertEqual((imported, rejected_count), (1, 5))
+        self.assertEqual([line_number for line_number, _ in rejected], [1, 2, 3, 4, 5])
+        self.assertEqual(rejected[0][1], "invalid price 'NaN'")
+        self.assertEqual(list(Ad.objects.values_list('price', 'currency')), [(Decimal('12500.50'), 'USD')])
@@ -0,0 +1,45 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import HttpRequest, HttpResponse
+from django.test import TestCase, override_settings
+
+from main.instrumentation import InstrumentationMiddleware
+from main.models import Currency
+from main.tests.factories import ResetCachesMixin
+
+
+def count_currencies():
+    return HttpResponse(str(Currency.objects.count()))
+
+
+class InstrumentationMiddlewareTests(ResetCachesMixin, TestCase):
+    def test_sync_request_is_timed(self):
+        middleware = InstrumentationMiddleware(lambda request: count_currencies())
+        self.assertFalse(asyncio.iscoroutinefunction(middleware))
+        response = middleware(HttpRequest())
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    async def test_async_request_stays_async_and_is_timed(self):
+        async def get_response(request):
+            return await sync_to_async(count_currencies)()
+
+        middleware = InstrumentationMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = await middleware(HttpRequest())
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+
+class MetricsViewTests(TestCase):
+    @override_settings(METRICS_TOKEN=None, DEBUG=False)
+    def test_closed_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+
+    @override_settings(METRICS_TOKEN=None, DEBUG=True)
+    def test_open_without_a_token_in_debug(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret', DEBUG=False)
+    def test_requires_the_token(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 401)
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, SimpleTestCase, TransactionTestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from main.jwt import add_principal_claims
+from main.messaging import POLL_INTERVAL, MessageNotifier, latest_message_id, notifier, send_message
+from main.models import Conversation
+from main.tests.factories import ResetCachesMixin, make_ads, make_car_model, make_user
+
+
+class MessageNotifierTests(SimpleTestCase):
+    def test_only_watched_users_are_kept(self):
+        notifier = MessageNotifier()
+        with notifier.watching(1):
+            notifier.notify([1, 2], 10)
+            self.assertEqual(notifier.latest(1), 10)
+            self.assertEqual(notifier.latest(2), 0)
+            self.assertTrue(notifier.wait(1, 9, 0))
+        self.assertEqual(notifier._latest, {})
+        self.assertEqual(notifier._watchers, {})
+
+    def test_entry_is_kept_until_the_last_watcher_leaves(self):
+        notifier = MessageNotifier()
+        with notifier.watching(1):
+            with notifier.watching(1):
+                notifier.notify([1], 10)
+            self.assertEqual(notifier.latest(1), 10)
+        self.assertEqual(notifier.latest(1), 0)
+
+
+class AsyncMessagePollTests(ResetCachesMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller@example.com')
+        self.buyer = make_user('buyer@example.com')
+        ad = make_ads(1, self.seller, make_car_model())[0]
+        self.conversation = Conversation.objects.create(buyer=self.buyer, seller=self.seller, ad=ad)
+        token = add_principal_claims(RefreshToken.for_user(self.seller), self.seller).access_token
+        self.client = AsyncClient()
+        self.headers = {'authorization': f'Bearer {token}'}
+
+    def send(self, body):
+        return send_message(self.conversation, self.buyer, body)
+
+    async def poll(self, **params):
+        response = await self.client.get('/async/messages/poll/', params, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    async def test_returns_pending_messages(self):
+        message = await sync_to_async(self.send)('Is it still for sale?')
+        data = await self.poll(after=0, timeout=0)
+        self.assertEqual([item['body'] for item in data['messages']], ['Is it still for sale?'])
+        self.assertEqual(data['last_id'], message.pk)
+
+    async def test_wakes_up_on_a_new_message(self):
+        after = await sync_to_async(latest_message_id)(self.seller.pk)
+        started = time.monotonic()
+        poll = asyncio.ensure_future(self.poll(after=after, timeout=10))
+        await asyncio.sleep(0.2)
+        self.assertFalse(poll.done())
+
+        # From another thread, as another request would; the waiting poll holds none.
+        await sync_to_async(self.send, thread_sensitive=False)('Hello')
+        data = await poll
+        self.assertEqual([item['body'] for item in data['messages']], ['Hello'])
+        # Woken by the notifier, not by the next database re-check.
+        self.assertLess(time.monotonic() - started, POLL_INTERVAL)
+        self.assertEqual(notifier._latest, {})
+
+    async def test_requires_authentication(self):
+        response = await self.client.get('/async/messages/poll/')
+        self.assertEqual(response.status_code, 401)
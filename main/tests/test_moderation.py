@@ -0,0 +1,68 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from main.models import Ad, ModerationJob
+from main.moderation import LEASE, claim_jobs, due_jobs, enqueue, run_worker
+from main.tests.factories import ResetCachesMixin, make_ads, make_car_model, make_user
+
+
+class RunWorkerTests(ResetCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ad = make_ads(1, make_user(), make_car_model())[0]
+        Ad.objects.update(is_active=False)
+
+    def lease(self, locked_at):
+        return ModerationJob.objects.create(ad=self.ad, status=ModerationJob.STATUS_PROCESSING, attempts=1,
+                                            locked_by='dead-worker', locked_at=locked_at)
+
+    def test_running_worker_requeues_expired_leases(self):
+        job = self.lease(timezone.now() - LEASE * 2)
+        self.assertEqual(run_worker('worker', once=True, release_interval=0), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.approved), (ModerationJob.STATUS_DONE, True))
+        self.assertTrue(Ad.objects.get(pk=self.ad.pk).is_active)
+
+    def test_live_leases_are_kept(self):
+        job = self.lease(timezone.now())
+        self.assertEqual(run_worker('worker', once=True, release_interval=0), 0)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), (ModerationJob.STATUS_PROCESSING, 'dead-worker'))
+
+
+class ClaimJobsTests(ResetCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ads = make_ads(5, make_user(), make_car_model())
+        enqueue(ad.pk for ad in self.ads)
+
+    def test_workers_claim_disjoint_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            first = claim_jobs('first', batch_size=3)
+        second = claim_jobs('second', batch_size=3)
+        self.assertEqual((len(first), len(second)), (3, 2))
+        self.assertFalse({job.pk for job in first} & {job.pk for job in second})
+        # MySQL rejects LIMIT inside an IN subquery.
+        update = next(query['sql'] for query in queries if query['sql'].startswith('UPDATE'))
+        self.assertNotIn('LIMIT', update)
+
+    def test_job_taken_after_the_read_is_not_claimed_again(self):
+        taken = ModerationJob.objects.order_by('id').first()
+        calls = []
+
+        def due_jobs_with_race(now=None):
+            if calls:
+                # Another worker claims a job between the read and the UPDATE.
+                ModerationJob.objects.filter(pk=taken.pk).update(status=ModerationJob.STATUS_PROCESSING,
+                                                                locked_by='other')
+            calls.append(now)
+            return due_jobs(now)
+
+        with mock.patch('main.moderation.due_jobs', due_jobs_with_race):
+            claimed = claim_jobs('worker', batch_size=5)
+        self.assertEqual(len(claimed), 4)
+        self.assertNotIn(taken.pk, {job.pk for job in claimed})
@@ -0,0 +1,53 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from main.models import Currency, ExchangeRate
+from main.rate_history import get_rate_history
+from main.tests.factories import ResetCachesMixin, make_ads, make_car_model, make_rates, make_user
+
+
+class RateHistoryTests(ResetCachesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        make_rates(USD=1, EUR='0.9')
+        self.today = timezone.localdate()
+
+    def add_rate(self, currency, rate, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ExchangeRate.objects.create(currency=Currency.objects.get_or_create(name=currency)[0],
+                                               rate=Decimal(rate), **fields)
+
+    def test_uncommitted_rate_is_not_recorded(self):
+        history = get_rate_history()
+        with self.captureOnCommitCallbacks() as callbacks:
+            ExchangeRate.objects.create(currency=Currency.objects.create(name='GBP'), rate=Decimal('0.8'))
+            self.assertIs(get_rate_history(), history)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_rate_history().rates_on(self.today)['GBP'], Decimal('0.8000'))
+
+    def test_rate_committed_out_of_id_order_is_seen(self):
+        self.add_rate('PLN', '4', id=1000)
+        self.assertIn('PLN', get_rate_history().currencies)
+        # A row with a lower id that committed later.
+        self.add_rate('GBP', '0.8', id=500)
+        self.assertEqual(get_rate_history().rates_on(self.today)['GBP'], Decimal('0.8000'))
+
+    def test_endpoints_render_decimals_as_strings(self):
+        self.client.force_authenticate(make_user())
+        ad = make_ads(1, make_user('other@example.com'), make_car_model(), price='100.00')[0]
+        day = self.today.isoformat()
+
+        data = self.client.get(f'/ads/{ad.pk}/price-history/', {'start': day, 'end': day}).json()
+        self.assertEqual(data['price'], '100.00')
+        self.assertEqual(data['prices']['EUR'], ['90.00'])
+
+        data = self.client.get('/exchange-rates/as-of/', {'date': day}).json()
+        self.assertEqual(data['rates'], {'EUR': '0.9000', 'USD': '1.0000'})
+
+        start = (self.today - timedelta(days=1)).isoformat()
+        data = self.client.get('/exchange-rates/history/', {'start': start, 'end': day}).json()
+        self.assertEqual(data['rates']['EUR'], [{'date': day, 'rate': '0.9000'}])
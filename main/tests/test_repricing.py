@@ -0,0 +1,39 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from main.currency import get_rate_snapshot
+from main.models import Ad, AdPrice
+from main.repricing import reprice_chunk
+from main.tests.factories import ResetCachesMixin, make_ads, make_car_model, make_rates, make_user
+
+
+class RepriceChunkTests(ResetCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        make_rates(USD=1, EUR='0.8')
+        # 10.02 EUR is 12.525 USD: the half cent is rounded to even, as everywhere else.
+        self.ads = make_ads(2, make_user(), make_car_model(), price='10.02', currency='EUR')
+        self.rows = list(Ad.objects.order_by('pk').values_list('id', 'price', 'currency'))
+
+    def prices(self):
+        return sorted(AdPrice.objects.values_list('ad_id', 'currency__name', 'price'))
+
+    def test_rerun_updates_prices_in_place(self):
+        reprice_chunk(self.rows, get_rate_snapshot())
+        with self.captureOnCommitCallbacks(execute=True):
+            make_rates(EUR='0.5')
+        reprice_chunk(self.rows, get_rate_snapshot())
+
+        self.assertEqual(self.prices(), sorted(
+            (ad.pk, currency, price) for ad in self.ads
+            for currency, price in (('EUR', Decimal('10.02')), ('USD', Decimal('20.04')))
+        ))
+        self.assertEqual(set(Ad.objects.values_list('base_price', flat=True)), {Decimal('20.04')})
+
+    def test_base_price_is_rounded_like_the_snapshot(self):
+        snapshot = get_rate_snapshot()
+        reprice_chunk(self.rows, snapshot)
+        expected = snapshot.to_base([Decimal('10.02')], ['EUR'])[0]
+        self.assertEqual(expected, Decimal('12.52'))
+        self.assertEqual(set(Ad.objects.values_list('base_price', flat=True)), {expected})
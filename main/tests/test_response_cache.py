@@ -0,0 +1,50 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from main.models import Currency
+from main.response_cache import get_response_cache
+from main.tests.factories import ResetCachesMixin, make_user
+from main.versions import forget_versions
+
+
+class ResponseCacheTests(ResetCachesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        Currency.objects.create(name='USD')
+        self.client.force_authenticate(make_user())
+        self.url = reverse('currency-list')
+
+    def names(self):
+        return [currency['name'] for currency in self.client.get(self.url).json()['results']]
+
+    def test_repeated_request_is_served_from_cache(self):
+        self.assertEqual(self.names(), ['USD'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names(), ['USD'])
+
+    def test_change_is_seen_after_commit(self):
+        self.names()
+        with self.captureOnCommitCallbacks() as callbacks:
+            Currency.objects.create(name='EUR')
+            self.assertEqual(self.names(), ['USD'])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(sorted(self.names()), ['EUR', 'USD'])
+
+    def test_bump_from_another_process_is_seen(self):
+        self.names()
+        Currency.objects.create(name='EUR')
+        cache.set('version:response:currencies', time.time_ns(), None)
+        forget_versions()
+        self.assertEqual(sorted(self.names()), ['EUR', 'USD'])
+
+    def test_entries_expire(self):
+        self.names()
+        Currency.objects.create(name='EUR')
+        expired = time.monotonic() + get_response_cache().timeout + 1
+        with mock.patch('main.response_cache.time.monotonic', return_value=expired):
+            self.assertEqual(sorted(self.names()), ['EUR', 'USD'])
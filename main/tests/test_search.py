@@ -0,0 +1,80 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from main.models import Ad, AdSearchTerm
+from main.search import TITLE_WEIGHT, ad_terms, rebuild_search_index, search_ads, tokenize
+from main.tests.factories import ResetCachesMixin, make_car_model, make_rates, make_user
+
+
+class TokenizeTests(TestCase):
+    def test_folds_case_and_diacritics_and_drops_stop_words(self):
+        self.assertEqual(tokenize('The Škoda OCTAVIA and a Citroën'), ['skoda', 'octavia', 'citroen'])
+
+    def test_title_terms_outweigh_description_terms(self):
+        terms = ad_terms('Diesel wagon', 'wagon with a diesel engine')
+        self.assertEqual(terms['diesel'], TITLE_WEIGHT + 1)
+        self.assertEqual(terms['engine'], 1)
+
+
+class SearchTests(ResetCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        make_rates(USD=1)
+        self.seller = make_user()
+        self.car_model = make_car_model()
+
+    def create(self, title, description='', region='Kyiv'):
+        return Ad.objects.create(title=title, description=description, price=10000, currency='USD',
+                                 car_model=self.car_model, seller=self.seller, region=region)
+
+    def test_saving_an_ad_indexes_it(self):
+        ad = self.create('Audi A4 Avant', 'Diesel, leather seats')
+        self.assertEqual(set(AdSearchTerm.objects.filter(ad=ad).values_list('term', flat=True)),
+                         {'audi', 'a4', 'avant', 'diesel', 'leather', 'seats'})
+
+    def test_editing_an_ad_replaces_its_postings(self):
+        ad = self.create('Audi A4 Avant', 'Diesel')
+        ad.title, ad.description = 'Audi A4 Sedan', 'Petrol'
+        ad.save()
+
+        self.assertEqual(search_ads('diesel'), [])
+        self.assertEqual([ad_id for ad_id, _ in search_ads('petrol sedan')], [ad.pk])
+
+    def test_deleting_an_ad_removes_its_postings(self):
+        ad = self.create('Audi A4 Avant')
+        ad.delete()
+        self.assertFalse(AdSearchTerm.objects.exists())
+
+    def test_every_term_must_match_and_title_matches_rank_first(self):
+        in_title = self.create('Diesel wagon', 'Low mileage')
+        in_description = self.create('Family wagon', 'Diesel, low mileage')
+        self.create('Petrol wagon', 'Low mileage')
+
+        results = search_ads('wagon diesel')
+        self.assertEqual([ad_id for ad_id, _ in results], [in_title.pk, in_description.pk])
+        self.assertGreater(results[0][1], results[1][1])
+        self.assertEqual(search_ads('wagon electric'), [])
+
+    def test_structured_filters_narrow_the_candidates(self):
+        self.create('Diesel wagon', region='Kyiv')
+        lviv = self.create('Diesel wagon', region='Lviv')
+
+        results = search_ads('diesel', Ad.objects.filter(region='Lviv'))
+        self.assertEqual([ad_id for ad_id, _ in results], [lviv.pk])
+
+    def test_search_reads_postings_not_the_text_columns(self):
+        self.create('Diesel wagon', 'Low mileage')
+        with CaptureQueriesContext(connection) as queries:
+            search_ads('diesel wagon', Ad.objects.filter(region='Kyiv'))
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('LIKE', sql.upper())
+        self.assertNotIn('"description"', sql)
+
+    def test_rebuild_indexes_ads_saved_without_signals(self):
+        ad = self.create('Audi A4 Avant')
+        AdSearchTerm.objects.all().delete()
+        Ad.objects.filter(pk=ad.pk).update(title='Skoda Superb')
+
+        self.assertEqual(rebuild_search_index(chunk_size=1), 1)
+        self.assertEqual([ad_id for ad_id, _ in search_ads('superb')], [ad.pk])
@@ -1,9 +1,12 @@
 from django.urls import path, include
 from rest_framework import routers
 from rest_framework.routers import DefaultRouter
-from oktenProject.main.views import UserViewSet, CarBrandViewSet, CarModelsViewSet, AdViewSet, AdCreateView, \
+from main.views import UserViewSet, CarBrandViewSet, CarModelsViewSet, AdViewSet, AdCreateView, \
     ConversationCreateView, ManagerCreateView, CarMakeListView, MissingCarMakeRequestCreateView, CurrencyListView, \
-    ExchangeRateListView, TokenObtainPairView,TokenRefreshView
+    ExchangeRateListView, AutocompleteView, InboxView, ConversationMessagesView, \
+    ConversationReadView, MessagePollView, MessageStreamView, metrics_view, \
+    SellerDashboardView, ExchangeRateHistoryView, ExchangeRateAsOfView
+from main.startup import lazy_view
 
 
 router = DefaultRouter()
@@ -13,15 +16,34 @@ router.register(r'car-models', CarModelsViewSet)
 router.register(r'ads', AdViewSet)
 
 urlpatterns = [
-    path('main/', include('main.urls')),
+    # Before the router, whose ads/<pk>/ pattern would otherwise match it.
     path('ads/create/', AdCreateView.as_view(), name='ad-create'),
+    path('', include(router.urls)),
     path('conversations/create/', ConversationCreateView.as_view(), name='conversation-create'),
+    path('conversations/<int:pk>/messages/', ConversationMessagesView.as_view(), name='conversation-messages'),
+    path('conversations/<int:pk>/read/', ConversationReadView.as_view(), name='conversation-read'),
+    path('inbox/', InboxView.as_view(), name='inbox'),
+    path('dashboard/', SellerDashboardView.as_view(), name='seller-dashboard'),
+    path('messages/poll/', MessagePollView.as_view(), name='message-poll'),
+    path('messages/stream/', MessageStreamView.as_view(), name='message-stream'),
     path('managers/create/', ManagerCreateView.as_view(), name='manager-create'),
     path('car-makes/', CarMakeListView.as_view(), name='car-makes-list'),
     path('missing-car-make-request/', MissingCarMakeRequestCreateView.as_view(), name='missing-car-make-request'),
     path('currencies/', CurrencyListView.as_view(), name='currency-list'),
     path('exchange-rates/', ExchangeRateListView.as_view(), name='exchange-rate-list'),
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('exchange-rates/history/', ExchangeRateHistoryView.as_view(), name='exchange-rate-history'),
+    path('exchange-rates/as-of/', ExchangeRateAsOfView.as_view(), name='exchange-rate-as-of'),
+    path('autocomplete/', AutocompleteView.as_view(), name='autocomplete'),
+    path('async/ads/', lazy_view('main.async_views.ad_list', asynchronous=True), name='async-ad-list'),
+    path('async/ads/<int:pk>/', lazy_view('main.async_views.ad_detail', asynchronous=True), name='async-ad-detail'),
+    path('async/messages/poll/', lazy_view('main.async_views.message_poll', asynchronous=True), name='async-message-poll'),
+    path('async/car-brands/', lazy_view('main.async_views.car_brand_list', asynchronous=True), name='async-car-brand-list'),
+    path('async/car-models/', lazy_view('main.async_views.car_model_list', asynchronous=True), name='async-car-model-list'),
+    path('async/car-makes/', lazy_view('main.async_views.car_make_list', asynchronous=True), name='async-car-makes-list'),
+    path('async/currencies/', lazy_view('main.async_views.currency_list', asynchronous=True), name='async-currency-list'),
+    path('async/exchange-rates/', lazy_view('main.async_views.exchange_rate_list', asynchronous=True), name='async-exchange-rate-list'),
+    path('api/token/', lazy_view('rest_framework_simplejwt.views.TokenObtainPairView'), name='token_obtain_pair'),
+    path('api/token/refresh/', lazy_view('main.jwt.PrincipalTokenRefreshView'), name='token_refresh'),
+    path('metrics/', metrics_view, name='metrics'),
 ]
 
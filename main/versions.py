@@ -0,0 +1,70 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# name -> (version, monotonic time it was read from the cache)
+_seen = {}
+_seen_lock = threading.Lock()
+
+
+def _key(name):
+    return f'version:{name}'
+
+
+def _check_interval():
+    return getattr(settings, 'VERSION_CHECK_INTERVAL', 1.0)
+
+
+def get_version(name):
+    """
+    Return the current version stamp for `name`.
+
+    Stamps live in the default cache, which the settings configure as one
+    shared by every worker, so a bump in one process is seen by all of them
+    within VERSION_CHECK_INTERVAL seconds; each process re-reads a stamp at
+    most that often. A missing stamp is recreated with a fresh value, which
+    invalidates anything built against the old one.
+    """
+    now = time.monotonic()
+    seen = _seen.get(name)
+    if seen is not None and now - seen[1] < _check_interval():
+        return seen[0]
+
+    version = cache.get(_key(name))
+    if version is None:
+        cache.add(_key(name), time.time_ns(), None)
+        version = cache.get(_key(name))
+    with _seen_lock:
+        _seen[name] = (version, now)
+    return version
+
+
+def read_version(name):
+    """The stamp in the shared cache right now, bypassing this process's copy; None if there is none."""
+    return cache.get(_key(name))
+
+
+def bump_version(name, version=None):
+    if version is None:
+        version = time.time_ns()
+    cache.set(_key(name), version, None)
+    with _seen_lock:
+        _seen[name] = (version, time.monotonic())
+    return version
+
+
+def bump_version_on_commit(name):
+    """
+    Bump once the current transaction commits (at once outside one), so no
+    process can load the old rows and record them under the new stamp.
+    """
+    transaction.on_commit(lambda: bump_version(name))
+
+
+def forget_versions():
+    """Drop the stamps this process has seen; the next lookups read the cache."""
+    with _seen_lock:
+        _seen.clear()
@@ -0,0 +1,146 @@
+import atexit
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from main.models import AdView, AdViewDaily
+
+
+def _day(timestamp):
+    if timezone.is_aware(timestamp):
+        return timezone.localdate(timestamp)
+    return timestamp.date()
+
+
+def _today():
+    return _day(timezone.now())
+
+
+class AdViewBuffer:
+    """
+    Collects ad views in memory and writes them in batches.
+
+    Every flush appends the raw events to AdView with one bulk_create and
+    bumps the matching AdViewDaily counters, so statistics never have to
+    count the raw log.
+    """
+
+    def __init__(self, max_size=500, flush_interval=5.0):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self._events = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(self, ad_id, viewer_id=None, timestamp=None, flush=True):
+        """Buffer a view; returns whether a flush is due when `flush` is False."""
+        event = (ad_id, viewer_id, timestamp or timezone.now())
+        with self._lock:
+            self._events.append(event)
+            due = (len(self._events) >= self.max_size
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due and flush:
+            self.flush()
+            return False
+        return due
+
+    def pending(self, ad_ids):
+        ad_ids = set(ad_ids)
+        with self._lock:
+            return [(ad_id, _day(timestamp)) for ad_id, _, timestamp in self._events if ad_id in ad_ids]
+
+    def flush(self):
+        with self._lock:
+            events, self._events = self._events, []
+            self._last_flush = time.monotonic()
+        if not events:
+            return 0
+
+        try:
+            write_events(events)
+        except Exception:
+            with self._lock:
+                self._events[:0] = events
+            raise
+        return len(events)
+
+
+def write_events(events):
+    daily = Counter((ad_id, _day(timestamp)) for ad_id, _, timestamp in events)
+
+    with transaction.atomic():
+        AdView.objects.bulk_create(
+            [AdView(ad_id=ad_id, viewer_id=viewer_id, timestamp=timestamp) for ad_id, viewer_id, timestamp in events],
+            batch_size=500,
+        )
+        # Sorted so that concurrent flushes lock counter rows in the same order.
+        for (ad_id, day), count in sorted(daily.items()):
+            _increment_daily(ad_id, day, count)
+
+
+def _increment_daily(ad_id, day, count):
+    counters = AdViewDaily.objects.filter(ad_id=ad_id, date=day)
+    if counters.update(count=F('count') + count):
+        return
+    try:
+        with transaction.atomic():
+            AdViewDaily.objects.create(ad_id=ad_id, date=day, count=count)
+    except IntegrityError:
+        counters.update(count=F('count') + count)
+
+
+def get_view_statistics_bulk(ad_ids, today=None):
+    ad_ids = list(ad_ids)
+    today = today or _today()
+    week_ago = today - timedelta(days=7)
+    month_ago = today - timedelta(days=30)
+
+    statistics = {ad_id: {'total': 0, 'today': 0, 'week': 0, 'month': 0} for ad_id in ad_ids}
+    if not ad_ids:
+        return statistics
+
+    rows = (
+        AdViewDaily.objects
+        .filter(ad_id__in=ad_ids)
+        .values('ad_id')
+        .annotate(
+            total=Sum('count'),
+            today=Sum('count', filter=Q(date=today)),
+            week=Sum('count', filter=Q(date__gte=week_ago)),
+            month=Sum('count', filter=Q(date__gte=month_ago)),
+        )
+    )
+    for row in rows:
+        counts = statistics[row['ad_id']]
+        for key in counts:
+            counts[key] = row[key] or 0
+
+    for ad_id, day in view_buffer.pending(ad_ids):
+        counts = statistics[ad_id]
+        counts['total'] += 1
+        if day == today:
+            counts['today'] += 1
+        if day >= week_ago:
+            counts['week'] += 1
+        if day >= month_ago:
+            counts['month'] += 1
+
+    return statistics
+
+
+def get_view_statistics(ad_id, today=None):
+    return get_view_statistics_bulk([ad_id], today)[ad_id]
+
+
+view_buffer = AdViewBuffer(
+    max_size=getattr(settings, 'AD_VIEW_BUFFER_SIZE', 500),
+    flush_interval=getattr(settings, 'AD_VIEW_FLUSH_INTERVAL', 5.0),
+)
+
+atexit.register(view_buffer.flush)
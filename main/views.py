@@ -1,155 +1,464 @@
+import hmac
+import time
+from datetime import timedelta
 from rest_framework import viewsets, generics, status
+from rest_framework.views import APIView
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Avg
 from rest_framework.response import Response
 from main.serializers import AdPremiumSerializer
 from django_filters.rest_framework import DjangoFilterBackend
-from main.models import CustomUser, CarBrand, CarModels, Ad, Conversation, Manager, CarMake, MissingCarMakeRequest, Currency, ExchangeRate, AdPrice
-from main.serializers import UserSerializer, CarBrandSerializer, CarModelSerializer, AdSerializer, ConversationSerializer, ManagerSerializer, CarMakeSerializer, MissingCarMakeRequestSerializer, CurrencySerializer, ExchangeRateSerializer
-from datetime import date, timedelta
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-
-class UserViewSet(viewsets.ModelViewSet):
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from main.models import CustomUser, CarBrand, CarModels, Ad, Conversation, Manager, CarMake, MissingCarMakeRequest, Currency, ExchangeRate, ConversationParticipant, Message
+from main.serializers import UserSerializer, CarBrandSerializer, CarModelSerializer, AdSerializer, ConversationSerializer, ManagerSerializer, CarMakeSerializer, MissingCarMakeRequestSerializer, CurrencySerializer, ExchangeRateSerializer, InboxEntrySerializer, MessageSerializer, AdWriteSerializer, AdBatchItemSerializer
+from main.autocomplete import KINDS, get_catalog_index
+from main.editing import EditConflict, EditLimitReached, create_ad, edit_ad, insert_ads
+from main.dashboard import ad_rows, seller_ads, seller_summary
+from main.exporting import CONTENT_TYPES, FORMATS as EXPORT_FORMATS, export_lines
+from main.fieldsets import DynamicFieldsMixin, ordering_columns, requested_fieldset
+from main.filters import AdFilter, ad_facets
+from main.instrumentation import metrics
+from main.pagination import KeysetPagination
+from main.rate_history import MAX_DAYS, date_range, days_from, get_rate_history
+from main.messaging import latest_message_id, mark_read, send_message, wait_for_messages
+from main.renderers import EventStreamRenderer, FastJSONRenderer
+from main.response_cache import CachedResponseMixin
+from main.search import search_ads
+from main.statistics import get_average_prices
+from main.view_tracking import view_buffer, get_view_statistics
+
+class EagerLoadingMixin:
+    eager_loading_skip_actions = ('destroy',)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if getattr(self, 'action', None) in self.eager_loading_skip_actions:
+            return queryset
+
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, DynamicFieldsMixin):
+            fields, expand = requested_fieldset(self.request)
+            return serializer_class.setup_sparse_loading(queryset, fields, expand, keep=ordering_columns(self))
+        if hasattr(serializer_class, 'setup_eager_loading'):
+            queryset = serializer_class.setup_eager_loading(queryset)
+        return queryset
+
+def int_param(request, name, default, maximum):
+    try:
+        value = int(request.query_params[name])
+    except (KeyError, ValueError):
+        return default
+    return min(max(value, 0), maximum)
+
+def date_param(request, name, default):
+    value = request.query_params.get(name)
+    if not value:
+        return default
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValidationError({name: 'Use the YYYY-MM-DD format.'})
+    return day
+
+def date_range_params(request, default_days):
+    end = date_param(request, 'end', timezone.localdate())
+    start = date_param(request, 'start', end - timedelta(days=default_days - 1))
+    if not 0 < date_range(start, end) <= MAX_DAYS:
+        raise ValidationError({'start': f'The range must end on or after its start and span at most {MAX_DAYS} days.'})
+    return start, end
+
+def decimal_string(value):
+    # Money and rates render as strings everywhere, as DRF's DecimalField does.
+    return None if value is None else str(value)
+
+def currencies_param(request, known):
+    requested = [name.strip().upper() for name in request.query_params.get('currencies', '').split(',') if name.strip()]
+    unknown = [name for name in requested if name not in known]
+    if unknown:
+        raise ValidationError({'currencies': f'Unknown currencies: {", ".join(unknown)}.'})
+    return requested or list(known)
+
+class UserViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = UserSerializer
 
-class CarBrandViewSet(viewsets.ModelViewSet):
+class CarBrandViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = CarBrand.objects.all()
     serializer_class = CarBrandSerializer
+    response_cache_group = 'car-brands'
 
-class CarModelsViewSet(viewsets.ModelViewSet):
+class CarModelsViewSet(CachedResponseMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = CarModels.objects.all()
     serializer_class = CarModelSerializer
+    response_cache_group = 'car-models'
 
-class AdViewSet(viewsets.ModelViewSet):
+class AdViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Ad.objects.all()
     serializer_class = AdSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['car_model__brand']
-
-    def perform_create(self, serializer):
-        serializer.save(seller=self.request.user)
+    filterset_class = AdFilter
+    eager_loading_skip_actions = ('destroy', 'facets', 'export', 'price_history')
+    cursor_orderings = {
+        '-created_at': ('-created_at', '-id'),
+        'created_at': ('created_at', 'id'),
+        'price': ('price', 'id'),
+        '-price': ('-price', '-id'),
+        'id': ('id',),
+    }
+
+    def get_serializer_class(self):
+        if self.action == 'retrieve' and getattr(self.request.user, 'is_premium', False):
+            return AdPremiumSerializer
+        if self.action in ('create', 'update', 'partial_update'):
+            return AdWriteSerializer
+        return super().get_serializer_class()
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
 
+        view_buffer.record(instance.pk, request.user.pk)
+
         if request.user.is_premium:
-            views = instance.adview_set.all()
-            today_views = views.filter(timestamp__date=date.today())
-            week_views = views.filter(timestamp__date__gte=date.today() - timedelta(days=7))
-            month_views = views.filter(timestamp__date__gte=date.today() - timedelta(days=30))
+            views = get_view_statistics(instance.pk)
+            average_prices = get_average_prices(instance.car_model.brand_id, instance.region)
 
             statistics = {
-                'total_views': views.count(),
-                'today_views': today_views.count(),
-                'week_views': week_views.count(),
-                'month_views': month_views.count(),
-                'average_price_region': self.calculate_average_price_region(instance),
-                'average_price_ukraine': self.calculate_average_price_ukraine(),
+                'total_views': views['total'],
+                'today_views': views['today'],
+                'week_views': views['week'],
+                'month_views': views['month'],
+                'average_price_brand': average_prices['brand'],
+                'average_price_region': average_prices['region'],
+                'average_price_ukraine': average_prices['ukraine'],
             }
 
-            serializer = AdPremiumSerializer(instance, context={'statistics': statistics})
+            serializer = self.get_serializer_class()(instance, context={**self.get_serializer_context(), 'statistics': statistics})
             return Response(serializer.data)
         else:
             serializer = self.get_serializer(instance)
             return Response(serializer.data)
 
-    def calculate_average_price_region(self, ad):
-        region = ad.seller.profile.region
-        average_price = Ad.objects.filter(seller__profile__region=region).aggregate(Avg('price'))
-        return average_price.get('price__avg')
-
-    def calculate_average_price_ukraine(self):
-        average_price = Ad.objects.all().aggregate(Avg('price'))
-        return average_price.get('price__avg')
-
-    def calculate_price_in_other_currencies(self, price, base_currency):
-        exchange_rates = self.get_exchange_rates()
-
-        base_rate = exchange_rates.get(base_currency)
-        price_usd = price / base_rate
-
-        price_other_currencies = {}
-        for currency, rate in exchange_rates.items():
-            if currency != base_currency:
-                price_other = price_usd * rate
-                price_other_currencies[currency] = round(price_other, 2)
-
-        return price_other_currencies
-
-    def get_exchange_rates(self):
-        exchange_rates = {
-            'USD': 0.4
-        }
-
-        return exchange_rates
-
-    def perform_create(self, serializer):
-        serializer.save(seller=self.request.user)
-
-        price_other_currencies = self.calculate_price_in_other_currencies(
-            serializer.validated_data['price'], serializer.validated_data['currency']
-        )
-
-        ad = serializer.save(seller=self.request.user)
-
-        for currency, price in price_other_currencies.items():
-            ad_price = AdPrice.objects.create(ad=ad, currency=currency, price=price)
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ad = create_ad(serializer.validated_data, request.user)
+        return Response(self.created_representation([ad])[0], status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """Create up to 100 ads at once; every item gets its own status, id or errors."""
+        serializer = AdBatchItemSerializer(data=request.data, many=True)
+        validated = serializer.run_validation(request.data)
+
+        ads = [Ad(**values, seller=request.user) for values in validated if values is not None]
+        if ads:
+            insert_ads(ads)
+        created = iter(self.created_representation(ads))
+
+        results = []
+        for index, (values, errors) in enumerate(zip(validated, serializer.item_errors)):
+            if values is None:
+                results.append({'index': index, 'status': status.HTTP_400_BAD_REQUEST, 'errors': errors})
+            else:
+                results.append({'index': index, 'status': status.HTTP_201_CREATED, 'ad': next(created)})
+
+        if len(ads) == len(results):
+            response_status = status.HTTP_201_CREATED
+        else:
+            response_status = status.HTTP_207_MULTI_STATUS if ads else status.HTTP_400_BAD_REQUEST
+        return Response({'created': len(ads), 'failed': len(results) - len(ads), 'results': results},
+                        status=response_status)
+
+    def created_representation(self, ads):
+        queryset = AdSerializer.setup_eager_loading(Ad.objects.filter(pk__in=[ad.pk for ad in ads]))
+        ads_by_id = {ad.pk: ad for ad in queryset}
+        return AdSerializer([ads_by_id[ad.pk] for ad in ads], many=True,
+                            context=self.get_serializer_context()).data
+
+    @action(detail=True, url_path='price-history')
+    def price_history(self, request, pk=None):
+        """The ad's price in other currencies on every day of ?start=..&end=.. (default: the last 365 days)."""
+        ad = self.get_object()
+        start, end = date_range_params(request, default_days=365)
+        history = get_rate_history()
+        targets = currencies_param(request, history.currencies)
+        days = date_range(start, end)
+        prices = history.price_history(ad.price, ad.currency, targets, start, days)
+        return Response({
+            'ad': ad.pk,
+            'price': decimal_string(ad.price),
+            'currency': ad.currency,
+            'dates': days_from(start, days),
+            'prices': {target: [decimal_string(price) for price in daily] for target, daily in prices.items()},
+        })
+
+    @action(detail=False)
+    def facets(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(ad_facets(queryset))
+
+    @action(detail=False)
+    def search(self, request):
+        query = request.query_params.get('q', '')
+        limit = int_param(request, 'limit', 20, maximum=100)
+        offset = int_param(request, 'offset', 0, maximum=1000)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        ranked = search_ads(query, queryset, limit=limit, offset=offset)
+        ads = queryset.in_bulk([ad_id for ad_id, _ in ranked])
+        ranked = [(ads[ad_id], score) for ad_id, score in ranked if ad_id in ads]
+
+        serializer = self.get_serializer([ad for ad, _ in ranked], many=True)
+        results = [dict(item, score=round(score, 4)) for item, (_, score) in zip(serializer.data, ranked)]
+        return Response({'query': query, 'results': results})
+
+    @action(detail=False)
+    def export(self, request):
+        # `format` is taken by DRF's content negotiation.
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return Response({'export_format': f'Choose one of: {", ".join(EXPORT_FORMATS)}.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        chunk_size = int_param(request, 'chunk_size', 1000, maximum=5000) or 1000
+        response = StreamingHttpResponse(export_lines(queryset, export_format, chunk_size), content_type=CONTENT_TYPES[export_format])
+        response['Content-Disposition'] = f'attachment; filename="ads.{export_format}"'
+        return response
 
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
+        changes = dict(serializer.validated_data)
+        version = changes.pop('version', None)
 
-        if instance.edit_attempts >= 3:
-            instance.is_active = False
-            instance.save()
+        try:
+            ad = edit_ad(instance, changes, version)
+        except EditLimitReached:
             return Response({'detail': 'Докликался. Объявление помечено как неактивное.'}, status=status.HTTP_400_BAD_REQUEST)
+        except EditConflict as conflict:
+            return Response({'detail': 'The ad was changed by another request; reload it and retry.',
+                             'version': conflict.version}, status=status.HTTP_409_CONFLICT)
 
-        serializer.save()
-        instance.edit_attempts += 1
-        instance.save()
-        return Response(serializer.data)
+        ad = AdSerializer.setup_eager_loading(Ad.objects.all()).get(pk=ad.pk)
+        return Response(AdSerializer(ad, context=self.get_serializer_context()).data)
 
 class AdCreateView(generics.CreateAPIView):
     queryset = Ad.objects.all()
-    serializer_class = AdSerializer
-
-    def calculate_price_in_other_currencies(self, price, base_currency):
-        exchange_rates = ExchangeRate.objects.all()
-
-        base_rate = exchange_rates.get(currency=base_currency).rate
-        price_usd = price / base_rate
-
-        price_other_currencies = {}
-        for rate in exchange_rates:
-            if rate.currency != base_currency:
-                price_other = price_usd * rate.rate
-                price_other_currencies[rate.currency.name] = round(price_other, 2)
+    serializer_class = AdWriteSerializer
+    permission_classes = [IsAuthenticated]
 
-        return price_other_currencies
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ad = create_ad(serializer.validated_data, request.user)
+        ad = AdSerializer.setup_eager_loading(Ad.objects.all()).get(pk=ad.pk)
+        return Response(AdSerializer(ad, context=self.get_serializer_context()).data, status=status.HTTP_201_CREATED)
 
 class ConversationCreateView(generics.CreateAPIView):
     queryset = Conversation.objects.all()
     serializer_class = ConversationSerializer
 
+class InboxView(EagerLoadingMixin, generics.ListAPIView):
+    queryset = ConversationParticipant.objects.all()
+    serializer_class = InboxEntrySerializer
+    permission_classes = [IsAuthenticated]
+    cursor_orderings = {
+        '-last_activity': ('-last_activity', '-id'),
+    }
+
+    def get_queryset(self):
+        return super().get_queryset().filter(user=self.request.user)
+
+class SellerDashboardView(APIView):
+    """
+    Views, price comparisons and conversation counts for every ad of the
+    current seller, from a fixed number of grouped queries per page, cached
+    per seller for SELLER_DASHBOARD_TTL seconds.
+    """
+    permission_classes = [IsAuthenticated]
+    cursor_orderings = {
+        '-created_at': ('-created_at', '-id'),
+        'id': ('id',),
+    }
+
+    def get(self, request):
+        key = f'dashboard:{request.user.pk}:{request.get_full_path()}'
+        data = cache.get(key)
+        if data is None:
+            paginator = KeysetPagination()
+            page = paginator.paginate_queryset(seller_ads(request.user.pk), request, self)
+            data = paginator.get_paginated_data(ad_rows(page))
+            data['summary'] = seller_summary(request.user.pk)
+            cache.set(key, data, getattr(settings, 'SELLER_DASHBOARD_TTL', 30))
+        return Response(data)
+
+class ConversationParticipantMixin:
+    permission_classes = [IsAuthenticated]
+
+    def get_conversation(self):
+        if not hasattr(self, '_conversation'):
+            membership = (ConversationParticipant.objects
+                          .select_related('conversation')
+                          .filter(conversation_id=self.kwargs['pk'], user=self.request.user)
+                          .first())
+            if membership is None:
+                raise NotFound()
+            self._conversation = membership.conversation
+        return self._conversation
+
+class ConversationMessagesView(ConversationParticipantMixin, generics.ListCreateAPIView):
+    serializer_class = MessageSerializer
+    cursor_orderings = {
+        '-id': ('-id',),
+        'id': ('id',),
+    }
+
+    def get_queryset(self):
+        return Message.objects.filter(conversation=self.get_conversation())
+
+    def perform_create(self, serializer):
+        serializer.instance = send_message(self.get_conversation(), self.request.user, serializer.validated_data['body'])
+
+class ConversationReadView(ConversationParticipantMixin, APIView):
+    def post(self, request, pk):
+        mark_read(self.get_conversation(), request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class MessagePollView(APIView):
+    """
+    Long poll: answers as soon as the user has messages newer than `after`, or empty after `timeout` seconds.
+
+    A waiting request holds a worker thread, so the timeout is capped low; under ASGI clients should use
+    /async/messages/poll/, which waits on the event loop and allows up to a minute.
+    """
+    permission_classes = [IsAuthenticated]
+    default_timeout = 10
+    max_timeout = 15
+
+    def get(self, request):
+        after = int_param(request, 'after', None, maximum=2 ** 63 - 1)
+        if after is None:
+            after = latest_message_id(request.user.pk)
+        timeout = int_param(request, 'timeout', self.default_timeout, maximum=self.max_timeout)
+
+        messages = wait_for_messages(request.user.pk, after, timeout)
+        last_id = messages[-1].pk if messages else after
+        return Response({'messages': MessageSerializer(messages, many=True).data, 'last_id': last_id})
+
+class MessageStreamView(APIView):
+    """
+    Server-sent events with the user's new messages; clients reconnect with Last-Event-ID.
+
+    An open stream holds a sync worker thread for up to `max_duration`, so serve /messages/stream/ from its
+    own pool of threaded workers (e.g. gunicorn --worker-class gthread) rather than the one taking API traffic.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [EventStreamRenderer, FastJSONRenderer]
+    heartbeat = 10
+    max_duration = 30
+
+    def get(self, request):
+        try:
+            after = int(request.META.get('HTTP_LAST_EVENT_ID') or request.query_params['after'])
+        except (KeyError, ValueError):
+            after = latest_message_id(request.user.pk)
+
+        response = StreamingHttpResponse(self.events(request.user.pk, after), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def events(self, user_id, after):
+        renderer = FastJSONRenderer()
+        deadline = time.monotonic() + self.max_duration
+        yield 'retry: 3000\n\n'
+        while time.monotonic() < deadline:
+            messages = wait_for_messages(user_id, after, min(self.heartbeat, max(deadline - time.monotonic(), 0)))
+            if not messages:
+                yield ': keep-alive\n\n'
+                continue
+            for message in messages:
+                data = renderer.render(MessageSerializer(message).data).decode()
+                yield f'id: {message.pk}\nevent: message\ndata: {data}\n\n'
+            after = messages[-1].pk
+
 class ManagerCreateView(generics.CreateAPIView):
     queryset = Manager.objects.all()
     serializer_class = ManagerSerializer
 
-class CarMakeListView(generics.ListAPIView):
+class CarMakeListView(CachedResponseMixin, generics.ListAPIView):
     queryset = CarMake.objects.all()
     serializer_class = CarMakeSerializer
+    response_cache_group = 'car-makes'
 
 class MissingCarMakeRequestCreateView(generics.CreateAPIView):
     queryset = MissingCarMakeRequest.objects.all()
     serializer_class = MissingCarMakeRequestSerializer
 
-class CurrencyListView(generics.ListAPIView):
+class CurrencyListView(CachedResponseMixin, generics.ListAPIView):
     queryset = Currency.objects.all()
     serializer_class = CurrencySerializer
+    response_cache_group = 'currencies'
 
-class ExchangeRateListView(generics.ListAPIView):
+class ExchangeRateListView(CachedResponseMixin, EagerLoadingMixin, generics.ListAPIView):
     queryset = ExchangeRate.objects.all()
     serializer_class = ExchangeRateSerializer
+    response_cache_group = 'exchange-rates'
+    cursor_orderings = {
+        '-date': ('-date', '-id'),
+        'id': ('id',),
+    }
+
+class ExchangeRateHistoryView(APIView):
+    """Rates in force during ?start=..&end=..: for each currency, the rate on `start` and every later change."""
+
+    def get(self, request):
+        start, end = date_range_params(request, default_days=30)
+        history = get_rate_history()
+        return Response({
+            'base': settings.PRICE_BASE_CURRENCY,
+            'start': start,
+            'end': end,
+            'rates': {
+                currency: [{'date': day, 'rate': decimal_string(rate)}
+                           for day, rate in history.get(currency).changes(start, end)]
+                for currency in currencies_param(request, history.currencies)
+            },
+        })
+
+class ExchangeRateAsOfView(APIView):
+    """Every currency's rate on ?date= (default: today)."""
+
+    def get(self, request):
+        day = date_param(request, 'date', timezone.localdate())
+        rates = {currency: decimal_string(rate) for currency, rate in get_rate_history().rates_on(day).items()}
+        return Response({'base': settings.PRICE_BASE_CURRENCY, 'date': day, 'rates': rates})
+
+class AutocompleteView(APIView):
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        kinds = [kind for kind in request.query_params.getlist('kind') if kind in KINDS] or KINDS
+        limit = int_param(request, 'limit', 10, maximum=20)
+        return Response({'query': query, 'results': get_catalog_index().suggest(query, kinds, limit)})
+
+def metrics_view(request):
+    """
+    Prometheus scrape target; requires `Authorization: Bearer <METRICS_TOKEN>`.
+    Without a token it is only served with DEBUG on.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponse(status=403)
+    elif not hmac.compare_digest(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')